@@ -60,6 +60,20 @@ CONSOLE_ENCODING = None
 
 # db options
 MAX_FETCH_COUNT = None
+TRANSLATOR_CACHE_SIZE = 1000  # None means unlimited
+CONSTRUCTED_SQL_CACHE_SIZE = 5000  # None means unlimited
+LIMIT_AS_PARAMS = False  # if True pass LIMIT/OFFSET values as query parameters
+FLUSH_BATCH_SIZE = 1000  # max number of objects saved by a single batched statement during flush
+LIST_PARAM_THRESHOLD = 100  # longer lists in `x in list` are passed as a single array parameter if supported
+SEED_BATCH_SIZE = None  # max number of objects loaded together with accessed object, None means max_params_count
+ENTITY_CACHE_SIZE = 10000  # default max number of rows in second-level cache of entity with _cache_ option
+QUERY_RESULT_CACHE_SIZE = 1000  # max number of results stored by queries with cache() option, None means unlimited
+PERSISTENT_CACHE_DIR = None  # directory for on-disk cache of decompiled queries, translators and SQL
+# Files of PERSISTENT_CACHE_DIR are loaded with pickle, so anybody who can write to the directory can execute
+# arbitrary code in the process. The directory is created with 0o700 mode, an existing directory is refused
+# if it is not owned by the current user or is writable by group or others
+SESSION_STATE = 'thread'  # 'context' keeps session state in contextvars, it is required for async db_session
+ASYNC_WORKERS_POOL_SIZE = 10  # max number of idle worker threads kept for async db_session
 
 # used for select(...).show()
 CONSOLE_WIDTH = 80
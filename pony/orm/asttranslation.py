@@ -18,6 +18,12 @@ class ASTTranslator(object):
         translator_cls = translator.__class__
         pre_method_caches.setdefault(translator_cls, {})
         post_method_caches.setdefault(translator_cls, {})
+    def __setstate__(translator, state):
+        # translator can be unpickled from the persistent cache in a process which did not create translators yet
+        translator.__dict__.update(state)
+        translator_cls = translator.__class__
+        pre_method_caches.setdefault(translator_cls, {})
+        post_method_caches.setdefault(translator_cls, {})
     def dispatch(translator, node):
         translator_cls = translator.__class__
         pre_methods = pre_method_caches[translator_cls]
@@ -1,7 +1,7 @@
 from __future__ import absolute_import, print_function, division
 from pony.py23compat import cmp, unicode, buffer, int_types
 
-import builtins, json, re, sys, types, datetime, logging, itertools, warnings, inspect, ast
+import asyncio, builtins, contextvars, csv, json, re, sys, types, datetime, logging, itertools, warnings, inspect, ast
 from operator import attrgetter, itemgetter
 from itertools import chain, starmap, repeat
 from time import time
@@ -10,13 +10,17 @@ from random import shuffle, randint, random
 from threading import Lock, RLock, current_thread, _MainThread
 from contextlib import contextmanager
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from weakref import WeakSet
 from hashlib import md5
 from inspect import isgeneratorfunction
-from functools import wraps
+from functools import wraps, partial
 
 import pony
 from pony import options
 from pony.orm.decompiling import decompile
+from pony.orm.persistentcache import get_persistent_cache
+from pony.orm.sqlbuilding import make_adapter
 from pony.orm.ormtypes import (
     LongStr, LongUnicode, numeric_types, raw_sql, RawSQL, normalize, Json, TrackedValue, QueryType,
     Array, IntArray, StrArray, FloatArray
@@ -27,9 +31,10 @@ from pony.orm.dbapiprovider import (
     OperationalError, IntegrityError, InternalError, ProgrammingError, NotSupportedError
     )
 from pony import utils
-from pony.utils import localbase, decorator, cut_traceback, cut_traceback_depth, throw, reraise, truncate_repr, \
-     get_lambda_args, pickle_ast, unpickle_ast, deprecated, import_module, parse_expr, is_ident, tostring, strjoin, \
-     between, concat, coalesce, HashableDict, deref_proxy, deduplicate
+from pony.utils import localbase, contextlocal, contextlocal_owner, get_context_owner, get_context_states, \
+     decorator, cut_traceback, cut_traceback_depth, throw, reraise, truncate_repr, get_lambda_args, pickle_ast, \
+     unpickle_ast, deprecated, import_module, parse_expr, is_ident, tostring, strjoin, between, concat, coalesce, \
+     HashableDict, LRUCache, deref_proxy, deduplicate
 
 __all__ = [
     'pony',
@@ -42,7 +47,7 @@ __all__ = [
     'OrmError', 'ERDiagramError', 'DBSchemaError', 'MappingError', 'BindingError',
     'TableDoesNotExist', 'TableIsNotEmpty', 'ConstraintError', 'CacheIndexError',
     'ObjectNotFound', 'MultipleObjectsFoundError', 'TooManyObjectsFoundError', 'OperationWithDeletedObjectError',
-    'TransactionError', 'ConnectionClosedError', 'TransactionIntegrityError', 'IsolationError',
+    'TransactionError', 'ConnectionClosedError', 'PoolTimeoutError', 'TransactionIntegrityError', 'IsolationError',
     'CommitException', 'RollbackException', 'UnrepeatableReadError', 'OptimisticCheckError',
     'UnresolvableCyclicDependency', 'UnexpectedError', 'DatabaseSessionIsOver',
     'PonyRuntimeWarning', 'DatabaseContainsIncorrectValue', 'DatabaseContainsIncorrectEmptyValue',
@@ -52,7 +57,7 @@ __all__ = [
 
     'PrimaryKey', 'Required', 'Optional', 'Set', 'Discriminator',
     'composite_key', 'composite_index',
-    'flush', 'commit', 'rollback', 'db_session', 'with_transaction', 'make_proxy',
+    'flush', 'commit', 'rollback', 'db_session', 'with_transaction', 'make_proxy', 'run_async',
 
     'LongStr', 'LongUnicode', 'Json', 'IntArray', 'StrArray', 'FloatArray',
 
@@ -155,6 +160,7 @@ class TooManyObjectsFoundError(OrmError): pass
 class OperationWithDeletedObjectError(OrmError): pass
 class TransactionError(OrmError): pass
 class ConnectionClosedError(TransactionError): pass
+class PoolTimeoutError(TransactionError): pass
 
 class TransactionIntegrityError(TransactionError):
     def __init__(exc, msg, original_exc=None):
@@ -307,7 +313,8 @@ class PrefetchContext(object):
         return result
 
 
-class Local(localbase):
+class LocalMixin(object):
+    __slots__ = ()
     def __init__(local):
         local.debug = False
         local.show_values = None
@@ -315,6 +322,7 @@ class Local(localbase):
         local.db2cache = {}
         local.db_context_counter = 0
         local.db_session = None
+        local.async_worker = None
         local.prefetch_context_stack = []
         local.current_user = None
         local.perms_context = None
@@ -333,7 +341,83 @@ class Local(localbase):
     def pop_debug_state(local):
         local.debug, local.show_values = local.debug_stack.pop()
 
-local = Local()
+class Local(LocalMixin, localbase):
+    pass
+
+class ContextLocal(LocalMixin, contextlocal):
+    __slots__ = ()
+    _inherited_attrs_ = 'debug', 'show_values', 'current_user'  # the session itself is not inherited by new tasks
+
+session_state_classes = {}  # filled after DbLocal classes definition
+
+def set_session_state(kind):
+    global local
+    if kind not in session_state_classes: throw(ValueError,
+        "Session state kind should be 'thread' or 'context'. Got: %r" % kind)
+    local_class = session_state_classes[kind][0]
+    if type(local) is local_class:
+        options.SESSION_STATE = kind
+        return
+    if session_state_frozen: throw(BindingError,
+        'Session state kind cannot be changed after a database was bound')
+    if local.db_session is not None: throw(TransactionError,
+        'Session state kind cannot be changed inside of db_session')
+    options.SESSION_STATE = kind
+    new_local = session_locals.get(kind)
+    if new_local is None: new_local = session_locals[kind] = local_class()
+    new_local.debug, new_local.show_values = local.debug, local.show_values
+    local = new_local
+
+local = (ContextLocal if options.SESSION_STATE == 'context' else Local)()
+session_locals = {options.SESSION_STATE: local}  # session state objects are reused when switching back and forth
+session_state_frozen = False  # session state is global, it cannot be changed after the first Database.bind()
+
+class AsyncWorker(ThreadPoolExecutor):
+    def __init__(worker):
+        ThreadPoolExecutor.__init__(worker, max_workers=1, thread_name_prefix='pony-async-worker',
+                                    initializer=worker._init_thread)
+        worker.thread = None
+        worker.databases = WeakSet()  # databases which can have connections in thread-local pool of the worker
+    def _init_thread(worker):
+        worker.thread = current_thread()
+    def close(worker, wait=False):
+        worker.submit(worker._disconnect)
+        worker.shutdown(wait=wait)
+    def _disconnect(worker):
+        for database in list(worker.databases):
+            provider = database.provider
+            if provider is not None and isinstance(provider.pool, localbase): provider.pool.disconnect()
+        worker.databases.clear()
+
+async_workers = []  # idle single-thread executors, each of them keeps its own thread-local connection pool
+async_workers_lock = Lock()
+
+def acquire_async_worker():
+    with async_workers_lock:
+        if async_workers: return async_workers.pop()
+    return AsyncWorker()
+
+def release_async_worker(worker):
+    with async_workers_lock:
+        if len(async_workers) < options.ASYNC_WORKERS_POOL_SIZE:
+            async_workers.append(worker)
+            return
+    worker.close()
+
+def shutdown_async_workers(database):
+    with async_workers_lock:
+        workers = [ worker for worker in async_workers if database in worker.databases ]
+        async_workers[:] = [ worker for worker in async_workers if database not in worker.databases ]
+    for worker in workers: worker.close(wait=True)
+
+async def run_async(func, *args, **kwargs):
+    worker = local.async_worker
+    if worker is None: throw(TransactionError, 'run_async() can be called inside of async db_session only')
+    get_context_states()  # states created by the worker should be visible to the task
+    context = contextvars.copy_context()
+    context.run(contextlocal_owner.set, get_context_owner())  # the worker uses the session state of the task
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(worker, partial(context.run, func, *args, **kwargs))
 
 def _get_caches():
     return list(sorted((cache for cache in local.db2cache.values()),
@@ -448,6 +532,28 @@ class DBSessionContextManager(object):
         if db_session.retry != 0: throw(TypeError,
             "@db_session can accept 'retry' parameter only when used as decorator and not as context manager")
         db_session._enter()
+    async def __aenter__(db_session):
+        if db_session.retry != 0: throw(TypeError,
+            "@db_session can accept 'retry' parameter only when used as decorator and not as context manager")
+        if type(local) is not ContextLocal: throw(TransactionError,
+            "async db_session requires context-based session state. "
+            "Set options.SESSION_STATE = 'context' or call set_session_state('context') "
+            "before binding databases")
+        if local.db_session is None:
+            local.async_worker = acquire_async_worker()
+        elif local.async_worker is None: throw(TransactionError,
+            'async db_session cannot be started inside of synchronous db_session')
+        db_session._enter()
+    async def __aexit__(db_session, exc_type=None, exc=None, tb=None):
+        if local.db_context_counter > 1:
+            db_session.__exit__(exc_type, exc, tb)
+            return
+        worker = local.async_worker
+        worker.databases.update(local.db2cache)
+        try: await run_async(db_session.__exit__, exc_type, exc, tb)
+        finally:
+            local.async_worker = None
+            release_async_worker(worker)
     def _enter(db_session):
         if local.db_session is None:
             assert not local.db_context_counter
@@ -725,8 +831,26 @@ class OnConnectDecorator(object):
         return OnConnectDecorator(self.database, provider)
 
 
+def make_row_class(description):
+    row_class = type("row", (tuple,), {})
+    for i, column_info in enumerate(description):
+        column_name = column_info[0]
+        if not is_ident(column_name): continue
+        if hasattr(tuple, column_name) and column_name.startswith('__'): continue
+        setattr(row_class, column_name, property(itemgetter(i)))
+    return row_class
+
+def close_cursor(cursor):
+    try: cursor.close()
+    except Exception: pass  # connection may be already released or closed
+
+
 db_id_counter = itertools.count(1)
 
+LIMIT_VARKEY = 'pony-limit'
+OFFSET_VARKEY = 'pony-offset'
+UPDATE_VARKEY = 'pony-update'
+
 
 class Database(object):
     def __deepcopy__(self, memo):
@@ -739,8 +863,8 @@ class Database(object):
         self._insert_cache = {}
 
         # ER-diagram related stuff:
-        self._translator_cache = {}
-        self._constructed_sql_cache = {}
+        self._translator_cache = LRUCache(options.TRANSLATOR_CACHE_SIZE)
+        self._constructed_sql_cache = LRUCache(options.CONSTRUCTED_SQL_CACHE_SIZE)
         self.entities = {}
         self.schema = None
         self.Entity = type.__new__(EntityMeta, 'Entity', (Entity,), {})
@@ -749,10 +873,16 @@ class Database(object):
         # Statistics-related stuff:
         self._global_stats = {}
         self._global_stats_lock = RLock()
-        self._dblocal = DbLocal()
+        self._seed_stats = {}
+        self._entity_cache_lock = RLock()
+        self._entity_cache_version = 0  # incremented on each invalidation of the second-level entity cache
+        self._query_result_cache = LRUCache(options.QUERY_RESULT_CACHE_SIZE)
+        self._table_versions = defaultdict(int)  # table -> number of committed transactions which modified it
+        self._dblocal = session_state_classes[options.SESSION_STATE][1]()
 
         self.on_connect = OnConnectDecorator(self, None)
         self._on_connect_funcs = []
+        self._precompiled_funcs = []
         self.provider = self.provider_name = None
         if args or kwargs: self._bind(*args, **kwargs)
     def call_on_connect(database, con):
@@ -783,12 +913,28 @@ class Database(object):
             self.provider_name = provider
             provider_module = import_module('pony.orm.dbproviders.' + provider)
             provider_cls = provider_module.provider_cls
+        if 'translator_cache_size' in kwargs:
+            self._translator_cache.resize(kwargs.pop('translator_cache_size'))
+        if 'constructed_sql_cache_size' in kwargs:
+            self._constructed_sql_cache.resize(kwargs.pop('constructed_sql_cache_size'))
+        if 'session_state' in kwargs: throw(TypeError,
+            'Session state kind is global and cannot be specified for a database. '
+            'Use options.SESSION_STATE or set_session_state() before binding databases')
+        set_session_state(options.SESSION_STATE)
+        dblocal_class = session_state_classes[options.SESSION_STATE][1]
+        if type(self._dblocal) is not dblocal_class: self._dblocal = dblocal_class()
         kwargs['pony_call_on_connect'] = self.call_on_connect
         self.provider = provider_cls(self, *args, **kwargs)
+        global session_state_frozen
+        session_state_frozen = True
     @property
     def last_sql(database):
         return database._dblocal.last_sql
     @property
+    def cache_stats(database):
+        return dict(translator_cache=database._translator_cache.stats(),
+                    constructed_sql_cache=database._constructed_sql_cache.stats())
+    @property
     def local_stats(database):
         return database._dblocal.stats
     def _update_local_stat(database, sql, query_start_time):
@@ -820,6 +966,48 @@ class Database(object):
     def global_stats(database):
         with database._global_stats_lock:
             return {sql: stat.copy() for sql, stat in database._global_stats.items()}
+    def _update_seed_stats(database, seed_stats):
+        with database._global_stats_lock:
+            for entity_name, session_stat in seed_stats.items():
+                stat = database._seed_stats.get(entity_name)
+                if stat is None: stat = database._seed_stats[entity_name] = SeedStat(entity_name)
+                stat.merge(session_stat)
+    def _put_to_entity_cache_(database, entity_cache, session_version, items):
+        with database._entity_cache_lock:
+            # rows read by a session started before the last invalidation may be stale already
+            if session_version == database._entity_cache_version: entity_cache.put_many(items)
+    def _invalidate_entity_cache_(database, objects, entity_caches):
+        with database._entity_cache_lock:
+            database._entity_cache_version += 1
+            for entity_cache in entity_caches: entity_cache.clear()
+            for obj in objects: obj._entity_cache_.invalidate(obj._get_raw_pkval_())
+    def _get_table_versions_(database, tables):
+        versions = database._table_versions
+        return (versions[None],) + tuple(versions[table] for table in tables)
+    def _invalidate_tables_(database, tables):
+        with database._entity_cache_lock:
+            versions = database._table_versions
+            for table in tables: versions[table] += 1
+    def _get_cached_query_result_(database, query_key, tables):
+        item = database._query_result_cache.get(query_key)
+        if item is None: return None
+        expire_time, versions, result = item
+        if expire_time is not None and expire_time < time() or versions != database._get_table_versions_(tables):
+            database._query_result_cache.pop(query_key, None)
+            return None
+        return result
+    def _put_query_result_(database, query_key, ttl, versions, result):
+        expire_time = time() + ttl if ttl is not None else None
+        database._query_result_cache[query_key] = expire_time, versions, result
+    def _count_cached_query_(database, sql):
+        stats = database._dblocal.stats
+        stat = stats.get(sql)
+        if stat is not None: stat.cache_count += 1
+        else: stats[sql] = QueryStat(sql)
+    @property
+    def seed_stats(database):
+        with database._global_stats_lock:
+            return {entity_name: stat.copy() for entity_name, stat in database._seed_stats.items()}
     @property
     def global_stats_lock(database):
         deprecated(3, "global_stats_lock is deprecated, just use global_stats property without any locking")
@@ -842,6 +1030,7 @@ class Database(object):
         cache = local.db2cache.get(database)
         if cache is not None: cache.rollback()
         provider.disconnect()
+        shutdown_async_workers(database)
     def _get_cache(database):
         if database.provider is None: throw(MappingError, 'Database object is not bound with a provider yet')
         cache = local.db2cache.get(database)
@@ -865,10 +1054,18 @@ class Database(object):
         if cache is not None:
             try: cache.rollback()
             except: transact_reraise(RollbackException, [sys.exc_info()])
+    async def flush_async(database):
+        return await run_async(database.flush)
+    async def commit_async(database):
+        return await run_async(database.commit)
+    async def rollback_async(database):
+        return await run_async(database.rollback)
     @cut_traceback
     def execute(database, sql, globals=None, locals=None):
-        return database._exec_raw_sql(sql, globals, locals, frame_depth=cut_traceback_depth+1, start_transaction=True)
-    def _exec_raw_sql(database, sql, globals, locals, frame_depth, start_transaction=False):
+        cursor = database._exec_raw_sql(sql, globals, locals, frame_depth=cut_traceback_depth+1, start_transaction=True)
+        database._get_cache().modified_tables.add(None)  # tables modified by raw SQL are unknown
+        return cursor
+    def _exec_raw_sql(database, sql, globals, locals, frame_depth, start_transaction=False, itersize=None):
         provider = database.provider
         if provider is None: throw(MappingError, 'Database object is not bound with a provider yet')
         sql = sql[:]  # sql = templating.plainstr(sql)
@@ -879,7 +1076,7 @@ class Database(object):
             locals = sys._getframe(frame_depth).f_locals
         adapted_sql, code = adapt_sql(sql, provider.paramstyle)
         arguments = eval(code, globals, locals)
-        return database._exec_sql(adapted_sql, arguments, False, start_transaction)
+        return database._exec_sql(adapted_sql, arguments, False, start_transaction, itersize)
     @cut_traceback
     def select(database, sql, globals=None, locals=None, frame_depth=0):
         if not select_re.match(sql): sql = 'select ' + sql
@@ -890,14 +1087,36 @@ class Database(object):
             if cursor.fetchone() is not None: throw(TooManyRowsFound)
         else: result = cursor.fetchall()
         if len(cursor.description) == 1: return [ row[0] for row in result ]
-        row_class = type("row", (tuple,), {})
-        for i, column_info in enumerate(cursor.description):
-            column_name = column_info[0]
-            if not is_ident(column_name): continue
-            if hasattr(tuple, column_name) and column_name.startswith('__'): continue
-            setattr(row_class, column_name, property(itemgetter(i)))
+        row_class = make_row_class(cursor.description)
         return [ row_class(row) for row in result ]
     @cut_traceback
+    def stream(database, sql, globals=None, locals=None, batch_size=1000, server_side=False, frame_depth=0):
+        if not isinstance(batch_size, int_types) or batch_size <= 0: throw(TypeError,
+            "'batch_size' argument of stream() method must be positive integer. Got: %r" % batch_size)
+        if not select_re.match(sql): sql = 'select ' + sql
+        cursor = database._exec_raw_sql(sql, globals, locals, frame_depth+cut_traceback_depth+1,
+                                        itersize=batch_size if server_side else None)
+        return database._stream_rows(cursor, batch_size)
+    def _stream_rows(database, cursor, batch_size):
+        cache = database._get_cache()
+        single_column = row_class = None
+        try:
+            while True:
+                if not cache.is_alive: throw(DatabaseSessionIsOver,
+                    'Cannot fetch next rows of query result: the database session is over')
+                rows = cursor.fetchmany(batch_size)
+                if not rows: break
+                if single_column is None:
+                    # description of server-side cursor is not available until the first fetch
+                    single_column = len(cursor.description) == 1
+                    if not single_column: row_class = make_row_class(cursor.description)
+                if single_column:
+                    for row in rows: yield row[0]
+                else:
+                    for row in rows: yield row_class(row)
+        finally:
+            close_cursor(cursor)
+    @cut_traceback
     def get(database, sql, globals=None, locals=None):
         rows = database.select(sql, globals, locals, frame_depth=cut_traceback_depth+1)
         if not rows: throw(RowNotFound)
@@ -932,18 +1151,21 @@ class Database(object):
     def _ast2sql(database, sql_ast):
         sql, adapter = database.provider.ast2sql(sql_ast)
         return sql, adapter
-    def _exec_sql(database, sql, arguments=None, returning_id=False, start_transaction=False):
+    def _exec_sql(database, sql, arguments=None, returning_id=False, start_transaction=False, itersize=None):
         cache = database._get_cache()
-        if start_transaction: cache.immediate = True
+        provider = database.provider
+        server_side = itersize is not None and provider.server_side_cursor_support
+        if start_transaction or server_side: cache.immediate = True
         connection = cache.prepare_connection_for_query_execution()
-        cursor = connection.cursor()
+        if server_side: cursor = provider.get_server_side_cursor(connection, itersize)
+        else: cursor = connection.cursor()
         if local.debug: log_sql(sql, arguments)
-        provider = database.provider
         t = time()
         try: new_id = provider.execute(cursor, sql, arguments, returning_id)
         except Exception as e:
             connection = cache.reconnect(e)
-            cursor = connection.cursor()
+            if server_side: cursor = provider.get_server_side_cursor(connection, itersize)
+            else: cursor = connection.cursor()
             if local.debug: log_sql(sql, arguments)
             t = time()
             new_id = provider.execute(cursor, sql, arguments, returning_id)
@@ -952,6 +1174,19 @@ class Database(object):
         database._update_local_stat(sql, t)
         if not returning_id: return cursor
         return new_id
+    def _exec_copy(database, sql, file, arguments=None, start_transaction=False):
+        cache = database._get_cache()
+        provider = database.provider
+        if start_transaction: cache.immediate = True
+        connection = cache.prepare_connection_for_query_execution()
+        cursor = connection.cursor()
+        if local.debug: log_sql(sql, arguments)
+        t = time()
+        provider.copy_expert(cursor, sql, file, arguments)
+        if cache.immediate:
+            cache.in_transaction = True
+        database._update_local_stat(sql, t)
+        return cursor
     @cut_traceback
     def generate_mapping(database, filename=None, check_tables=True, create_tables=False):
         provider = database.provider
@@ -1070,6 +1305,8 @@ class Database(object):
                     else: pass  # virtual attribute of one-to-one pair
             entity._attrs_with_columns_ = [ attr for attr in entity._attrs_
                                                  if not attr.is_collection and attr.columns ]
+            entity._self_referencing_ = any(attr.reverse and attr.py_type._root_ is entity._root_
+                                            for attr in entity._attrs_with_columns_)
             if not table.pk_index:
                 if len(entity._pk_columns_) == 1 and entity._pk_attrs_[0].auto: is_pk = "auto"
                 else: is_pk = True
@@ -1209,6 +1446,29 @@ class Database(object):
         if database.schema is None: throw(MappingError, 'No mapping was generated for the database')
         connection = cache.prepare_connection_for_query_execution()
         database.schema.check_tables(database.provider, connection)
+    @cut_traceback
+    def precompile(database, *args, **kwargs):
+        # usage: @db.precompile or @db.precompile(*sample_args, **sample_kwargs) before a function
+        # which returns a query; db.warmup() calls it with sample arguments and translates the query
+        if len(args) == 1 and not kwargs and isinstance(args[0], types.FunctionType):
+            database._precompiled_funcs.append((args[0], (), {}))
+            return args[0]
+        def decorator(func):
+            if not isinstance(func, types.FunctionType):
+                throw(TypeError, 'Function expected. Got: %r' % func)
+            database._precompiled_funcs.append((func, args, kwargs))
+            return func
+        return decorator
+    @cut_traceback
+    @db_session()
+    def warmup(database):
+        if database.schema is None: throw(MappingError, 'No mapping was generated for the database')
+        for func, args, kwargs in database._precompiled_funcs:
+            query = func(*args, **kwargs)
+            if not isinstance(query, Query): throw(TypeError,
+                'Function %s registered with precompile() should return a query. Got: %r' % (func.__name__, query))
+            query._construct_sql_and_arguments()  # puts translator and SQL to the caches without query execution
+        return len(database._precompiled_funcs)
     @contextmanager
     def set_perms_for(database, *entities):
         if not entities: throw(TypeError, 'You should specify at least one positional argument')
@@ -1682,11 +1942,20 @@ def obj_labels_getter(cls=None):
         return func
     return decorator
 
-class DbLocal(localbase):
+class DbLocalMixin(object):
+    __slots__ = ()
     def __init__(dblocal):
         dblocal.stats = {None: QueryStat(None)}
         dblocal.last_sql = None
 
+class DbLocal(DbLocalMixin, localbase):
+    pass
+
+class DbContextLocal(DbLocalMixin, contextlocal):
+    __slots__ = ()
+
+session_state_classes.update(thread=(Local, DbLocal), context=(ContextLocal, DbContextLocal))
+
 class QueryStat(object):
     def __init__(stat, sql, duration=None):
         if duration is not None:
@@ -1727,6 +1996,59 @@ class QueryStat(object):
         if not stat.db_count: return None
         return stat.sum_time / stat.db_count
 
+class SeedStat(object):
+    def __init__(stat, entity_name):
+        stat.entity_name = entity_name
+        stat.batch_count = stat.loaded_count = stat.accessed_count = 0
+    def copy(stat):
+        result = object.__new__(SeedStat)
+        result.__dict__.update(stat.__dict__)
+        return result
+    def merge(stat, stat2):
+        stat.batch_count += stat2.batch_count
+        stat.loaded_count += stat2.loaded_count
+        stat.accessed_count += stat2.accessed_count
+    @property
+    def accessed_ratio(stat):
+        if not stat.loaded_count: return None
+        return stat.accessed_count / stat.loaded_count
+
+class EntityCache(object):
+    def __init__(entity_cache, entity, ttl=None, max_size=None):
+        entity_cache.entity = entity
+        entity_cache.ttl = ttl
+        entity_cache.rows = LRUCache(max_size)  # raw pkval -> (expire time, real entity class, row, attr_offsets)
+        entity_cache.complete_layouts = {}  # (entity class, id of attr_offsets) -> bool
+    def is_complete(entity_cache, entity, attr_offsets):
+        key = entity, id(attr_offsets)
+        result = entity_cache.complete_layouts.get(key)
+        if result is None:
+            result = all(attr in attr_offsets for attr in entity._attrs_with_columns_ if not attr.lazy)
+            # attr_offsets dicts live in SQL caches, the reference keeps the id from being reused
+            entity_cache.complete_layouts[key] = result, attr_offsets
+        else: result = result[0]
+        return result
+    def get(entity_cache, raw_pkval):
+        item = entity_cache.rows.get(raw_pkval)
+        if item is None: return None
+        expire_time, real_entity_subclass, row, attr_offsets = item
+        if expire_time is not None and expire_time < time():
+            entity_cache.rows.pop(raw_pkval, None)
+            return None
+        return real_entity_subclass, row, attr_offsets
+    def put_many(entity_cache, items):
+        ttl = entity_cache.ttl
+        expire_time = time() + ttl if ttl is not None else None
+        rows = entity_cache.rows
+        for raw_pkval, real_entity_subclass, row, attr_offsets in items:
+            rows[raw_pkval] = expire_time, real_entity_subclass, row, attr_offsets
+    def invalidate(entity_cache, raw_pkval):
+        entity_cache.rows.pop(raw_pkval, None)
+    def clear(entity_cache):
+        entity_cache.rows.clear()
+    def stats(entity_cache):
+        return entity_cache.rows.stats()
+
 num_counter = itertools.count()
 
 class SessionCache(object):
@@ -1737,6 +2059,10 @@ class SessionCache(object):
         cache.objects = set()
         cache.indexes = defaultdict(dict)
         cache.seeds = defaultdict(set)
+        cache.seed_scope = None
+        cache.seed_scopes = {}  # seed -> seeds produced by the same query result or relationship load
+        cache.seed_stats = {}  # entity name -> SeedStat of the session
+        cache.loaded_seeds = {}  # seed loaded together with the object being accessed -> SeedStat
         cache.max_id_cache = {}
         cache.collection_statistics = {}
         cache.for_update = set()
@@ -1745,7 +2071,12 @@ class SessionCache(object):
         cache.objects_to_save = []
         cache.saved_objects = []
         cache.query_results = {}
+        cache.query_results_index = defaultdict(set)  # table -> keys of query results, None means unknown tables
         cache.dbvals_deduplication_cache = defaultdict(dict)
+        cache.entity_cache_version = database._entity_cache_version
+        cache.entity_cache_objects = set()  # updated and deleted objects of entities with second-level cache
+        cache.entity_caches_to_clear = set()  # second-level caches of entities changed by bulk queries
+        cache.modified_tables = set()  # tables written in the current transaction, None means unknown tables
         cache.modified = False
         cache.db_session = db_session = local.db_session
         cache.immediate = db_session is not None and db_session.immediate
@@ -1796,6 +2127,11 @@ class SessionCache(object):
             cache.db_session = db_session
             cache.immediate = cache.immediate or db_session.immediate
         else: assert cache.db_session is db_session, (cache.db_session, db_session)
+        worker = local.async_worker
+        if worker is not None and current_thread() is not worker.thread: throw(TransactionError,
+            'Database cannot be accessed synchronously inside of async db_session, '
+            'the connection belongs to the worker thread of the session. '
+            'Use fetch_async(), commit_async() or run_async() instead')
         connection = cache.connection
         if connection is None: connection = cache.connect()
         elif cache.immediate and not cache.in_transaction:
@@ -1818,8 +2154,17 @@ class SessionCache(object):
             if cache.in_transaction:
                 assert cache.connection is not None
                 cache.database.provider.commit(cache.connection, cache)
+            if cache.entity_cache_objects or cache.entity_caches_to_clear:
+                cache.database._invalidate_entity_cache_(cache.entity_cache_objects, cache.entity_caches_to_clear)
+                cache.entity_cache_objects.clear()
+                cache.entity_caches_to_clear.clear()
+                cache.entity_cache_version = cache.database._entity_cache_version
+            if cache.modified_tables:
+                cache.database._invalidate_tables_(cache.modified_tables)
+                cache.modified_tables.clear()
             cache.for_update.clear()
             cache.query_results.clear()
+            cache.query_results_index.clear()
             cache.max_id_cache.clear()
             cache.immediate = True
         except:
@@ -1835,6 +2180,9 @@ class SessionCache(object):
         database = cache.database
         x = local.db2cache.pop(database); assert x is cache
         cache.is_alive = False
+        if cache.seed_stats:
+            cache.count_accessed_seeds(cache.loaded_seeds)
+            database._update_seed_stats(cache.seed_stats)
         provider = database.provider
         connection = cache.connection
         if connection is None: return
@@ -1860,9 +2208,138 @@ class SessionCache(object):
                         if attr.is_collection:
                             if not setdata.is_fully_loaded: obj._vals_[attr] = None
 
-            cache.objects = cache.objects_to_save = cache.saved_objects = cache.query_results \
-                = cache.indexes = cache.seeds = cache.for_update = cache.max_id_cache \
-                = cache.modified_collections = cache.collection_statistics = cache.dbvals_deduplication_cache = None
+            cache.objects = cache.objects_to_save = cache.saved_objects = cache.query_results = cache.query_results_index \
+                = cache.indexes = cache.seeds = cache.seed_scopes = cache.seed_stats = cache.loaded_seeds = cache.for_update = cache.max_id_cache \
+                = cache.modified_collections = cache.collection_statistics = cache.dbvals_deduplication_cache \
+                = cache.entity_cache_objects = cache.entity_caches_to_clear = cache.modified_tables = None
+    def add_query_result(cache, query_key, result, tables):
+        cache.query_results[query_key] = result
+        query_results_index = cache.query_results_index
+        if tables is None: query_results_index[None].add(query_key)
+        else:
+            for table in tables: query_results_index[table].add(query_key)
+    def invalidate_query_results(cache, tables):
+        query_results = cache.query_results
+        if not query_results: return
+        query_results_index = cache.query_results_index
+        for table in chain(tables, (None,)):
+            keys = query_results_index.pop(table, None)
+            if keys is None: continue
+            for key in keys: query_results.pop(key, None)
+    def seeds_batch_loaded(cache, entity, seeds):
+        stat = cache.seed_stats.get(entity.__name__)
+        if stat is None: stat = cache.seed_stats[entity.__name__] = SeedStat(entity.__name__)
+        stat.batch_count += 1
+        stat.loaded_count += len(seeds)
+        loaded_seeds = cache.loaded_seeds
+        for seed in seeds: loaded_seeds[seed] = stat
+    def count_accessed_seeds(cache, seeds):
+        loaded_seeds = cache.loaded_seeds
+        for seed in list(seeds):
+            stat = loaded_seeds.pop(seed, None)
+            if stat is not None and (seed._rbits_ or seed._wbits_): stat.accessed_count += 1
+    def evict(cache, objects):
+        assert cache.is_alive
+        evicted = set()
+        for obj in objects:
+            if obj._session_cache_ is not cache: continue
+            if obj._status_ not in ('loaded', 'inserted', 'updated'): continue
+            if obj._wbits_ or obj in cache.for_update: continue
+            evicted.add(obj)
+        if not evicted: return
+        # objects referenced by attributes or by modified collections of other objects are kept,
+        # otherwise the identity map would be broken
+        collections = []
+        for obj2 in cache.objects:
+            if obj2 in evicted: continue
+            for attr, val in obj2._vals_.items():
+                if val is None: continue
+                if not attr.is_collection:
+                    if isinstance(val, Entity): evicted.discard(val)
+                    continue
+                if val.added: evicted.difference_update(val.added)
+                if val.removed: evicted.difference_update(val.removed)
+                collections.append(val)
+        if not evicted: return
+        for setdata in collections:
+            # evicted items are removed from other collections, such collections will be loaded again
+            if setdata.isdisjoint(evicted): continue
+            setdata -= evicted
+            if setdata.absent: setdata.absent -= evicted
+            setdata.is_fully_loaded = False
+            setdata.count = None
+        if cache.loaded_seeds: cache.count_accessed_seeds(evicted)
+        cache_indexes = cache.indexes
+        for obj in evicted:
+            cache.objects.discard(obj)
+            cache.seeds[obj._pk_attrs_].discard(obj)
+            scope = cache.seed_scopes.pop(obj, None)
+            if scope is not None: scope.pop(obj, None)
+            pk_index = cache_indexes.get(obj._pk_attrs_)
+            if pk_index is not None and pk_index.get(obj._pkval_) is obj: del pk_index[obj._pkval_]
+            vals = obj._vals_
+            for attr in obj._simple_keys_:
+                val = vals.get(attr)
+                if val is None: continue
+                cache_index = cache_indexes.get(attr)
+                if cache_index is not None and cache_index.get(val) is obj: del cache_index[val]
+            for attrs in obj._composite_keys_:
+                if not all(attr in vals for attr in attrs): continue
+                keyval = tuple(vals[attr] for attr in attrs)
+                cache_index = cache_indexes.get(attrs)
+                if cache_index is not None and cache_index.get(keyval) is obj: del cache_index[keyval]
+            obj._dbvals_ = obj._session_cache_ = None
+            for attr, setdata in vals.items():
+                if attr.is_collection:
+                    if setdata is not None and not setdata.is_fully_loaded: vals[attr] = None
+        cache.dbvals_deduplication_cache.clear()
+        query_results = cache.query_results
+        for query_key, items in list(query_results.items()):
+            if type(items) is not list: continue
+            for item in items:
+                if any(isinstance(x, Entity) and x in evicted for x in (item if type(item) is tuple else (item,))):
+                    del query_results[query_key]
+                    break
+    def unload_attrs(cache, entity, attrs):
+        cache_indexes = cache.indexes
+        objects = list(cache.objects)
+        for obj in objects:
+            if not isinstance(obj, entity) or obj._status_ in created_or_deleted_statuses: continue
+            vals = obj._vals_
+            for attr in attrs:
+                bit = obj._bits_.get(attr, 0)
+                if obj._wbits_ & bit: continue
+                obj._rbits_ &= ~bit
+                old_dbval = obj._dbvals_.pop(attr, NOT_LOADED)
+                if attr not in vals: continue
+                if attr.is_unique:
+                    cache_index = cache_indexes.get(attr)
+                    if cache_index is not None and cache_index.get(vals[attr]) is obj: del cache_index[vals[attr]]
+                for attrs2, i in attr.composite_keys:
+                    if not all(attr2 in vals for attr2 in attrs2): continue
+                    keyval = tuple(vals[attr2] for attr2 in attrs2)
+                    cache_index = cache_indexes.get(attrs2)
+                    if cache_index is not None and cache_index.get(keyval) is obj: del cache_index[keyval]
+                del vals[attr]
+                if attr.reverse and attr.reverse.is_collection and old_dbval not in (None, NOT_LOADED):
+                    attr.reverse.db_reverse_remove((old_dbval,), obj)
+        cache.unload_reverse_attrs(attrs)
+    def unload_reverse_attrs(cache, attrs):
+        objects = list(cache.objects)
+        for attr in attrs:
+            reverse = attr.reverse
+            if not reverse: continue
+            for obj2 in objects:
+                if not isinstance(obj2, reverse.entity) or reverse not in obj2._vals_: continue
+                if reverse.is_collection:
+                    setdata = obj2._vals_[reverse]
+                    if setdata is None: continue
+                    setdata.is_fully_loaded = False
+                    setdata.count = None
+                elif not obj2._wbits_ & obj2._bits_[reverse]:
+                    obj2._rbits_ &= ~obj2._bits_[reverse]
+                    obj2._vals_.pop(reverse)
+                    obj2._dbvals_.pop(reverse, None)
     @contextmanager
     def flush_disabled(cache):
         cache.noflush_counter += 1
@@ -1882,13 +2359,15 @@ class SessionCache(object):
                     for obj in cache.objects_to_save:  # can grow during iteration
                         if obj is not None: obj._before_save_()
 
-                    cache.query_results.clear()
                     modified_m2m = cache._calc_modified_m2m()
+                    modified_tables = { obj._table_ for obj in cache.objects_to_save if obj is not None }
+                    modified_tables.update(attr.table for attr in modified_m2m)
+                    cache.modified_tables.update(modified_tables)
+                    cache.invalidate_query_results(modified_tables)
                     for attr, (added, removed) in modified_m2m.items():
                         if not removed: continue
                         attr.remove_m2m(removed)
-                    for obj in cache.objects_to_save:
-                        if obj is not None: obj._save_()
+                    cache.save_objects()
                     for attr, (added, removed) in modified_m2m.items():
                         if not added: continue
                         attr.add_m2m(added)
@@ -1905,6 +2384,124 @@ class SessionCache(object):
         finally:
             if not cache.in_transaction:
                 cache.immediate = prev_immediate
+    def save_objects(cache):
+        batch_size = options.FLUSH_BATCH_SIZE
+        if not batch_size or batch_size < 2:
+            for obj in cache.objects_to_save:
+                if obj is not None: obj._save_()
+            return
+        provider = cache.database.provider
+        batches = {}  # (entity, attrs, auto_pk) -> (objects, values_list, new_dbvals_list)
+        pending = {}  # obj -> key of insert batch
+        run = None  # consecutive updates or deletes with the same SQL: (key, objects, arguments_list, new_dbvals_list)
+        for obj in cache.objects_to_save:  # can shrink during iteration
+            if obj is None: continue
+            status = obj._status_
+            keys, has_created_principals = cache._find_principal_batches(obj, pending)
+            if has_created_principals and run is not None:
+                cache._save_run(*run)
+                run = None
+            for key in list(batches):
+                if key in keys: cache._save_batch(key, batches, pending)
+            if status == 'modified':
+                obj._save_principal_objects_(None)
+                query_key, optimistic_converters, values, new_dbvals = obj._prepare_update_()
+                if query_key is None:
+                    obj._set_updated_(new_dbvals)
+                    obj._finish_save_()
+                    continue
+                sql, adapter = obj._get_update_sql_(query_key, optimistic_converters)
+                key, arguments, max_run_size = ('UPDATE', sql), adapter(values), batch_size
+            elif status == 'marked_to_delete' and not obj._self_referencing_:
+                key, arguments, new_dbvals = ('DELETE', obj.__class__._root_), None, None
+                max_run_size = provider.max_params_count // len(obj._pk_columns_)
+            else: key = None
+            if run is not None and run[0] != key:
+                cache._save_run(*run)
+                run = None
+            if key is not None:
+                if run is None: run = key, [], [], []
+                run[1].append(obj)
+                run[2].append(arguments)
+                run[3].append(new_dbvals)
+                if len(run[1]) >= max_run_size:
+                    cache._save_run(*run)
+                    run = None
+                continue
+            if status != 'created':
+                obj._save_()
+                continue
+            obj._save_principal_objects_(None)
+            auto_pk, attrs, values, new_dbvals = obj._prepare_insert_()
+            if not attrs:
+                obj._save_()
+                continue
+            key = obj.__class__, attrs, auto_pk
+            batch = batches.get(key)
+            if batch is None: batch = batches[key] = [], [], []
+            objects, values_list, new_dbvals_list = batch
+            objects.append(obj)
+            values_list.append(values)
+            new_dbvals_list.append(new_dbvals)
+            pending[obj] = key
+            max_batch_size = batch_size
+            if auto_pk and provider.multirow_insert_returning_support:
+                max_batch_size = min(batch_size, provider.max_params_count // len(values))
+            if len(objects) >= max_batch_size: cache._save_batch(key, batches, pending)
+        if run is not None: cache._save_run(*run)
+        for key in list(batches): cache._save_batch(key, batches, pending)
+    def _find_principal_batches(cache, obj, pending):
+        keys = set()
+        has_created_principals = False
+        stack = [ obj ]
+        seen = set()
+        while stack:
+            obj = stack.pop()
+            status = obj._status_
+            if status == 'created': attrs = obj._attrs_with_columns_
+            elif status == 'modified': attrs = obj._attrs_with_bit_(obj._attrs_with_columns_, obj._wbits_)
+            else: continue
+            for attr in attrs:
+                if not attr.reverse: continue
+                val = obj._vals_[attr]
+                if val is None or val._status_ != 'created' or val in seen: continue
+                seen.add(val)
+                has_created_principals = True
+                key = pending.get(val)
+                if key is not None: keys.add(key)
+                else: stack.append(val)
+        return keys, has_created_principals
+    def _save_batch(cache, key, batches, pending):
+        objects, values_list, new_dbvals_list = batches.pop(key)
+        for obj in objects: del pending[obj]
+        if len(objects) == 1:
+            obj = objects[0]
+            obj._save_created_()
+            obj._finish_save_()
+        else:
+            entity, attrs, auto_pk = key
+            entity._save_created_many_(objects, attrs, auto_pk, values_list, new_dbvals_list)
+    def _save_run(cache, key, objects, arguments_list, new_dbvals_list):
+        kind, x = key
+        if kind == 'DELETE':
+            if len(objects) == 1: objects[0]._save_deleted_()
+            else: x._save_deleted_many_(objects)
+        else: cache._save_updated_many_(x, objects, arguments_list, new_dbvals_list)
+        for obj in objects: obj._finish_save_()
+    def _save_updated_many_(cache, sql, objects, arguments_list, new_dbvals_list):
+        arguments = arguments_list if len(objects) > 1 else arguments_list[0]
+        cursor = cache.database._exec_sql(sql, arguments, start_transaction=True)
+        if cursor.rowcount < len(objects) and cache.db_session.optimistic:
+            if len(objects) == 1: throw(OptimisticCheckError, objects[0].find_updated_attributes())
+            # the total rowcount does not tell which row was not updated, so the rows of the batch are checked
+            for obj, new_dbvals in zip(objects, new_dbvals_list):
+                msg = obj.find_updated_attributes(new_dbvals)
+                if msg is not None: throw(OptimisticCheckError, msg)
+            objects_repr = ', '.join(safe_repr(obj) for obj in objects[:3]) + (', ...' if len(objects) > 3 else '')
+            throw(OptimisticCheckError, 'Some of objects %s were updated or deleted outside of current transaction'
+                                        % objects_repr)
+        for obj, new_dbvals in zip(objects, new_dbvals_list):
+            obj._set_updated_(new_dbvals)
     def call_after_save_hooks(cache):
         saved_objects = cache.saved_objects
         cache.saved_objects = []
@@ -2081,7 +2678,7 @@ class Attribute(object):
         attr._columns_checked = False
         attr.composite_keys = []
         attr.lazy = kwargs.pop('lazy', getattr(py_type, 'lazy', False))
-        attr.lazy_sql_cache = None
+        attr.lazy_sql_cache = {}
         attr.is_volatile = kwargs.pop('volatile', False)
         attr.optimistic = kwargs.pop('optimistic', None)
         attr.sql_default = kwargs.pop('sql_default', None)
@@ -2250,27 +2847,53 @@ class Attribute(object):
             return dbval
 
         if attr.lazy:
-            entity = attr.entity
-            database = entity._database_
-            if not attr.lazy_sql_cache:
-                select_list = [ 'ALL' ] + [ [ 'COLUMN', None, column ] for column in attr.columns ]
-                from_list = [ 'FROM', [ None, 'TABLE', entity._table_ ] ]
-                pk_columns = entity._pk_columns_
-                pk_converters = entity._pk_converters_
-                criteria_list = [ [ converter.EQ, [ 'COLUMN', None, column ], [ 'PARAM', (i, None, None), converter ] ]
-                                  for i, (column, converter) in enumerate(zip(pk_columns, pk_converters)) ]
-                sql_ast = [ 'SELECT', select_list, from_list, [ 'WHERE' ] + criteria_list ]
-                sql, adapter = database._ast2sql(sql_ast)
-                offsets = tuple(range(len(attr.columns)))
-                attr.lazy_sql_cache = sql, adapter, offsets
-            else: sql, adapter, offsets = attr.lazy_sql_cache
-            arguments = adapter(obj._get_raw_pkval_())
-            cursor = database._exec_sql(sql, arguments)
-            row = cursor.fetchone()
-            dbval = attr.parse_value(row, offsets, cache.dbvals_deduplication_cache)
-            attr.db_set(obj, dbval)
+            seeds = cache.seeds[obj._pk_attrs_]
+            objects = [ obj ]
+            for obj2 in cache.objects:
+                if obj2 is not obj and isinstance(obj2, attr.entity) and attr not in obj2._vals_ \
+                        and obj2._status_ not in created_or_deleted_statuses and obj2 not in seeds:
+                    objects.append(obj2)
+            loaded_objects = attr.lazy_load_all(objects)
+            if obj not in loaded_objects: throw(UnrepeatableReadError,
+                                                'Phantom object %s disappeared' % safe_repr(obj))
         else: obj._load_()
         return obj._vals_[attr]
+    def lazy_load_all(attr, objects):
+        entity = attr.entity
+        database = entity._database_
+        cache = database._get_cache()
+        pk_len = len(entity._pk_columns_)
+        offsets = tuple(range(pk_len, pk_len + len(attr.columns)))
+        max_batch_size = database.provider.max_params_count // pk_len
+        result = set()
+        for i in range(0, len(objects), max_batch_size):
+            batch = objects[i:i+max_batch_size]
+            pad_batch(database.provider, entity._pk_converters_, batch, max_batch_size)
+            sql, adapter = attr._construct_lazy_sql_(len(batch))
+            arguments = adapter(batch)
+            cursor = database._exec_sql(sql, arguments)
+            for row in cursor.fetchall():
+                obj = entity._get_by_raw_pkval_(row[:pk_len])
+                if attr in obj._vals_: continue
+                dbval = attr.parse_value(row, offsets, cache.dbvals_deduplication_cache)
+                attr.db_set(obj, dbval)
+                result.add(obj)
+        return result
+    def _construct_lazy_sql_(attr, batch_size):
+        entity = attr.entity
+        database = entity._database_
+        batch_size = get_batchload_size_key(database.provider, entity._pk_converters_, batch_size)
+        cached_sql = attr.lazy_sql_cache.get(batch_size)
+        if cached_sql is not None: return cached_sql
+        pk_columns = entity._pk_columns_
+        select_list = [ 'ALL' ] + [ [ 'COLUMN', None, column ] for column in chain(pk_columns, attr.columns) ]
+        from_list = [ 'FROM', [ None, 'TABLE', entity._table_ ] ]
+        row_value_syntax = database.provider.translator_cls.row_value_syntax
+        criteria_list = construct_batchload_criteria_list(
+            None, pk_columns, entity._pk_converters_, batch_size, row_value_syntax)
+        sql_ast = [ 'SELECT', select_list, from_list, [ 'WHERE' ] + criteria_list ]
+        cached_sql = attr.lazy_sql_cache[batch_size] = database._ast2sql(sql_ast)
+        return cached_sql
     @cut_traceback
     def __get__(attr, obj, cls=None):
         if obj is None: return attr
@@ -2768,7 +3391,22 @@ class SetData(set):
         setdata.added = setdata.removed = setdata.absent = None
         setdata.count = None
 
+def get_batchload_size_key(provider, converters, batch_size):
+    if batch_size > 1 and len(converters) == 1 and provider.is_array_param_type(converters[0].py_type):
+        return None  # all keys are passed as a single array parameter
+    return batch_size
+
+def pad_batch(provider, converters, batch, max_batch_size):
+    batch_size = len(batch)
+    if get_batchload_size_key(provider, converters, batch_size) in (None, 1): return
+    # round batch size up to power of two in order to reuse the same SQL text
+    padded_size = builtins.min(1 << (batch_size - 1).bit_length(), max_batch_size)
+    batch.extend([ batch[0] ] * (padded_size - batch_size))
+
 def construct_batchload_criteria_list(alias, columns, converters, batch_size, row_value_syntax, start=0, from_seeds=True):
+    if batch_size is None:
+        assert len(columns) == 1 and not start
+        return [ [ 'IN_ARRAY', [ 'COLUMN', alias, columns[0] ], [ 'ARRAY_PARAM', (None, None, 0), converters[0] ] ] ]
     assert batch_size > 0
     def param(i, j, converter):
         if from_seeds:
@@ -2984,17 +3622,8 @@ class Set(Collection):
         cache.collection_statistics[attr] = counter + 1
         return setdata
     def construct_sql_m2m(attr, batch_size=1, items_count=0):
-        if items_count:
-            assert batch_size == 1
-            cache_key = -items_count
-        else: cache_key = batch_size
-        cached_sql = attr.cached_load_sql.get(cache_key)
-        if cached_sql is not None: return cached_sql
         reverse = attr.reverse
         assert reverse is not None and reverse.is_collection and issubclass(reverse.py_type, Entity)
-        table_name = attr.table
-        assert table_name is not None
-        select_list = [ 'ALL' ]
         if not attr.symmetric:
             columns = attr.columns
             converters = attr.converters
@@ -3004,11 +3633,22 @@ class Set(Collection):
             columns = attr.reverse_columns
             rcolumns = attr.columns
             converters = rconverters = attr.converters
-        if batch_size > 1:
+        database = attr.entity._database_
+        if items_count:
+            assert batch_size == 1
+            cache_key = -items_count
+        else:
+            batch_size = get_batchload_size_key(database.provider, rconverters, batch_size)
+            cache_key = batch_size
+        cached_sql = attr.cached_load_sql.get(cache_key)
+        if cached_sql is not None: return cached_sql
+        table_name = attr.table
+        assert table_name is not None
+        select_list = [ 'ALL' ]
+        if batch_size != 1:
             select_list.extend([ 'COLUMN', 'T1', column ] for column in rcolumns)
         select_list.extend([ 'COLUMN', 'T1', column ] for column in columns)
         from_list = [ 'FROM', [ 'T1', 'TABLE', table_name ]]
-        database = attr.entity._database_
         row_value_syntax = database.provider.translator_cls.row_value_syntax
         where_list = [ 'WHERE' ]
         where_list += construct_batchload_criteria_list(
@@ -3776,6 +4416,34 @@ class EntityMeta(type):
                 'Interleave attribute should be part of relationship. Got: %r' % attr)
             entity._interleave_ = interleave
 
+        seed_batch_size = getattr(entity, '_seed_batch_size_', None)
+        if seed_batch_size is not None and (not isinstance(seed_batch_size, int_types) or seed_batch_size < 1):
+            throw(TypeError, '_seed_batch_size_ of entity %s should be positive integer. Got: %r'
+                             % (entity.__name__, seed_batch_size))
+        entity._seed_batch_size_ = seed_batch_size
+
+        if entity._root_ is not entity:
+            if '_cache_' in entity.__dict__: throw(TypeError,
+                '_cache_ option can be specified for root entity only. Got it in entity %s' % entity.__name__)
+            entity._entity_cache_ = entity._root_._entity_cache_
+        else:
+            cache_options = entity.__dict__.get('_cache_')
+            if cache_options is None: entity._entity_cache_ = None
+            else:
+                if not isinstance(cache_options, dict): throw(TypeError,
+                    '_cache_ option of entity %s should be dict. Got: %r' % (entity.__name__, cache_options))
+                unknown_options = set(cache_options) - {'ttl', 'max_size'}
+                if unknown_options: throw(TypeError, 'Unknown _cache_ option of entity %s: %s'
+                                                     % (entity.__name__, ', '.join(sorted(unknown_options))))
+                ttl = cache_options.get('ttl')
+                if ttl is not None and (not isinstance(ttl, (int_types, float)) or ttl <= 0): throw(TypeError,
+                    "'ttl' cache option of entity %s should be positive number. Got: %r" % (entity.__name__, ttl))
+                max_size = cache_options.get('max_size', options.ENTITY_CACHE_SIZE)
+                if max_size is not None and (not isinstance(max_size, int_types) or max_size < 1): throw(TypeError,
+                    "'max_size' cache option of entity %s should be positive integer. Got: %r"
+                    % (entity.__name__, max_size))
+                entity._entity_cache_ = EntityCache(entity, ttl, max_size)
+
         indexes = entity._indexes_ = entity.__dict__.get('_indexes_', [])
         for attr in new_attrs:
             if attr.is_unique: indexes.append(Index(attr, is_pk=isinstance(attr, PrimaryKey)))
@@ -3849,6 +4517,7 @@ class EntityMeta(type):
         entity._find_sql_cache_ = {}
         entity._load_sql_cache_ = {}
         entity._batchload_sql_cache_ = {}
+        entity._row_parsers_ = {}
         entity._insert_sql_cache_ = {}
         entity._update_sql_cache_ = {}
         entity._delete_sql_cache_ = {}
@@ -4094,6 +4763,124 @@ class EntityMeta(type):
                     if obj in seeds: obj._load_()
         if found_in_cache: shuffle(result)
         return result
+    @cut_traceback
+    def bulk_insert(entity, rows, batch_size=1000, return_ids=False):
+        return entity._bulk_insert_(rows, batch_size, return_ids, 'bulk_insert')
+    @cut_traceback
+    def copy_from(entity, rows, attrs=None, batch_size=10000):
+        if attrs is None:
+            attrs = [ attr.name for attr in entity._attrs_with_columns_
+                      if not (attr.is_pk and attr.auto) and not isinstance(attr, Discriminator) ]
+        else:
+            attrs = list(attrs)
+            for name in attrs:
+                if name not in entity._adict_: throw(TypeError, 'Unknown attribute %r' % name)
+        def normalize(rows):
+            for row in rows:
+                if isinstance(row, dict): yield row
+                elif isinstance(row, (tuple, list)):
+                    if len(row) != len(attrs): throw(TypeError,
+                        'Row length must be equal to the number of attributes (%d). Got: %s'
+                        % (len(attrs), truncate_repr(row)))
+                    yield dict(zip(attrs, row))
+                else: throw(TypeError, 'Row must be a dict or a tuple. Got: %s' % truncate_repr(row))
+        return entity._bulk_insert_(normalize(rows), batch_size, False, 'copy_from')
+    def _bulk_insert_(entity, rows, batch_size, return_ids, method_name):
+        database = entity._database_
+        if database.schema is None:
+            throw(ERDiagramError, 'Mapping is not generated for entity %r' % entity.__name__)
+        if not isinstance(batch_size, int_types) or batch_size < 1: throw(TypeError,
+            "'batch_size' argument of %s() method must be positive integer. Got: %r" % (method_name, batch_size))
+        provider = database.provider
+        use_copy = method_name == 'copy_from' and provider.copy_support
+        cache = database._get_cache()
+        cache.immediate = True
+        cache.prepare_connection_for_query_execution()  # may clear cache.query_results
+        batches = {}  # (attrs, auto_pk) -> (values_list, positions)
+        ids = []
+        count = 0
+        try:
+            for row in rows:
+                auto_pk, attrs, values, pkval = entity._prepare_bulk_insert_(row)
+                key = attrs, auto_pk
+                batch = batches.get(key)
+                if batch is None: batch = batches[key] = [], []
+                values_list, positions = batch
+                values_list.append(values)
+                if return_ids:
+                    positions.append(len(ids))
+                    ids.append(pkval)
+                count += 1
+                max_batch_size = batch_size
+                if provider.multirow_insert_returning_support and not use_copy:
+                    max_batch_size = min(batch_size, provider.max_params_count // max(len(values), 1))
+                if len(values_list) >= max_batch_size:
+                    entity._bulk_insert_batch_(attrs, auto_pk, values_list, positions, ids, return_ids, use_copy)
+                    del values_list[:], positions[:]
+            for (attrs, auto_pk), (values_list, positions) in batches.items():
+                if values_list:
+                    entity._bulk_insert_batch_(attrs, auto_pk, values_list, positions, ids, return_ids, use_copy)
+        finally:
+            cache.invalidate_query_results((entity._table_,))
+            cache.max_id_cache.clear()
+            cache.modified_tables.add(entity._table_)
+            cache.unload_reverse_attrs(entity._attrs_with_columns_)
+        return ids if return_ids else count
+    def _prepare_bulk_insert_(entity, row):
+        if not isinstance(row, dict): throw(TypeError, 'Row must be a dict. Got: %s' % truncate_repr(row))
+        for name in row:
+            attr = entity._adict_.get(name)
+            if attr is None: throw(TypeError, 'Unknown attribute %r' % name)
+            if attr.is_collection: throw(TypeError, 'Collection attribute %s cannot be used in bulk_insert()' % attr)
+        attrs = []
+        values = []
+        pk_raw_vals = {}
+        for attr in entity._attrs_with_columns_:
+            val = row.get(attr.name, DEFAULT)
+            reverse = attr.reverse
+            if not reverse or val is None or val is DEFAULT:
+                val = attr.validate(val, None, entity, from_db=False)
+                if val is None: raw_vals = None
+                elif not reverse: raw_vals = (attr.converters[0].val2dbval(val),)
+                else: raw_vals = val._get_raw_pkval_()
+            elif isinstance(val, reverse.entity): raw_vals = val._get_raw_pkval_()
+            else:
+                vals = val if type(val) is tuple else (val,)
+                if len(vals) != len(attr.converters): throw(TypeError,
+                    'Invalid number of columns were specified for attribute %s. Expected: %d, got: %d'
+                    % (attr, len(attr.converters), len(vals)))
+                raw_vals = tuple(converter.validate(x) for x, converter in zip(vals, attr.converters))
+            if attr.pk_offset is not None: pk_raw_vals[attr] = raw_vals or (None,)
+            if raw_vals is None: continue
+            attrs.append(attr)
+            values.extend(raw_vals)
+        raw_pkval = [ x for attr in entity._pk_attrs_ for x in pk_raw_vals[attr] ]
+        auto_pk = None in raw_pkval
+        pkval = raw_pkval[0] if len(raw_pkval) == 1 else tuple(raw_pkval)
+        return auto_pk, tuple(attrs), values, pkval
+    def _bulk_insert_batch_(entity, attrs, auto_pk, values_list, positions, ids, return_ids, use_copy=False):
+        database = entity._database_
+        provider = database.provider
+        returning = auto_pk and return_ids
+        try:
+            if use_copy and attrs:
+                columns = []
+                converters = []
+                for attr in attrs:
+                    columns.extend(attr.columns)
+                    converters.extend(attr.converters)
+                rows = ([ None if value is None else converter.py2sql(value)
+                          for value, converter in zip(values, converters) ] for values in values_list)
+                sql = provider.get_copy_from_sql(entity._table_, columns)
+                database._exec_copy(sql, provider.rows_to_copy_file(rows), start_transaction=True)
+                new_ids = None
+            else: new_ids = entity._insert_many_(attrs, returning, values_list)
+        except DatabaseError as e:
+            msg = " ".join(tostring(arg) for arg in e.args)
+            throw(TransactionIntegrityError if isinstance(e, IntegrityError) else UnexpectedError,
+                  'Rows cannot be inserted into table %s. %s: %s' % (entity._table_, e.__class__.__name__, msg), e)
+        if new_ids is not None:
+            for pos, new_id in zip(positions, new_ids): ids[pos] = new_id
     def _find_one_(entity, kwargs, for_update=False, nowait=False, skip_locked=False):
         if entity._database_.schema is None:
             throw(ERDiagramError, 'Mapping is not generated for entity %r' % entity.__name__)
@@ -4111,6 +4898,9 @@ class EntityMeta(type):
             if attr.is_collection:
                 throw(TypeError, 'Collection attribute %s cannot be specified as search criteria' % attr)
         obj, unique = entity._find_in_cache_(pkval, avdict, for_update)
+        if obj is None and pkval is not None and not for_update and entity._entity_cache_ is not None \
+                and len(avdict) == len(entity._pk_attrs_):
+            obj = entity._find_in_entity_cache_(pkval, avdict)
         if obj is None: obj = entity._find_in_db_(avdict, unique, for_update, nowait, skip_locked)
         if obj is None: throw(ObjectNotFound, entity, pkval)
         return obj
@@ -4163,6 +4953,30 @@ class EntityMeta(type):
             entity._set_rbits((obj,), avdict)
             return obj, unique
         return None, unique
+    def _find_in_entity_cache_(entity, pkval, avdict):
+        if not entity._pk_is_composite_: pkval = (pkval,)
+        raw_pkval = []
+        for attr, val in zip(entity._pk_attrs_, pkval):
+            if not attr.reverse: raw_pkval.append(val)
+            else: raw_pkval.extend(val._get_raw_pkval_())
+        obj = entity._get_from_entity_cache_(tuple(raw_pkval))
+        if obj is not None: entity._set_rbits((obj,), avdict)
+        return obj
+    def _get_from_entity_cache_(entity, raw_pkval):
+        cache = entity._database_._get_cache()
+        entity_cache = entity._entity_cache_
+        if cache.in_transaction or cache.modified or entity_cache in cache.entity_caches_to_clear:
+            return None  # the session could change rows which are still present in the second-level cache
+        item = entity_cache.get(raw_pkval)
+        if item is None: return None
+        real_entity_subclass, row, attr_offsets = item
+        if not issubclass(real_entity_subclass, entity): return None
+        parse_row = entity._get_row_parser_(attr_offsets)
+        real_entity_subclass, pkval, avdict = parse_row(row, cache.dbvals_deduplication_cache)
+        obj = real_entity_subclass._get_from_identity_map_(pkval, 'loaded')
+        if obj._status_ in del_statuses: return None
+        obj._db_set_(avdict)
+        return obj
     def _find_in_db_(entity, avdict, unique=False, for_update=False, nowait=False, skip_locked=False):
         database = entity._database_
         query_attrs = {attr: value is None for attr, value in avdict.items()}
@@ -4223,6 +5037,14 @@ class EntityMeta(type):
         discr_values.append([ 'VALUE', entity._discriminator_])
         return [ 'IN', [ 'COLUMN', alias, discr_attr.column ], discr_values ]
     def _construct_batchload_sql_(entity, batch_size, attr=None, from_seeds=True):
+        if attr is None:
+            columns = entity._pk_columns_
+            converters = entity._pk_converters_
+        else:
+            columns = attr.columns
+            converters = attr.converters
+        provider = entity._database_.provider
+        batch_size = get_batchload_size_key(provider, converters, batch_size)
         pc = local.prefetch_context
         attrs_to_prefetch = pc.get_frozen_attrs_to_prefetch(entity) if pc is not None else ()
         query_key = batch_size, attr, from_seeds, attrs_to_prefetch
@@ -4230,13 +5052,7 @@ class EntityMeta(type):
         if cached_sql is not None: return cached_sql
         select_list, attr_offsets = entity._construct_select_clause_(all_attributes=True)
         from_list = [ 'FROM', [ None, 'TABLE', entity._table_ ]]
-        if attr is None:
-            columns = entity._pk_columns_
-            converters = entity._pk_converters_
-        else:
-            columns = attr.columns
-            converters = attr.converters
-        row_value_syntax = entity._database_.provider.translator_cls.row_value_syntax
+        row_value_syntax = provider.translator_cls.row_value_syntax
         criteria_list = construct_batchload_criteria_list(
             None, columns, converters, batch_size, row_value_syntax, from_seeds=from_seeds)
         sql_ast = [ 'SELECT', select_list, from_list, [ 'WHERE' ] + criteria_list ]
@@ -4245,6 +5061,99 @@ class EntityMeta(type):
         cached_sql = sql, adapter, attr_offsets
         entity._batchload_sql_cache_[query_key] = cached_sql
         return cached_sql
+    def _get_insert_sql_(entity, attrs, auto_pk, rows_count=None, key_offset=None):
+        query_key = attrs, auto_pk, rows_count, key_offset
+        cached_sql = entity._insert_sql_cache_.get(query_key)
+        if cached_sql is not None: return cached_sql
+        database = entity._database_
+        columns = []
+        converters = []
+        for attr in attrs:
+            columns.extend(attr.columns)
+            converters.extend(attr.converters)
+        assert len(columns) == len(converters)
+        if rows_count is not None:
+            rows = [ [ [ 'PARAM', (i * len(converters) + j, None, None), converter ]
+                       for j, converter in enumerate(converters) ] for i in range(rows_count) ]
+            sql_ast = [ 'INSERT_MANY', entity._table_, columns, rows ]
+            if auto_pk: sql_ast.append([ entity._pk_columns_[0], columns[key_offset] ])
+        elif not columns and database.provider.dialect == 'Oracle':
+            sql_ast = [ 'INSERT', entity._table_, entity._pk_columns_,
+                        [ [ 'DEFAULT' ] for column in entity._pk_columns_ ] ]
+        else:
+            params = [ [ 'PARAM', (i, None, None),  converter ] for i, converter in enumerate(converters) ]
+            sql_ast = [ 'INSERT', entity._table_, columns, params ]
+        if auto_pk and rows_count is None: sql_ast.append(entity._pk_columns_[0])
+        cached_sql = database._ast2sql(sql_ast)
+        entity._insert_sql_cache_[query_key] = cached_sql
+        return cached_sql
+    def _get_insert_key_offset_(entity, attrs, values_list):
+        # RETURNING does not guarantee the order of rows, so generated ids are matched by values of unique column
+        offset = 0
+        for attr in attrs:
+            if attr.is_unique and not attr.reverse and attr.py_type in (int, str) and len(attr.columns) == 1:
+                keys = { values[offset] for values in values_list }
+                if None not in keys and len(keys) == len(values_list): return offset
+            offset += len(attr.columns)
+        return None
+    def _insert_many_(entity, attrs, auto_pk, values_list):
+        database = entity._database_
+        provider = database.provider
+        key_offset = None
+        if provider.multirow_insert_returning_support and attrs and auto_pk:
+            key_offset = entity._get_insert_key_offset_(attrs, values_list)
+        if not provider.multirow_insert_returning_support or not attrs or auto_pk and key_offset is None:
+            sql, adapter = entity._get_insert_sql_(attrs, auto_pk)
+            if auto_pk: return [ database._exec_sql(sql, adapter(values), returning_id=True, start_transaction=True)
+                                 for values in values_list ]
+            database._exec_sql(sql, [ adapter(values) for values in values_list ], start_transaction=True)
+            return None
+        new_ids = [] if auto_pk else None
+        start = 0
+        while start < len(values_list):
+            # row counts are powers of two, so only a few INSERT statements are cached for each set of attrs
+            rows_count = 1 << (len(values_list) - start).bit_length() - 1
+            chunk = values_list[start:start+rows_count]
+            start += rows_count
+            sql, adapter = entity._get_insert_sql_(attrs, auto_pk, rows_count, key_offset)
+            cursor = database._exec_sql(sql, adapter([ x for values in chunk for x in values ]), start_transaction=True)
+            if auto_pk:
+                key_to_id = { key: new_id for new_id, key in cursor.fetchall() }
+                new_ids.extend(key_to_id[values[key_offset]] for values in chunk)
+        return new_ids
+    def _save_created_many_(entity, objects, attrs, auto_pk, values_list, new_dbvals_list):
+        try:
+            new_ids = entity._insert_many_(attrs, auto_pk, values_list)
+            if new_ids is None: new_ids = repeat(None)
+        except DatabaseError as e:
+            msg = " ".join(tostring(arg) for arg in e.args)
+            objects_repr = ', '.join(safe_repr(obj) for obj in objects[:3]) + (', ...' if len(objects) > 3 else '')
+            throw(TransactionIntegrityError if isinstance(e, IntegrityError) else UnexpectedError,
+                  'Objects %s cannot be stored in the database. %s: %s'
+                  % (objects_repr, e.__class__.__name__, msg), e)
+        for obj, new_id, new_dbvals in zip(objects, new_ids, new_dbvals_list):
+            obj._set_inserted_(new_id, new_dbvals)
+            obj._finish_save_()
+    def _save_deleted_many_(entity, objects):
+        database = entity._database_
+        query_key = get_batchload_size_key(database.provider, entity._pk_converters_, len(objects))
+        cached_sql = entity._delete_sql_cache_.get(query_key)
+        if cached_sql is None:
+            row_value_syntax = database.provider.translator_cls.row_value_syntax
+            criteria_list = construct_batchload_criteria_list(
+                None, entity._pk_columns_, entity._pk_converters_, query_key, row_value_syntax)
+            from_ast = [ 'FROM', [ None, 'TABLE', entity._table_ ] ]
+            sql_ast = [ 'DELETE', None, from_ast, [ 'WHERE' ] + criteria_list ]
+            cached_sql = database._ast2sql(sql_ast)
+            entity._delete_sql_cache_[query_key] = cached_sql
+        sql, adapter = cached_sql
+        arguments = adapter(objects)
+        database._exec_sql(sql, arguments, start_transaction=True)
+        cache = database._get_cache()
+        index = cache.indexes[entity._pk_attrs_]
+        for obj in objects:
+            obj._status_ = 'deleted'
+            index.pop(obj._pkval_)
     def _construct_sql_(entity, query_attrs, order_by_pk=False, limit=None, for_update=False, nowait=False, skip_locked=False):
         if nowait or skip_locked: assert for_update
         sorted_query_attrs = tuple(sorted(query_attrs.items()))
@@ -4296,17 +5205,35 @@ class EntityMeta(type):
                 throw(TooManyObjectsFoundError,
                     'Found more then pony.options.MAX_FETCH_COUNT=%d objects' % options.MAX_FETCH_COUNT)
         else: rows = cursor.fetchall()
-        objects = []
-        if attr_offsets is None:
-            objects = [ entity._get_by_raw_pkval_(row, for_update) for row in rows ]
-            entity._load_many_(objects)
-        else:
-            for row in rows:
-                real_entity_subclass, pkval, avdict = entity._parse_row_(row, attr_offsets)
-                obj = real_entity_subclass._get_from_identity_map_(pkval, 'loaded', for_update)
-                if obj._status_ in del_statuses: continue
-                obj._db_set_(avdict)
-                objects.append(obj)
+        return entity._objects_from_rows_(rows, attr_offsets, for_update, used_attrs)
+    def _objects_from_rows_(entity, rows, attr_offsets, for_update=False, used_attrs=()):
+        database = entity._database_
+        cache = database._get_cache()
+        entity_cache = entity._entity_cache_
+        if entity_cache is not None and (for_update or cache.in_transaction or cache.modified):
+            entity_cache = None  # uncommitted rows should not be visible to other sessions
+        entity_cache_items = []
+        prev_seed_scope = cache.seed_scope
+        cache.seed_scope = defaultdict(dict)
+        try:
+            objects = []
+            if attr_offsets is None:
+                objects = [ entity._get_by_raw_pkval_(row, for_update) for row in rows ]
+                entity._load_many_(objects)
+            else:
+                parse_row = entity._get_row_parser_(attr_offsets)
+                dbvals_deduplication_cache = cache.dbvals_deduplication_cache
+                for row in rows:
+                    real_entity_subclass, pkval, avdict = parse_row(row, dbvals_deduplication_cache)
+                    obj = real_entity_subclass._get_from_identity_map_(pkval, 'loaded', for_update)
+                    if obj._status_ in del_statuses: continue
+                    obj._db_set_(avdict)
+                    objects.append(obj)
+                    if entity_cache is not None and entity_cache.is_complete(real_entity_subclass, attr_offsets):
+                        entity_cache_items.append((obj._get_raw_pkval_(), real_entity_subclass, row, attr_offsets))
+        finally: cache.seed_scope = prev_seed_scope
+        if entity_cache_items:
+            database._put_to_entity_cache_(entity_cache, cache.entity_cache_version, entity_cache_items)
         if used_attrs: entity._set_rbits(objects, used_attrs)
         return objects
     def _set_rbits(entity, objects, attrs):
@@ -4348,6 +5275,75 @@ class EntityMeta(type):
         assert None not in pkval
         if not entity._pk_is_composite_: pkval = pkval[0]
         return real_entity_subclass, pkval, avdict
+    def _get_row_parser_(entity, attr_offsets):
+        root = entity._root_
+        layout = tuple((attr, tuple(offsets)) for attr, offsets in attr_offsets.items())
+        parser = root._row_parsers_.get(layout)
+        if parser is None:
+            parser = root._row_parsers_[layout] = root._generate_row_parser_(attr_offsets)
+        return parser
+    def _generate_row_parser_(entity, attr_offsets):
+        def parse_row_slow(row, dbvals_deduplication_cache):
+            return entity._parse_row_(row, attr_offsets)
+        discr_attr = entity._discriminator_attr_
+        if not discr_attr:
+            return entity._generate_subclass_row_parser_(entity, attr_offsets, parse_row_slow)
+        if discr_attr not in attr_offsets: return parse_row_slow
+        parsers = { cls: entity._generate_subclass_row_parser_(cls, attr_offsets, parse_row_slow)
+                    for cls in chain((entity,), entity._subclasses_) }
+        code2cls = discr_attr.code2cls
+        discr_offset = attr_offsets[discr_attr][0]
+        def parse_row(row, dbvals_deduplication_cache):
+            real_entity_subclass = code2cls[row[discr_offset]]
+            return parsers[real_entity_subclass](row, dbvals_deduplication_cache)
+        return parse_row
+    def _generate_subclass_row_parser_(entity, real_entity_subclass, attr_offsets, parse_row_slow):
+        # generates the function which does the same as _parse_row_, but without generic per-attribute dispatch;
+        # unusual values (NULL in primary key, empty value of required attribute) are passed to _parse_row_
+        namespace = dict(real_entity_subclass=real_entity_subclass, parse_row_slow=parse_row_slow)
+        lines = [ 'def parse_row(row, dbvals_deduplication_cache):' ]
+        numbers = {}
+        for i, attr in enumerate(real_entity_subclass._attrs_):
+            offsets = attr_offsets.get(attr)
+            if offsets is None: continue
+            numbers[attr] = i
+            namespace['attr%d' % i] = attr
+            namespace['offsets%d' % i] = offsets
+            if attr.is_discriminator:
+                namespace['val%d' % i] = real_entity_subclass._discriminator_
+            elif attr.reverse and len(offsets) == 1:
+                namespace['get_by_raw_pkval%d' % i] = attr.py_type._get_by_raw_pkval_
+                lines.append('    val%d = row[%d]' % (i, offsets[0]))
+                lines.append('    if val%d is not None: val%d = get_by_raw_pkval%d((val%d,))' % (i, i, i, i))
+            elif attr.reverse or len(offsets) > 1 or (attr.converters and (
+                    len(attr.converters) != 1 or attr.converters[0] is None)):
+                lines.append('    val%d = attr%d.parse_value(row, offsets%d, dbvals_deduplication_cache)' % (i, i, i))
+            else:
+                lines.append('    val%d = row[%d]' % (i, offsets[0]))
+                lines.append('    if val%d is not None:' % i)
+                if attr.converters:
+                    namespace['sql2py%d' % i] = attr.converters[0].sql2py
+                    lines.append('        val%d = sql2py%d(val%d)' % (i, i, i))
+                else:
+                    namespace['py_type%d' % i] = attr.py_type
+                    lines.append('        if type(val%d) is not py_type%d: val%d = py_type%d(val%d)' % (i, i, i, i, i))
+                lines.append('        try: val%d = dbvals_deduplication_cache[type(val%d)].setdefault(val%d, val%d)'
+                             % (i, i, i, i))
+                lines.append('        except TypeError: pass')
+                if isinstance(attr, Required):
+                    if attr.auto or attr.is_volatile or attr.sql_default: condition = "val%d == ''" % i
+                    else: condition = "val%d is None or val%d == ''" % (i, i)
+                    lines.append('    if %s: return parse_row_slow(row, dbvals_deduplication_cache)' % condition)
+        pk_vals = [ 'val%d' % numbers[attr] for attr in entity._pk_attrs_ ]
+        lines.append('    if None in (%s,): return parse_row_slow(row, dbvals_deduplication_cache)' % ', '.join(pk_vals))
+        pkval = '(%s,)' % ', '.join(pk_vals) if entity._pk_is_composite_ else pk_vals[0]
+        items = ', '.join('attr%d: val%d' % (i, i) for attr, i in numbers.items() if attr.pk_offset is None)
+        lines.append('    return real_entity_subclass, %s, {%s}' % (pkval, items))
+        lines[1:] = [ '    try:' ] + [ '    ' + line for line in lines[1:] ] + [
+            '    except UnicodeDecodeError: return parse_row_slow(row, dbvals_deduplication_cache)' ]
+        code = compile('\n'.join(lines), '<pony row parser of %s>' % real_entity_subclass.__name__, 'exec')
+        exec(code, namespace)
+        return namespace['parse_row']
     def _load_many_(entity, objects):
         database = entity._database_
         cache = database._get_cache()
@@ -4444,6 +5440,11 @@ class EntityMeta(type):
                         obj._vals_[attr] = val
                         if attr.reverse: attr.db_update_reverse(obj, NOT_LOADED, val)
                     cache.seeds[pk_attrs].add(obj)
+                    seed_scope = cache.seed_scope
+                    if seed_scope is not None:
+                        scope = seed_scope[pk_attrs]
+                        scope[obj] = None
+                        cache.seed_scopes[obj] = scope
                 elif status == 'created':
                     assert undo_funcs is not None
                     obj._rbits_ = obj._wbits_ = None
@@ -4795,11 +5796,17 @@ class Entity(object, metaclass=EntityMeta):
         return '%s[%s]' % (obj.__class__.__name__, pkval)
     @classmethod
     def _prefetch_load_all_(entity, objects):
-        objects = sorted(objects, key=entity._get_raw_pkval_)
         database = entity._database_
         cache = database._get_cache()
         if cache is None or not cache.is_alive:
             throw(DatabaseSessionIsOver, 'Cannot load objects from the database: the database session is over')
+        seeds = cache.seeds[entity._pk_attrs_]
+        loaded_objects = [ obj for obj in objects if obj not in seeds ]
+        if loaded_objects:
+            # objects which are already loaded need only lazy attributes, not the whole row
+            entity._prefetch_lazy_attrs_(loaded_objects)
+            objects = [ obj for obj in objects if obj in seeds ]
+        objects = sorted(objects, key=entity._get_raw_pkval_)
         max_batch_size = database.provider.max_params_count // len(entity._pk_columns_)
         for i in range(0, len(objects), max_batch_size):
             batch = objects[i:i+max_batch_size]
@@ -4807,6 +5814,18 @@ class Entity(object, metaclass=EntityMeta):
             arguments = adapter(batch)
             cursor = database._exec_sql(sql, arguments)
             entity._fetch_objects(cursor, attr_offsets)
+    @classmethod
+    def _prefetch_lazy_attrs_(entity, objects):
+        pc = local.prefetch_context
+        if pc is None: return
+        for entity2, attrs_to_prefetch in pc.attrs_to_prefetch_dict.items():
+            if entity2._root_ is not entity._root_: continue
+            for attr in sorted(attrs_to_prefetch, key=attrgetter('id')):
+                if not attr.lazy or not attr.columns: continue
+                objects_to_load = [ obj for obj in objects if isinstance(obj, attr.entity)
+                                    and obj._status_ not in created_or_deleted_statuses
+                                    and attr not in obj._vals_ ]
+                if objects_to_load: attr.lazy_load_all(objects_to_load)
     def _load_(obj):
         cache = obj._session_cache_
         if cache is None or not cache.is_alive: throw_db_session_is_over('load object', obj)
@@ -4814,18 +5833,26 @@ class Entity(object, metaclass=EntityMeta):
         database = entity._database_
         if cache is not database._get_cache():
             throw(TransactionError, "Object %s doesn't belong to current transaction" % safe_repr(obj))
+        if entity._entity_cache_ is not None and entity._get_from_entity_cache_(obj._get_raw_pkval_()) is obj:
+            return
         seeds = cache.seeds[entity._pk_attrs_]
         max_batch_size = database.provider.max_params_count // len(entity._pk_columns_)
+        seed_batch_size = entity._seed_batch_size_ or options.SEED_BATCH_SIZE
+        if seed_batch_size is not None: max_batch_size = builtins.min(max_batch_size, seed_batch_size)
+        scope = cache.seed_scopes.get(obj)
         objects = [ obj ]
-        for seed in seeds:
+        for seed in seeds if scope is None else scope:
             if len(objects) >= max_batch_size: break
             if seed is not obj: objects.append(seed)
+        batch_size = len(objects)
+        pad_batch(database.provider, entity._pk_converters_, objects, max_batch_size)
         sql, adapter, attr_offsets = entity._construct_batchload_sql_(len(objects))
         arguments = adapter(objects)
         cursor = database._exec_sql(sql, arguments)
         objects = entity._fetch_objects(cursor, attr_offsets)
         if obj not in objects: throw(UnrepeatableReadError,
                                      'Phantom object %s disappeared' % safe_repr(obj))
+        if batch_size > 1: cache.seeds_batch_loaded(entity, [ seed for seed in objects if seed is not obj ])
     @cut_traceback
     def load(obj, *attrs):
         cache = obj._session_cache_
@@ -4909,6 +5936,8 @@ class Entity(object, metaclass=EntityMeta):
         cache = obj._session_cache_
         assert cache is not None and cache.is_alive
         cache.seeds[obj._pk_attrs_].discard(obj)
+        scope = cache.seed_scopes.pop(obj, None)
+        if scope is not None: scope.pop(obj, None)
         if not avdict: return
 
         get_val = obj._vals_.get
@@ -5226,7 +6255,7 @@ class Entity(object, metaclass=EntityMeta):
             del vals[attr]
             dbvals.pop(attr, None)
 
-    def _save_created_(obj):
+    def _prepare_insert_(obj):
         auto_pk = (obj._pkval_ is None)
         attrs = []
         values = []
@@ -5244,28 +6273,12 @@ class Entity(object, metaclass=EntityMeta):
                 else:
                     new_dbvals[attr] = val
                     values.extend(attr.get_raw_values(val))
-        attrs = tuple(attrs)
-
-        database = obj._database_
-        cached_sql = obj._insert_sql_cache_.get(attrs)
-        if cached_sql is None:
-            columns = []
-            converters = []
-            for attr in attrs:
-                columns.extend(attr.columns)
-                converters.extend(attr.converters)
-            assert len(columns) == len(converters)
-            params = [ [ 'PARAM', (i, None, None),  converter ] for i, converter in enumerate(converters) ]
-            entity = obj.__class__
-            if not columns and database.provider.dialect == 'Oracle':
-                sql_ast = [ 'INSERT', entity._table_, obj._pk_columns_,
-                            [ [ 'DEFAULT' ] for column in obj._pk_columns_ ] ]
-            else: sql_ast = [ 'INSERT', entity._table_, columns, params ]
-            if auto_pk: sql_ast.append(entity._pk_columns_[0])
-            sql, adapter = database._ast2sql(sql_ast)
-            entity._insert_sql_cache_[attrs] = sql, adapter
-        else: sql, adapter = cached_sql
-
+        return auto_pk, tuple(attrs), values, new_dbvals
+    def _save_created_(obj):
+        auto_pk, attrs, values, new_dbvals = obj._prepare_insert_()
+        entity = obj.__class__
+        database = entity._database_
+        sql, adapter = entity._get_insert_sql_(attrs, auto_pk)
         arguments = adapter(values)
         try:
             if auto_pk: new_id = database._exec_sql(sql, arguments, returning_id=True,
@@ -5280,8 +6293,9 @@ class Entity(object, metaclass=EntityMeta):
             msg = " ".join(tostring(arg) for arg in e.args)
             throw(UnexpectedError, 'Object %r cannot be stored in the database. %s: %s'
                                    % (obj, e.__class__.__name__, msg), e)
-
-        if auto_pk:
+        obj._set_inserted_(new_id if auto_pk else None, new_dbvals)
+    def _set_inserted_(obj, new_id, new_dbvals):
+        if new_id is not None:
             pk_attrs = obj._pk_attrs_
             cache_index = obj._session_cache_.indexes[pk_attrs]
             obj2 = cache_index.setdefault(new_id, obj)
@@ -5294,7 +6308,7 @@ class Entity(object, metaclass=EntityMeta):
         obj._rbits_ = obj._all_bits_except_volatile_
         obj._wbits_ = 0
         obj._update_dbvals_(True, new_dbvals)
-    def _save_updated_(obj):
+    def _prepare_update_(obj):
         update_columns = []
         values = []
         new_dbvals = {}
@@ -5309,41 +6323,49 @@ class Entity(object, metaclass=EntityMeta):
             else:
                 new_dbvals[attr] = val
                 values.extend(attr.get_raw_values(val))
-        if update_columns:
-            for attr in obj._pk_attrs_:
-                val = obj._vals_[attr]
-                values.extend(attr.get_raw_values(val))
-            cache = obj._session_cache_
-            optimistic_session = cache.db_session is None or cache.db_session.optimistic
-            if optimistic_session and obj not in cache.for_update:
-                optimistic_ops, optimistic_columns, optimistic_converters, optimistic_values = \
-                    obj._construct_optimistic_criteria_()
-                values.extend(optimistic_values)
-            else: optimistic_columns = optimistic_converters = optimistic_ops = ()
-            query_key = tuple(update_columns), tuple(optimistic_columns), tuple(optimistic_ops)
-            database = obj._database_
-            cached_sql = obj._update_sql_cache_.get(query_key)
-            if cached_sql is None:
-                update_converters = []
-                for attr in obj._attrs_with_bit_(obj._attrs_with_columns_, obj._wbits_):
-                    update_converters.extend(attr.converters)
-                assert len(update_columns) == len(update_converters)
-                update_params = [ [ 'PARAM', (i, None, None), converter ] for i, converter in enumerate(update_converters) ]
-                params_count = len(update_params)
-                where_list = [ 'WHERE' ]
-                pk_columns = obj._pk_columns_
-                pk_converters = obj._pk_converters_
-                params_count = populate_criteria_list(where_list, pk_columns, pk_converters, repeat('EQ'), params_count)
-                if optimistic_columns: populate_criteria_list(
-                    where_list, optimistic_columns, optimistic_converters, optimistic_ops, params_count, optimistic=True)
-                sql_ast = [ 'UPDATE', obj._table_, list(zip(update_columns, update_params)), where_list ]
-                sql, adapter = database._ast2sql(sql_ast)
-                obj._update_sql_cache_[query_key] = sql, adapter
-            else: sql, adapter = cached_sql
+        if not update_columns: return None, None, values, new_dbvals
+        for attr in obj._pk_attrs_:
+            val = obj._vals_[attr]
+            values.extend(attr.get_raw_values(val))
+        cache = obj._session_cache_
+        optimistic_session = cache.db_session is None or cache.db_session.optimistic
+        if optimistic_session and obj not in cache.for_update:
+            optimistic_ops, optimistic_columns, optimistic_converters, optimistic_values = \
+                obj._construct_optimistic_criteria_()
+            values.extend(optimistic_values)
+        else: optimistic_columns = optimistic_converters = optimistic_ops = ()
+        query_key = tuple(update_columns), tuple(optimistic_columns), tuple(optimistic_ops)
+        return query_key, optimistic_converters, values, new_dbvals
+    def _get_update_sql_(obj, query_key, optimistic_converters):
+        cached_sql = obj._update_sql_cache_.get(query_key)
+        if cached_sql is not None: return cached_sql
+        update_columns, optimistic_columns, optimistic_ops = query_key
+        update_converters = []
+        for attr in obj._attrs_with_bit_(obj._attrs_with_columns_, obj._wbits_):
+            update_converters.extend(attr.converters)
+        assert len(update_columns) == len(update_converters)
+        update_params = [ [ 'PARAM', (i, None, None), converter ] for i, converter in enumerate(update_converters) ]
+        params_count = len(update_params)
+        where_list = [ 'WHERE' ]
+        pk_columns = obj._pk_columns_
+        pk_converters = obj._pk_converters_
+        params_count = populate_criteria_list(where_list, pk_columns, pk_converters, repeat('EQ'), params_count)
+        if optimistic_columns: populate_criteria_list(
+            where_list, optimistic_columns, optimistic_converters, optimistic_ops, params_count, optimistic=True)
+        sql_ast = [ 'UPDATE', obj._table_, list(zip(update_columns, update_params)), where_list ]
+        cached_sql = obj._database_._ast2sql(sql_ast)
+        obj._update_sql_cache_[query_key] = cached_sql
+        return cached_sql
+    def _save_updated_(obj):
+        query_key, optimistic_converters, values, new_dbvals = obj._prepare_update_()
+        if query_key is not None:
+            sql, adapter = obj._get_update_sql_(query_key, optimistic_converters)
             arguments = adapter(values)
-            cursor = database._exec_sql(sql, arguments, start_transaction=True)
-            if cursor.rowcount == 0 and cache.db_session.optimistic:
+            cursor = obj._database_._exec_sql(sql, arguments, start_transaction=True)
+            if cursor.rowcount == 0 and obj._session_cache_.db_session.optimistic:
                 throw(OptimisticCheckError, obj.find_updated_attributes())
+        obj._set_updated_(new_dbvals)
+    def _set_updated_(obj, new_dbvals):
         obj._status_ = 'updated'
         obj._rbits_ |= obj._wbits_ & obj._all_bits_except_volatile_
         obj._wbits_ = 0
@@ -5368,7 +6390,7 @@ class Entity(object, metaclass=EntityMeta):
         obj._status_ = 'deleted'
         cache.indexes[obj._pk_attrs_].pop(obj._pkval_)
 
-    def find_updated_attributes(obj):
+    def find_updated_attributes(obj, new_dbvals=None):
         entity = obj.__class__
         attrs_to_select = []
         attrs_to_select.extend(entity._pk_attrs_)
@@ -5405,12 +6427,15 @@ class Entity(object, metaclass=EntityMeta):
             return "Object %s was deleted outside of current transaction" % safe_repr(obj)
 
         real_entity_subclass, pkval, avdict = entity._parse_row_(row, attr_offsets)
+        def dbvals_equal(attr, dbval, dbval2):
+            return dbval == dbval2 or not attr.reverse and attr.converters[0].dbvals_equal(dbval, dbval2)
+        if new_dbvals is not None and all(dbvals_equal(attr, new_dbvals.get(attr, obj._dbvals_[attr]), dbval)
+                                          for attr, dbval in avdict.items()):
+            return None  # the row was updated by the current transaction
         diff = []
         for attr, new_dbval in avdict.items():
             old_dbval = obj._dbvals_[attr]
-            converter = attr.converters[0]
-            if old_dbval != new_dbval and (
-                    attr.reverse or not converter.dbvals_equal(old_dbval, new_dbval)):
+            if not dbvals_equal(attr, old_dbval, new_dbval):
                 diff.append('%s (%r -> %r)' % (attr.name, old_dbval, new_dbval))
 
         return "Object %s was updated outside of current transaction%s" % (
@@ -5425,7 +6450,8 @@ class Entity(object, metaclass=EntityMeta):
         elif status == 'modified': obj._save_updated_()
         elif status == 'marked_to_delete': obj._save_deleted_()
         else: assert False, "_save_() called for object %r with incorrect status %s" % (obj, status)  # pragma: no cover
-
+        obj._finish_save_()
+    def _finish_save_(obj):
         assert obj._status_ in saved_statuses
         cache = obj._session_cache_
         assert cache is not None and cache.is_alive
@@ -5448,12 +6474,15 @@ class Entity(object, metaclass=EntityMeta):
             obj._before_save_() # should be inside flush_disabled to prevent infinite recursion
                                 # TODO: add to documentation that flush is disabled inside before_xxx hooks
             obj._save_()
+        cache.modified_tables.add(obj._table_)
         cache.call_after_save_hooks()
     def _before_save_(obj):
         status = obj._status_
         if status == 'created': obj.before_insert()
         elif status == 'modified': obj.before_update()
         elif status == 'marked_to_delete': obj.before_delete()
+        if obj._entity_cache_ is not None and status != 'created':
+            obj._session_cache_.entity_cache_objects.add(obj)
     def before_insert(obj):
         pass
     def before_update(obj):
@@ -5666,6 +6695,18 @@ def extract_vars(code_key, filter_num, extractors, globals, locals, cells=None):
 def unpickle_query(query_result):
     return query_result
 
+def get_sql_ast_tables(sql_ast):
+    # returns None if the query contains raw SQL fragments and the set of tables cannot be known
+    tables = set()
+    stack = [ sql_ast ]
+    while stack:
+        node = stack.pop()
+        if not node: continue
+        if node[0] == 'RAWSQL': return None
+        if len(node) > 2 and node[1] == 'TABLE': tables.add(node[2])  # [ alias, 'TABLE', table_name, ... ]
+        stack.extend(item for item in node if type(item) is list)
+    return tuple(sorted(tables, key=repr))
+
 class Query(object):
     def __init__(query, code_key, tree, globals, locals, cells=None, left_join=False):
         assert isinstance(tree, ast.GeneratorExp)
@@ -5709,6 +6750,8 @@ class Query(object):
         translator, vars = query._get_translator(query._key, vars)
         query._vars = vars
 
+        if translator is None and prev_query is None:
+            translator = query._load_persistent_translator(extractors)
         if translator is None:
             pickled_tree = pickle_ast(tree)
             tree_copy = unpickle_ast(pickled_tree)  # tree = deepcopy(tree)
@@ -5730,6 +6773,7 @@ class Query(object):
             translator.pickled_tree = pickled_tree
             if translator.can_be_cached:
                 database._translator_cache[query._key] = translator
+                if prev_query is None: query._store_persistent_translator(translator, extractors)
 
         query._translator = translator
         query._filters = ()
@@ -5738,6 +6782,8 @@ class Query(object):
         query._distinct = None
         query._prefetch = False
         query._prefetch_context = PrefetchContext(query._database)
+        query._shared_cache = False
+        query._cache_ttl = None
     def _get_query(query):
         return query
     def _get_type_(query):
@@ -5771,12 +6817,38 @@ class Query(object):
             for key, val in translator.fixed_param_values.items():
                 assert key in new_vars
                 if val != new_vars[key]:
-                    del database._translator_cache[query_key]
+                    database._translator_cache.pop(query_key, None)
                     return None, vars.copy()
         return translator, new_vars
+    def _load_persistent_translator(query, extractors):
+        persistent_cache = get_persistent_cache()
+        if persistent_cache is None: return None
+        database = query._database
+        translator = persistent_cache.load('translator', query._key, database, query._code_key, extractors)
+        if translator is None: return None
+        vars = query._vars
+        for key, val in translator.fixed_param_values.items():
+            if key not in vars or val != vars[key]: return None
+        database._translator_cache[query._key] = translator
+        return translator
+    def _store_persistent_translator(query, translator, extractors):
+        persistent_cache = get_persistent_cache()
+        if persistent_cache is None or translator.func_extractors_map: return
+        persistent_cache.store('translator', query._key, translator, query._database, query._code_key, extractors)
     def _construct_sql_and_arguments(query, limit=None, offset=None, range=None, aggr_func_name=None, aggr_func_distinct=None, sep=None):
         translator = query._translator
         expr_type = translator.expr_type
+        database = query._database
+        vars = query._vars
+        limit_params = options.LIMIT_AS_PARAMS and database.provider.limit_params_support \
+                       and translator.limit is None and translator.offset is None \
+                       and (limit is not None or offset)
+        if limit_params:
+            vars = dict(vars)
+            vars[LIMIT_VARKEY] = limit
+            vars[OFFSET_VARKEY] = offset or 0
+            limit = 'param' if limit is not None else None
+            offset = 'param'
         attrs_to_prefetch_dict = query._prefetch_context.attrs_to_prefetch_dict
         if isinstance(expr_type, EntityMeta) and attrs_to_prefetch_dict:
             attrs_to_prefetch = tuple(sorted(attrs_to_prefetch_dict.get(expr_type, ())))
@@ -5796,60 +6868,130 @@ class Query(object):
             inner_join_syntax=options.INNER_JOIN_SYNTAX,
             attrs_to_prefetch=attrs_to_prefetch
         )
-        database = query._database
         cache_entry = database._constructed_sql_cache.get(sql_key)
         if cache_entry is None:
-            sql_ast, attr_offsets = translator.construct_sql_ast(
-                limit, offset, query._distinct, aggr_func_name, aggr_func_distinct, sep,
-                query._for_update, query._nowait, query._skip_locked)
-            cache = database._get_cache()
-            sql, adapter = database.provider.ast2sql(sql_ast)
-            cache_entry = sql, adapter, attr_offsets
+            persistent_cache = get_persistent_cache()
+            if query._filter_num or query._key['filters'] or translator.func_extractors_map:
+                persistent_cache = None  # key depends on code ids of filters and called functions
+            if persistent_cache is not None:
+                cache_entry = persistent_cache.load('sql', sql_key, database, query._code_key)
+            if cache_entry is not None:
+                sql, params, attr_offsets, tables = cache_entry
+                adapter = make_adapter(database.provider.paramstyle, params)
+            else:
+                if limit_params: limit, offset = vars[LIMIT_VARKEY], vars[OFFSET_VARKEY]
+                sql_ast, attr_offsets = translator.construct_sql_ast(
+                    limit, offset, query._distinct, aggr_func_name, aggr_func_distinct, sep,
+                    query._for_update, query._nowait, query._skip_locked, limit_params=limit_params)
+                cache = database._get_cache()
+                sql, adapter = database.provider.ast2sql(sql_ast)
+                tables = get_sql_ast_tables(sql_ast)
+                if persistent_cache is not None:
+                    persistent_cache.store('sql', sql_key, (sql, adapter.params, attr_offsets, tables),
+                                           database, query._code_key)
+            cache_entry = sql, adapter, attr_offsets, tables
             database._constructed_sql_cache[sql_key] = cache_entry
-        else: sql, adapter, attr_offsets = cache_entry
-        arguments = adapter(query._vars)
+        else: sql, adapter, attr_offsets, tables = cache_entry
+        arguments = adapter(vars)
         if query._translator.query_result_is_cacheable:
             arguments_key = HashableDict(arguments) if type(arguments) is dict else arguments
             try: hash(arguments_key)
             except: query_key = None  # arguments are unhashable
             else: query_key = HashableDict(sql_key, arguments_key=arguments_key)
         else: query_key = None
-        return sql, arguments, attr_offsets, query_key
+        return sql, arguments, attr_offsets, query_key, tables
+    def _use_shared_cache(query, query_key, tables):
+        if not query._shared_cache or query_key is None or tables is None: return False
+        cache = query._database._get_cache()
+        return not cache.in_transaction and not cache.modified  # own uncommitted changes should be visible
     def get_sql(query):
-        sql, arguments, attr_offsets, query_key = query._construct_sql_and_arguments()
+        sql, arguments, attr_offsets, query_key, tables = query._construct_sql_and_arguments()
         return sql
     def _actual_fetch(query, limit=None, offset=None):
         translator = query._translator
         with query._prefetch_context:
-            sql, arguments, attr_offsets, query_key = query._construct_sql_and_arguments(limit, offset)
+            sql, arguments, attr_offsets, query_key, tables = query._construct_sql_and_arguments(limit, offset)
             database = query._database
             cache = database._get_cache()
             if query._for_update: cache.immediate = True
             cache.prepare_connection_for_query_execution()  # may clear cache.query_results
             items = cache.query_results.get(query_key)
-            if items is None:
+            if items is None and query._use_shared_cache(query_key, tables):
+                rows = database._get_cached_query_result_(query_key, tables)
+                if rows is not None:
+                    database._count_cached_query_(sql)
+                    items = query._rows_to_items(rows, attr_offsets)
+                else:
+                    versions = database._get_table_versions_(tables)
+                    rows = database._exec_sql(sql, arguments).fetchall()
+                    items = query._rows_to_items(rows, attr_offsets)
+                    database._put_query_result_(query_key, query._cache_ttl, versions, rows)
+                cache.add_query_result(query_key, items, tables)
+            elif items is None:
                 cursor = database._exec_sql(sql, arguments)
                 if isinstance(translator.expr_type, EntityMeta):
                     entity = translator.expr_type
                     items = entity._fetch_objects(cursor, attr_offsets, for_update=query._for_update,
                                                    used_attrs=translator.get_used_attrs())
-                elif len(translator.row_layout) == 1:
-                    func, slice_or_offset, src = translator.row_layout[0]
-                    items = list(starmap(func, cursor.fetchall()))
-                else:
-                    items = [ tuple(func(sql_row[slice_or_offset])
-                                     for func, slice_or_offset, src in translator.row_layout)
-                               for sql_row in cursor.fetchall() ]
-                    for i, t in enumerate(translator.expr_type):
-                        if isinstance(t, EntityMeta) and t._subclasses_: t._load_many_(row[i] for row in items)
-                if query_key is not None: cache.query_results[query_key] = items
-            else:
-                stats = database._dblocal.stats
-                stat = stats.get(sql)
-                if stat is not None: stat.cache_count += 1
-                else: stats[sql] = QueryStat(sql)
+                else: items = query._rows_to_items(cursor.fetchall(), attr_offsets)
+                if query_key is not None: cache.add_query_result(query_key, items, tables)
+            else: database._count_cached_query_(sql)
             if query._prefetch: query._do_prefetch(items)
         return items
+    def _rows_to_items(query, rows, attr_offsets):
+        translator = query._translator
+        if isinstance(translator.expr_type, EntityMeta):
+            entity = translator.expr_type
+            return entity._objects_from_rows_(rows, attr_offsets, for_update=query._for_update,
+                                              used_attrs=translator.get_used_attrs())
+        cache = query._database._get_cache()
+        prev_seed_scope = cache.seed_scope
+        cache.seed_scope = defaultdict(dict)
+        try:
+            if len(translator.row_layout) == 1:
+                func, slice_or_offset, src = translator.row_layout[0]
+                return list(starmap(func, rows))
+            items = [ tuple(func(sql_row[slice_or_offset])
+                            for func, slice_or_offset, src in translator.row_layout)
+                      for sql_row in rows ]
+        finally: cache.seed_scope = prev_seed_scope
+        for i, t in enumerate(translator.expr_type):
+            if isinstance(t, EntityMeta) and t._subclasses_: t._load_many_(row[i] for row in items)
+        return items
+    @cut_traceback
+    def iter_chunks(query, batch_size=1000, evict=False, server_side=False):
+        if not isinstance(batch_size, int_types) or batch_size <= 0: throw(TypeError,
+            "'batch_size' argument of iter_chunks() method must be positive integer. Got: %r" % batch_size)
+        return query._iter_chunks(batch_size, evict, server_side)
+    @cut_traceback
+    def stream(query, batch_size=1000, evict=False, server_side=False):
+        if not isinstance(batch_size, int_types) or batch_size <= 0: throw(TypeError,
+            "'batch_size' argument of stream() method must be positive integer. Got: %r" % batch_size)
+        return chain.from_iterable(query._iter_chunks(batch_size, evict, server_side))
+    def _iter_chunks(query, batch_size, evict, server_side):
+        database = query._database
+        with query._prefetch_context:
+            sql, arguments, attr_offsets, query_key, tables = query._construct_sql_and_arguments()
+            cache = database._get_cache()
+            if query._for_update: cache.immediate = True
+            cache.prepare_connection_for_query_execution()
+            cursor = database._exec_sql(sql, arguments, itersize=batch_size if server_side else None)
+        try:
+            while True:
+                if not cache.is_alive: throw(DatabaseSessionIsOver,
+                    'Cannot fetch next rows of query result: the database session is over')
+                rows = cursor.fetchmany(batch_size)
+                if not rows: break
+                with query._prefetch_context:
+                    items = query._rows_to_items(rows, attr_offsets)
+                    if query._prefetch: query._do_prefetch(items)
+                yield items
+                if evict and cache.is_alive:
+                    if isinstance(query._translator.expr_type, EntityMeta): cache.evict(items)
+                    else: cache.evict(item for row in items for item in (row if type(row) is tuple else (row,))
+                                           if isinstance(item, Entity))
+        finally:
+            close_cursor(cursor)
     @cut_traceback
     def prefetch(query, *args):
         query = query._clone(_prefetch_context=query._prefetch_context.copy())
@@ -5978,9 +7120,104 @@ class Query(object):
         cache.immediate = True
         cache.prepare_connection_for_query_execution()  # may clear cache.query_results
         cursor = database._exec_sql(sql, arguments)
-        cache.query_results.clear()
+        cache.invalidate_query_results((translator.expr_type._table_,))
+        cache.modified_tables.add(translator.expr_type._table_)
+        entity_cache = translator.expr_type._entity_cache_
+        if entity_cache is not None: cache.entity_caches_to_clear.add(entity_cache)
+        return cursor.rowcount
+    @cut_traceback
+    def update(query, **kwargs):
+        entity = query._translator.expr_type
+        if not isinstance(entity, EntityMeta):
+            throw(TypeError, 'Update query should be applied to a single entity. Got: %s'
+                             % ast2src(query._translator.tree.elt))
+        if not kwargs: throw(TypeError, 'update() method requires at least one keyword argument')
+        prev_translator = query._translator
+        prev_from_len = len(prev_translator.sqlquery.from_ast)
+        prev_used_from_subquery = prev_translator.sqlquery.used_from_subquery
+        values = {}
+        update_key = []
+        expr_sqls = []
+        for name in sorted(kwargs):
+            attr = entity._adict_.get(name)
+            if attr is None: throw(TypeError, 'Unknown attribute %r' % name)
+            if attr.is_collection: throw(TypeError, 'Collection attribute %s cannot be updated in bulk' % attr)
+            if attr.pk_offset is not None: throw(TypeError, 'Cannot change value of primary key attribute %s' % attr.name)
+            if not attr.columns: throw(TypeError, 'Attribute %s has no columns and cannot be updated in bulk' % attr)
+            value = kwargs[name]
+            if type(value) is types.FunctionType:
+                func, globals, locals = get_globals_and_locals((value,), None, frame_depth=cut_traceback_depth+1)
+                query = query._process_lambda(func, globals, locals, order_by=True)
+                expr_sql = query._translator.order[:len(attr.columns)]
+                if any(item[0] == 'DESC' for item in expr_sql): throw(TypeError,
+                    'Expression for attribute %s in update() method cannot be wrapped with desc()' % attr)
+                sqlquery = query._translator.sqlquery
+                if len(sqlquery.from_ast) != prev_from_len or sqlquery.used_from_subquery != prev_used_from_subquery:
+                    throw(TranslationError, 'Expression for attribute %s in update() method can refer '
+                                            'to attributes of %s only' % (attr, entity.__name__))
+                expr_sqls.append((attr, expr_sql))
+                update_key.append((name, 'expr'))
+            else:
+                val = attr.validate(value, None, entity, from_db=False)
+                if not attr.reverse: values[attr] = (attr.converters[0].val2dbval(val),)
+                else: values[attr] = tuple(attr.get_raw_values(val))
+                update_key.append((name, 'value'))
+        for attr, expr_sql in expr_sqls:
+            if len(expr_sql) != len(attr.columns): throw(TypeError,
+                'Expression for attribute %s in update() method has incorrect number of columns' % attr)
+        expr_sqls = dict(expr_sqls)
+        translator = query._translator
+        query_vars = query._vars.copy()
+        for attr, raw_values in values.items():
+            query_vars[UPDATE_VARKEY, attr.name] = raw_values
+        sql_key = HashableDict(query._key, sql_command='UPDATE', update=tuple(update_key))
+        database = query._database
+        cache = database._get_cache()
+        cache_entry = database._constructed_sql_cache.get(sql_key)
+        if cache_entry is None:
+            set_list = []
+            for name in sorted(kwargs):
+                attr = entity._adict_[name]
+                expr_sql = expr_sqls.get(attr)
+                if expr_sql is not None:
+                    set_list.extend(zip(attr.columns, expr_sql))
+                else:
+                    set_list.extend((column, [ 'PARAM', ((UPDATE_VARKEY, attr.name), i, None), converter ])
+                                    for i, (column, converter) in enumerate(zip(attr.columns, attr.converters)))
+            sql_ast = translator.construct_update_sql_ast(set_list)
+            cache_entry = database.provider.ast2sql(sql_ast)
+            database._constructed_sql_cache[sql_key] = cache_entry
+        sql, adapter = cache_entry
+        arguments = adapter(query_vars)
+        cache.immediate = True
+        cache.prepare_connection_for_query_execution()  # may clear cache.query_results
+        cursor = database._exec_sql(sql, arguments, start_transaction=True)
+        cache.invalidate_query_results((entity._table_,))
+        cache.modified_tables.add(entity._table_)
+        if entity._entity_cache_ is not None: cache.entity_caches_to_clear.add(entity._entity_cache_)
+        cache.unload_attrs(entity, [ entity._adict_[name] for name in kwargs ])
         return cursor.rowcount
     @cut_traceback
+    def copy_to(query, file, header=False):
+        database = query._database
+        provider = database.provider
+        sql, arguments, attr_offsets, query_key, tables = query._construct_sql_and_arguments()
+        if provider.copy_support:
+            cursor = database._exec_copy(provider.get_copy_to_sql(sql, header), file, arguments)
+            return cursor.rowcount
+        cursor = database._exec_sql(sql, arguments)
+        writer = csv.writer(file, lineterminator='\n')
+        if header: writer.writerow([ column[0] for column in cursor.description ])
+        count = 0
+        try:
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows: break
+                writer.writerows(rows)
+                count += len(rows)
+        finally: close_cursor(cursor)
+        return count
+    @cut_traceback
     def __len__(query):
         return len(query._actual_fetch())
     @cut_traceback
@@ -6195,6 +7432,8 @@ class Query(object):
     @cut_traceback
     def fetch(query, limit=None, offset=None):
         return query._fetch(limit, offset)
+    async def fetch_async(query, limit=None, offset=None):
+        return await run_async(query._fetch, limit, offset)
     @cut_traceback
     def limit(query, limit=None, offset=None):
         return query._fetch(limit, offset, lazy=True)
@@ -6204,12 +7443,21 @@ class Query(object):
         return query._fetch(pagesize, offset, lazy=True)
     def _aggregate(query, aggr_func_name, distinct=None, sep=None):
         translator = query._translator
-        sql, arguments, attr_offsets, query_key = query._construct_sql_and_arguments(
+        sql, arguments, attr_offsets, query_key, tables = query._construct_sql_and_arguments(
             aggr_func_name=aggr_func_name, aggr_func_distinct=distinct, sep=sep)
-        cache = query._database._get_cache()
+        database = query._database
+        cache = database._get_cache()
         try: result = cache.query_results[query_key]
         except KeyError:
-            cursor = query._database._exec_sql(sql, arguments)
+            use_shared_cache = query._use_shared_cache(query_key, tables)
+            if use_shared_cache:
+                result = database._get_cached_query_result_(query_key, tables)
+                if result is not None:
+                    database._count_cached_query_(sql)
+                    cache.add_query_result(query_key, result[0], tables)
+                    return result[0]
+                versions = database._get_table_versions_(tables)
+            cursor = database._exec_sql(sql, arguments)
             row = cursor.fetchone()
             if row is not None: result = row[0]
             else: result = None
@@ -6226,7 +7474,8 @@ class Query(object):
                 provider = query._database.provider
                 converter = provider.get_converter_by_py_type(expr_type)
                 result = converter.sql2py(result)
-            if query_key is not None: cache.query_results[query_key] = result
+            if query_key is not None: cache.add_query_result(query_key, result, tables)
+            if use_shared_cache: database._put_query_result_(query_key, query._cache_ttl, versions, (result,))
         return result
     @cut_traceback
     def sum(query, distinct=None):
@@ -6254,6 +7503,11 @@ class Query(object):
         if nowait and skip_locked:
             throw(TypeError, 'nowait and skip_locked options are mutually exclusive')
         return query._clone(_for_update=True, _nowait=nowait, _skip_locked=skip_locked)
+    @cut_traceback
+    def cache(query, ttl=None):
+        if ttl is not None and (not isinstance(ttl, (int_types, float)) or ttl <= 0): throw(TypeError,
+            "'ttl' argument of cache() method should be positive number. Got: %r" % ttl)
+        return query._clone(_shared_cache=True, _cache_ttl=ttl)
     def random(query, limit):
         return query.order_by('random()')[:limit]
     def to_json(query, include=(), exclude=(), converter=None, with_schema=True, schema_hash=None):
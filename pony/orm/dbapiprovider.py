@@ -2,14 +2,19 @@ from __future__ import absolute_import, print_function, division
 from pony.py23compat import buffer, int_types
 
 import os, re, json
+from collections import deque
+from threading import Condition, Lock
+from time import monotonic
 from decimal import Decimal, InvalidOperation
 from datetime import datetime, date, time, timedelta
 from uuid import uuid4, UUID
 
 import pony
+from pony import options
 from pony.utils import is_utf8, decorator, throw, localbase, deprecated
 from pony.converting import str2date, str2time, str2datetime, str2timedelta
-from pony.orm.ormtypes import LongStr, LongUnicode, RawSQLType, TrackedValue, TrackedArray, Json, QueryType, Array
+from pony.orm.ormtypes import LongStr, LongUnicode, RawSQLType, TrackedValue, TrackedArray, Json, QueryType, Array, \
+    ListParamType
 
 class DBException(Exception):
     def __init__(exc, original_exc, *args):
@@ -106,6 +111,11 @@ class DBAPIProvider(object):
     index_if_not_exists_syntax = True
     max_time_precision = default_time_precision = 6
     uint64_support = False
+    server_side_cursor_support = False
+    limit_params_support = True
+    multirow_insert_returning_support = False
+    copy_support = False
+    array_param_support = False
 
     # SQLite and PostgreSQL does not limit varchar max length.
     varchar_default_max_len = None
@@ -214,10 +224,25 @@ class DBAPIProvider(object):
         return provider.quote_name(name)
 
     def normalize_vars(provider, vars, vartypes):
+        threshold = options.LIST_PARAM_THRESHOLD
         for key, value in vars.items():
             vartype = vartypes[key]
             if isinstance(vartype, QueryType):
                 vartypes[key], vars[key] = value._normalize_var(vartype)
+            elif type(vartype) is tuple and threshold is not None and len(vartype) > threshold \
+                    and provider.array_param_support:
+                item_types = set(vartype)
+                if len(item_types) != 1: continue
+                item_type = item_types.pop()
+                pk_converters = getattr(item_type, '_pk_converters_', None)
+                if pk_converters is not None:
+                    if len(pk_converters) != 1: continue
+                    py_type = pk_converters[0].py_type
+                else: py_type = item_type
+                if provider.is_array_param_type(py_type): vartypes[key] = ListParamType(item_type)
+
+    def is_array_param_type(provider, py_type):
+        return provider.array_param_support and py_type in (int, str)
 
     def ast2sql(provider, ast):
         builder = provider.sqlbuilder_cls(provider, ast)
@@ -280,6 +305,18 @@ class DBAPIProvider(object):
             else: cursor.execute(sql, arguments)
             if returning_id: return cursor.lastrowid
 
+    def get_server_side_cursor(provider, connection, itersize):
+        throw(NotImplementedError, 'Server-side cursors are not supported for %r' % provider.dialect)
+
+    def get_copy_from_sql(provider, table_name, columns):
+        throw(NotImplementedError, 'COPY is not supported for %r' % provider.dialect)
+
+    def get_copy_to_sql(provider, sql, header=False):
+        throw(NotImplementedError, 'COPY is not supported for %r' % provider.dialect)
+
+    def copy_expert(provider, cursor, sql, file, arguments=None):
+        throw(NotImplementedError, 'COPY is not supported for %r' % provider.dialect)
+
     converter_classes = []
 
     def _get_converter_type_by_py_type(provider, py_type):
@@ -305,6 +342,8 @@ class DBAPIProvider(object):
         return converter_cls(provider, py_type, attr)
 
     def get_pool(provider, *args, **kwargs):
+        pool_options = kwargs.pop('pool', None)
+        if pool_options: return SharedPool(provider.dbapi_module, pool_options, *args, **kwargs)
         return Pool(provider.dbapi_module, *args, **kwargs)
 
     def table_exists(provider, connection, table_name, case_sensitive=True):
@@ -371,6 +410,170 @@ class Pool(localbase):
         pool.con = None
         if con is not None: con.close()
 
+class SharedPool(object):
+    forked_connections = Pool.forked_connections
+    def __init__(pool, dbapi_module, pool_options, *args, **kwargs):
+        pool.dbapi_module = dbapi_module
+        pool.args = args
+        pool.kwargs = kwargs
+        if pool_options is True: pool_options = {}
+        elif not isinstance(pool_options, dict): throw(TypeError,
+            "'pool' option should be True or dict of pool options. Got: %r" % pool_options)
+        options = dict(pool_options)
+        pool.min_size = options.pop('min_size', 0)
+        pool.max_size = options.pop('max_size', 10)
+        pool.max_overflow = options.pop('max_overflow', 0)
+        pool.timeout = options.pop('timeout', 30)
+        pool.idle_timeout = options.pop('idle_timeout', None)
+        pool.max_lifetime = options.pop('max_lifetime', None)
+        pool.pre_ping = options.pop('pre_ping', False)
+        if options: throw(TypeError, 'Unknown pool option%s: %s'
+                                     % ('s' if len(options) > 1 else '', ', '.join(sorted(options))))
+        if not isinstance(pool.max_size, int_types) or pool.max_size < 1: throw(ValueError,
+            "'max_size' pool option must be positive integer. Got: %r" % pool.max_size)
+        if not isinstance(pool.min_size, int_types) or not 0 <= pool.min_size <= pool.max_size: throw(ValueError,
+            "'min_size' pool option must be integer between 0 and max_size. Got: %r" % pool.min_size)
+        if not isinstance(pool.max_overflow, int_types) or pool.max_overflow < 0: throw(ValueError,
+            "'max_overflow' pool option must be non-negative integer. Got: %r" % pool.max_overflow)
+        pool.lock = Condition(Lock())
+        pool.pid = os.getpid()
+        pool.created = {}  # connection -> creation time
+        pool.idle = deque()  # (connection, release time), most recently released connection is the last
+        pool.unused = set()  # idle connections opened in advance, they are new for the first user
+        pool.size = 0  # number of opened connections, including connections being opened right now
+    def connect(pool):
+        core = pony.orm.core
+        end_time = None
+        to_close = []
+        with pool.lock:
+            pool._check_pid()
+            while True:
+                con = None
+                while pool.idle:
+                    con, released_at = pool.idle.pop()
+                    if not pool._is_expired(con, released_at, monotonic()): break
+                    pool._forget(con)
+                    to_close.append(con)
+                    con = None
+                if con is not None or pool.size < pool.max_size + pool.max_overflow: break
+                if pool.timeout is not None:
+                    if end_time is None: end_time = monotonic() + pool.timeout
+                    remaining = end_time - monotonic()
+                    if remaining <= 0: break
+                    pool.lock.wait(remaining)
+                else: pool.lock.wait()
+            if con is None and pool.size < pool.max_size + pool.max_overflow:
+                pool.size += 1
+                is_new_connection = True
+            else: is_new_connection = False
+            is_unused = con in pool.unused
+            if is_unused: pool.unused.remove(con)
+            open_count = max(pool.min_size - pool.size, 0) if con is not None or is_new_connection else 0
+            pool.size += open_count
+        pool._close_all(to_close)
+        if is_new_connection:
+            if core.local.debug: core.log_orm('GET NEW CONNECTION')
+            try: con = pool._create_connection()
+            except:
+                with pool.lock:
+                    pool.size -= 1 + open_count
+                    pool.lock.notify_all()
+                raise
+            with pool.lock: pool.created[con] = monotonic()
+            pool._open_unused(open_count)
+            return con, True
+        if con is None: throw(core.PoolTimeoutError,
+            'Cannot get connection from the pool in %s seconds: all %d connections are in use'
+            % (pool.timeout, pool.max_size + pool.max_overflow))
+        pool._open_unused(open_count)
+        if pool.pre_ping and not pool._ping(con):
+            if core.local.debug: core.log_orm('DROP STALE CONNECTION')
+            pool.drop(con)
+            return pool.connect()
+        if core.local.debug: core.log_orm('GET CONNECTION FROM THE SHARED POOL')
+        return con, is_unused
+    def _create_connection(pool):
+        return pool.dbapi_module.connect(*pool.args, **pool.kwargs)
+    def _open_unused(pool, count):
+        # keeps at least min_size connections opened, size is already increased by count
+        for i in range(count):
+            try: con = pool._create_connection()
+            except Exception:
+                with pool.lock:
+                    pool.size -= count - i
+                    pool.lock.notify_all()
+                return
+            with pool.lock:
+                now = monotonic()
+                pool.created[con] = now
+                pool.unused.add(con)
+                pool.idle.appendleft((con, now))
+                pool.lock.notify()
+    def _reset_connection(pool, con):
+        con.rollback()
+    def _ping(pool, con):
+        try:
+            cursor = con.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+            con.rollback()
+        except Exception: return False
+        return True
+    def _check_pid(pool):
+        pid = os.getpid()
+        if pool.pid == pid: return
+        pool.forked_connections.extend((con, pool.pid) for con in pool.created)
+        pool.created = {}
+        pool.idle.clear()
+        pool.unused.clear()
+        pool.size = 0
+        pool.pid = pid
+    def _is_expired(pool, con, released_at, now):
+        if pool.max_lifetime is not None and now - pool.created[con] > pool.max_lifetime: return True
+        return pool.idle_timeout is not None and now - released_at > pool.idle_timeout \
+               and pool.size > pool.min_size
+    def _forget(pool, con):
+        del pool.created[con]
+        pool.unused.discard(con)
+        pool.size -= 1
+    def _close_all(pool, connections):
+        for con in connections:
+            try: con.close()
+            except Exception: pass
+    def release(pool, con):
+        try: pool._reset_connection(con)
+        except:
+            pool.drop(con)
+            raise
+        to_close = []
+        with pool.lock:
+            if con not in pool.created: to_close.append(con)  # the pool was reset after fork or disconnect
+            else:
+                now = monotonic()
+                if pool.size > pool.max_size or pool._is_expired(con, now, now):
+                    pool._forget(con)
+                    to_close.append(con)
+                else: pool.idle.append((con, now))
+                idle = pool.idle
+                while idle and pool._is_expired(idle[0][0], idle[0][1], now):
+                    old_con, released_at = idle.popleft()
+                    pool._forget(old_con)
+                    to_close.append(old_con)
+            pool.lock.notify()
+        pool._close_all(to_close)
+    def drop(pool, con):
+        with pool.lock:
+            if con in pool.created: pool._forget(con)
+            pool.lock.notify()
+        con.close()
+    def disconnect(pool):
+        with pool.lock:
+            to_close = [ con for con, released_at in pool.idle ]
+            pool.idle.clear()
+            for con in to_close: pool._forget(con)
+            pool.lock.notify_all()
+        pool._close_all(to_close)
+
 class Converter(object):
     EQ = 'EQ'
     NE = 'NE'
@@ -65,6 +65,9 @@ class CRArrayConverter(PGArrayConverter):
     }
 
 class CRProvider(PGProvider):
+    server_side_cursor_support = False
+    multirow_insert_returning_support = False
+
     dbapi_module = psycopg2
     dbschema_cls = CRSchema
     translator_cls = CRTranslator
@@ -29,7 +29,7 @@ except ImportError:
 
 from pony.orm import core, dbschema, dbapiprovider, ormtypes, sqltranslation
 from pony.orm.core import log_orm
-from pony.orm.dbapiprovider import DBAPIProvider, Pool, get_version_tuple, wrap_dbapi_exceptions
+from pony.orm.dbapiprovider import DBAPIProvider, Pool, SharedPool, get_version_tuple, wrap_dbapi_exceptions
 from pony.orm.sqltranslation import SQLTranslator, TranslationError
 from pony.orm.sqlbuilding import Value, Param, SQLBuilder, join
 from pony.utils import throw
@@ -244,6 +244,7 @@ class MySQLProvider(DBAPIProvider):
         return isinstance(exc, mysql_module.OperationalError) and exc.args[0] in (2006, 2013)
 
     def get_pool(provider, *args, **kwargs):
+        pool_options = kwargs.pop('pool', None)
         if 'conv' not in kwargs:
             conv = mysql_converters.conversions.copy()
             if mysql_module_name == 'MySQLdb':
@@ -260,6 +261,7 @@ class MySQLProvider(DBAPIProvider):
         if 'charset' not in kwargs:
             kwargs['charset'] = 'utf8'
         kwargs['client_flag'] = kwargs.get('client_flag', 0) | CLIENT.FOUND_ROWS
+        if pool_options: return SharedPool(mysql_module, pool_options, *args, **kwargs)
         return Pool(mysql_module, *args, **kwargs)
 
     @wrap_dbapi_exceptions
@@ -391,6 +391,7 @@ class OraProvider(DBAPIProvider):
     index_if_not_exists_syntax = False
     varchar_default_max_len = 1000
     uint64_support = True
+    limit_params_support = False
 
     dbapi_module = cx_Oracle
     dbschema_cls = OraSchema
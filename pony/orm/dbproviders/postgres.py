@@ -4,6 +4,11 @@ from pony.py23compat import buffer, int_types
 from decimal import Decimal
 from datetime import datetime, date, time, timedelta
 from uuid import UUID
+from io import StringIO
+from collections import OrderedDict
+from threading import Lock
+from weakref import WeakKeyDictionary
+import itertools, re
 
 try:
     import psycopg2
@@ -25,11 +30,11 @@ psycopg2.extras.register_default_jsonb(loads=lambda x: x)
 
 from pony.orm import core, dbschema, dbapiprovider, sqltranslation, ormtypes
 from pony.orm.core import log_orm
-from pony.orm.dbapiprovider import DBAPIProvider, Pool, wrap_dbapi_exceptions
+from pony.orm.dbapiprovider import DBAPIProvider, Pool, SharedPool, wrap_dbapi_exceptions
 from pony.orm.sqltranslation import SQLTranslator
 from pony.orm.sqlbuilding import Value, SQLBuilder, join
 from pony.converting import timedelta2str
-from pony.utils import is_ident
+from pony.utils import is_ident, throw
 
 NoneType = type(None)
 
@@ -59,6 +64,15 @@ class PGSQLBuilder(SQLBuilder):
         else: result = SQLBuilder.INSERT(builder, table_name, columns, values)
         if returning is not None: result.extend([' RETURNING ', builder.quote_name(returning) ])
         return result
+    def INSERT_MANY(builder, table_name, columns, rows, returning=None):
+        result = SQLBuilder.INSERT_MANY(builder, table_name, columns, rows)
+        if returning is not None:
+            result.extend([ ' RETURNING ', join(', ', [ builder.quote_name(column) for column in returning ]) ])
+        return result
+    def IN_ARRAY(builder, expr, param):
+        return builder(expr), ' = ANY(', builder(param), ')'
+    def NOT_IN_ARRAY(builder, expr, param):
+        return builder(expr), ' <> ALL(', builder(param), ')'
     def TO_INT(builder, expr):
         return '(', builder(expr), ')::int'
     def TO_STR(builder, expr):
@@ -169,7 +183,12 @@ class PGArrayConverter(dbapiprovider.ArrayConverter):
         float: ('double precision', PGRealConverter)
     }
 
+# the same as DISCARD ALL, but keeps prepared statements of the connection
+RESET_KEEPING_PREPARED_SQL = 'CLOSE ALL; SET SESSION AUTHORIZATION DEFAULT; RESET ALL; UNLISTEN *; ' \
+                             'SELECT pg_advisory_unlock_all(); DISCARD TEMP; DISCARD SEQUENCES'
+
 class PGPool(Pool):
+    reset_sql = 'DISCARD ALL'
     def _connect(pool):
         pool.con = pool.dbapi_module.connect(*pool.args, **pool.kwargs)
         if 'client_encoding' not in pool.kwargs:
@@ -180,14 +199,82 @@ class PGPool(Pool):
             con.rollback()
             con.autocommit = True
             cursor = con.cursor()
-            cursor.execute('DISCARD ALL')
+            cursor.execute(pool.reset_sql)
             con.autocommit = False
         except:
             pool.drop(con)
             raise
 
+class PGSharedPool(SharedPool):
+    reset_sql = 'DISCARD ALL'
+    def _create_connection(pool):
+        con = pool.dbapi_module.connect(*pool.args, **pool.kwargs)
+        if 'client_encoding' not in pool.kwargs:
+            con.set_client_encoding('UTF8')
+        return con
+    def _reset_connection(pool, con):
+        con.rollback()
+        con.autocommit = True
+        cursor = con.cursor()
+        cursor.execute(pool.reset_sql)
+        con.autocommit = False
+
 
 ADMIN_SHUTDOWN = '57P01'
+INVALID_SQL_STATEMENT_NAME = '26000'
+
+def copy_value(value):
+    # converts a value to the text representation of COPY ... WITH (FORMAT csv)
+    if value is None or isinstance(value, (int_types, float, Decimal)): return value
+    if isinstance(value, (bytes, bytearray, memoryview, buffer)): return '\\x' + bytes(value).hex()
+    if isinstance(value, timedelta):
+        return '%d days %d seconds %d microseconds' % (value.days, value.seconds, value.microseconds)
+    if isinstance(value, (list, tuple)):
+        items = ('NULL' if item is None else '"%s"' % str(copy_value(item)).replace('\\', '\\\\').replace('"', '\\"')
+                 for item in value)
+        return '{%s}' % ','.join(items)
+    if isinstance(value, psycopg2.extras.Json): return value.dumps(value.adapted)
+    return str(value)
+
+cursor_counter = itertools.count()
+statement_counter = itertools.count()
+
+preparable_sql_re = re.compile(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+pyformat_param_re = re.compile(r'%\((\w+)\)s|%%')
+
+def convert_sql_for_prepare(sql):
+    param_names = []
+    param_numbers = {}
+    def replace(match):
+        name = match.group(1)
+        if name is None: return '%'
+        number = param_numbers.get(name)
+        if number is None:
+            param_names.append(name)
+            number = param_numbers[name] = len(param_names)
+        return '$%d' % number
+    return pyformat_param_re.sub(replace, sql), tuple(param_names)
+
+def get_param_type(value):
+    # PREPARE without explicit types infers them from the first statement context, it is not always possible
+    if isinstance(value, bool): return 'boolean'
+    if isinstance(value, int_types): return 'bigint' if -2**63 <= value < 2**63 else None
+    if isinstance(value, float): return 'double precision'
+    if isinstance(value, Decimal): return 'numeric'
+    if isinstance(value, str): return 'text'
+    if isinstance(value, (bytes, bytearray, memoryview, buffer)): return 'bytea'
+    if isinstance(value, datetime): return 'timestamp' if value.tzinfo is None else 'timestamptz'
+    if isinstance(value, date): return 'date'
+    if isinstance(value, time): return 'time'
+    if isinstance(value, timedelta): return 'interval'
+    if isinstance(value, UUID): return 'uuid'
+    if isinstance(value, psycopg2.extras.Json): return 'jsonb'
+    if isinstance(value, list) and value:
+        item_types = set(map(get_param_type, value))
+        if len(item_types) == 1:
+            item_type = item_types.pop()
+            if item_type in ('bigint', 'double precision', 'text'): return item_type + '[]'
+    return None
 
 
 class PGProvider(DBAPIProvider):
@@ -196,6 +283,10 @@ class PGProvider(DBAPIProvider):
     max_name_len = 63
     max_params_count = 10000
     index_if_not_exists_syntax = False
+    server_side_cursor_support = True
+    multirow_insert_returning_support = True
+    copy_support = True
+    array_param_support = True
 
     dbapi_module = psycopg2
     dbschema_cls = PGSchema
@@ -207,6 +298,20 @@ class PGProvider(DBAPIProvider):
 
     fk_types = { 'SERIAL' : 'INTEGER', 'BIGSERIAL' : 'BIGINT' }
 
+    def __init__(provider, _database, *args, **kwargs):
+        prepare_threshold = kwargs.pop('prepare_threshold', None)
+        prepared_max = kwargs.pop('prepared_max', 100)
+        if prepare_threshold is not None and (not isinstance(prepare_threshold, int_types) or prepare_threshold < 1):
+            throw(ValueError, "'prepare_threshold' option must be positive integer. Got: %r" % prepare_threshold)
+        if not isinstance(prepared_max, int_types) or prepared_max < 1:
+            throw(ValueError, "'prepared_max' option must be positive integer. Got: %r" % prepared_max)
+        provider.prepare_threshold = prepare_threshold
+        provider.prepared_max = prepared_max
+        provider.execution_counts = OrderedDict()  # sql -> count, or None if sql cannot be prepared
+        provider.prepared_statements = WeakKeyDictionary()  # connection -> {(sql, types): (name, execute_sql, param_names)}
+        provider.prepared_lock = Lock()
+        DBAPIProvider.__init__(provider, _database, *args, **kwargs)
+
     def normalize_name(provider, name):
         return name[:provider.max_name_len].lower()
 
@@ -220,7 +325,11 @@ class PGProvider(DBAPIProvider):
                and exc.pgcode in (None, ADMIN_SHUTDOWN)
 
     def get_pool(provider, *args, **kwargs):
-        return PGPool(provider.dbapi_module, *args, **kwargs)
+        pool_options = kwargs.pop('pool', None)
+        if pool_options: pool = PGSharedPool(provider.dbapi_module, pool_options, *args, **kwargs)
+        else: pool = PGPool(provider.dbapi_module, *args, **kwargs)
+        if provider.prepare_threshold is not None: pool.reset_sql = RESET_KEEPING_PREPARED_SQL
+        return pool
 
     @wrap_dbapi_exceptions
     def set_transaction_mode(provider, connection, cache):
@@ -247,9 +356,117 @@ class PGProvider(DBAPIProvider):
             cursor.executemany(sql, arguments)
         else:
             if arguments is None: cursor.execute(sql)
-            else: cursor.execute(sql, arguments)
+            elif provider.prepare_threshold is None or not provider._execute_prepared(cursor, sql, arguments):
+                cursor.execute(sql, arguments)
             if returning_id: return cursor.fetchone()[0]
 
+    def _count_execution(provider, sql):
+        counts = provider.execution_counts
+        with provider.prepared_lock:
+            count = counts.get(sql, 0)
+            if count is None: return None
+            counts[sql] = count = count + 1
+            counts.move_to_end(sql)
+            if len(counts) > provider.prepared_max * 10: counts.popitem(last=False)
+        return count
+
+    def _get_prepared_statements(provider, connection):
+        prepared = provider.prepared_statements.get(connection)
+        if prepared is None:
+            with provider.prepared_lock:
+                prepared = provider.prepared_statements.setdefault(connection, OrderedDict())
+        return prepared
+
+    def _execute_prepared(provider, cursor, sql, arguments):
+        if not arguments or cursor.name is not None: return False
+        param_types = tuple(map(get_param_type, arguments.values()))
+        if None in param_types: return False  # statement is prepared only when types of all parameters are known
+        key = sql, param_types
+        connection = cursor.connection
+        prepared = provider._get_prepared_statements(connection)
+        statement = prepared.get(key)
+        if statement is not None: prepared.move_to_end(key)
+        else:
+            if not preparable_sql_re.match(sql): return False
+            count = provider._count_execution(sql)
+            if count is None or count < provider.prepare_threshold: return False
+            if connection.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR: return False
+            statement = provider._prepare(cursor, prepared, key, arguments)
+            if statement is None: return False
+        statement_name, execute_sql, param_names = statement
+        params = [ arguments[name] for name in param_names ]
+        in_transaction = not connection.autocommit
+        if in_transaction:
+            if connection.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR: return False
+            # the savepoint allows to continue the transaction if the statement was lost
+            execute_sql = 'SAVEPOINT pony_execute; ' + execute_sql
+        try: cursor.execute(execute_sql, params)
+        except psycopg2.Error as e:
+            if e.pgcode != INVALID_SQL_STATEMENT_NAME: raise
+            # prepared statements were deallocated behind our back, e.g. by DISCARD ALL,
+            # the statement is executed without preparing and will be prepared again next time
+            if in_transaction: connection.cursor().execute('ROLLBACK TO SAVEPOINT pony_execute; '
+                                                           'RELEASE SAVEPOINT pony_execute')
+            prepared.clear()
+            return False
+        if in_transaction: connection.cursor().execute('RELEASE SAVEPOINT pony_execute')
+        return True
+
+    def _prepare(provider, cursor, prepared, key, arguments):
+        sql = key[0]
+        connection = cursor.connection
+        statement_name = 'pony_stmt_%d' % next(statement_counter)
+        prepare_sql, param_names = convert_sql_for_prepare(sql)
+        param_types = ', '.join(get_param_type(arguments[name]) for name in param_names)
+        if param_types: prepare_sql = 'PREPARE %s (%s) AS %s' % (statement_name, param_types, prepare_sql)
+        else: prepare_sql = 'PREPARE %s AS %s' % (statement_name, prepare_sql)
+        if core.local.debug: log_orm(prepare_sql)
+        in_transaction = not connection.autocommit
+        try:
+            if in_transaction: cursor.execute('SAVEPOINT pony_prepare')
+            cursor.execute(prepare_sql)
+            if in_transaction: cursor.execute('RELEASE SAVEPOINT pony_prepare')
+        except psycopg2.Error:
+            if in_transaction: cursor.execute('ROLLBACK TO SAVEPOINT pony_prepare')
+            with provider.prepared_lock: provider.execution_counts[sql] = None
+            return None
+        execute_sql = 'EXECUTE %s' % statement_name
+        if param_names: execute_sql += ' (%s)' % ', '.join('%s' for name in param_names)
+        statement = prepared[key] = statement_name, execute_sql, param_names
+        if len(prepared) > provider.prepared_max:
+            old_key, (old_name, _, _) = prepared.popitem(last=False)
+            deallocate_sql = 'DEALLOCATE %s' % old_name
+            if core.local.debug: log_orm(deallocate_sql)
+            cursor.execute(deallocate_sql)
+        return statement
+
+    def get_server_side_cursor(provider, connection, itersize):
+        cursor = connection.cursor(name='pony_cursor_%d' % next(cursor_counter))
+        cursor.itersize = itersize
+        return cursor
+
+    def get_copy_from_sql(provider, table_name, columns):
+        return 'COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (
+            provider.quote_name(table_name), ', '.join(provider.quote_name(column) for column in columns))
+
+    def get_copy_to_sql(provider, sql, header=False):
+        return 'COPY (%s) TO STDOUT WITH (FORMAT csv%s)' % (sql, ', HEADER' if header else '')
+
+    @wrap_dbapi_exceptions
+    def copy_expert(provider, cursor, sql, file, arguments=None):
+        if arguments: sql = cursor.mogrify(sql, arguments).decode(cursor.connection.encoding)
+        cursor.copy_expert(sql, file)
+
+    def rows_to_copy_file(provider, rows):
+        # in CSV format of COPY an unquoted empty value is NULL, and any quoted value is not
+        file = StringIO()
+        for row in rows:
+            file.write(','.join('' if value is None else '"%s"' % str(copy_value(value)).replace('"', '""')
+                                for value in row))
+            file.write('\n')
+        file.seek(0)
+        return file
+
     def table_exists(provider, connection, table_name, case_sensitive=True):
         schema_name, table_name = provider.split_table_name(table_name)
         cursor = connection.cursor()
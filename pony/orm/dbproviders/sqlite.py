@@ -14,7 +14,7 @@ from pony.orm import core, dbschema, dbapiprovider
 from pony.orm.core import log_orm
 from pony.orm.ormtypes import Json, TrackedArray
 from pony.orm.sqltranslation import SQLTranslator, StringExprMonad
-from pony.orm.sqlbuilding import SQLBuilder, Value, join, make_unary_func
+from pony.orm.sqlbuilding import SQLBuilder, Value, ArrayParam, join, make_unary_func
 from pony.orm.dbapiprovider import DBAPIProvider, Pool, wrap_dbapi_exceptions
 from pony.utils import datetime2timestamp, timestamp2datetime, absolutize_path, localbase, throw, reraise, \
     cut_traceback_depth
@@ -64,11 +64,17 @@ class SQLiteValue(Value):
             return repr(value.total_seconds() / (24 * 60 * 60))
         return Value.__str__(self)
 
+class SQLiteArrayParam(ArrayParam):
+    __slots__ = []
+    def pack(param, items):
+        return json.dumps(items)
+
 class SQLiteBuilder(SQLBuilder):
     dialect = 'SQLite'
     least_func_name = 'min'
     greatest_func_name = 'max'
     value_class = SQLiteValue
+    array_param_class = SQLiteArrayParam
     def __init__(builder, provider, ast):
         builder.json1_available = provider.json1_available
         SQLBuilder.__init__(builder, provider, ast)
@@ -100,6 +106,10 @@ class SQLiteBuilder(SQLBuilder):
         op = ' NOT IN (VALUES ' if expr1[0] == 'ROW' else ' NOT IN ('
         expr_list = [ builder(expr) for expr in x ]
         return builder(expr1), op, join(', ', expr_list), ')'
+    def IN_ARRAY(builder, expr, param):
+        return builder(expr), ' IN (SELECT value FROM json_each(', builder(param), '))'
+    def NOT_IN_ARRAY(builder, expr, param):
+        return builder(expr), ' NOT IN (SELECT value FROM json_each(', builder(param), '))'
     def TODAY(builder):
         return "date('now', 'localtime')"
     def NOW(builder):
@@ -350,6 +360,7 @@ class SQLiteProvider(DBAPIProvider):
     def inspect_connection(provider, conn):
         DBAPIProvider.inspect_connection(provider, conn)
         provider.json1_available = provider.check_json1(conn)
+        provider.array_param_support = provider.json1_available  # array parameters are expanded by json_each()
 
     def restore_exception(provider):
         if provider.local_exceptions.exc_info is not None:
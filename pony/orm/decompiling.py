@@ -14,6 +14,7 @@ except ImportError:
 import ast
 
 from pony.utils import throw, get_codeobject_id
+from pony.orm.persistentcache import get_persistent_cache
 
 ##ast.And.__repr__ = lambda self: "And(%s: %s)" % (getattr(self, 'endpos', '?'), repr(self.nodes),)
 ##ast.Or.__repr__ = lambda self: "Or(%s: %s)" % (getattr(self, 'endpos', '?'), repr(self.nodes),)
@@ -40,8 +41,12 @@ def decompile(x):
     key = get_codeobject_id(codeobject)
     result = ast_cache.get(key)
     if result is None:
-        decompiler = Decompiler(codeobject)
-        result = decompiler.ast, decompiler.external_names
+        persistent_cache = get_persistent_cache()
+        if persistent_cache is not None: result = persistent_cache.load_ast(codeobject)
+        if result is None:
+            decompiler = Decompiler(codeobject)
+            result = decompiler.ast, decompiler.external_names
+            if persistent_cache is not None: persistent_cache.store_ast(codeobject, result)
         ast_cache[key] = result
     return result + (cells,)
 
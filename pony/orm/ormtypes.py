@@ -29,6 +29,19 @@ class SetType(object):
     def __hash__(self):
         return hash(self.item_type) + 1
 
+class ListParamType(object):
+    __slots__ = 'item_type'
+    def __deepcopy__(self, memo):
+        return self  # ListParamType instances are "immutable"
+    def __init__(self, item_type):
+        self.item_type = item_type
+    def __eq__(self, other):
+        return type(other) is ListParamType and self.item_type == other.item_type
+    def __ne__(self, other):
+        return type(other) is not ListParamType or self.item_type != other.item_type
+    def __hash__(self):
+        return hash(self.item_type) + 2
+
 class FuncType(object):
     __slots__ = 'func'
     def __deepcopy__(self, memo):
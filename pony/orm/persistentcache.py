@@ -0,0 +1,174 @@
+from __future__ import absolute_import, print_function, division
+
+import hashlib, io, marshal, os, pickle, tempfile, types
+from importlib.util import MAGIC_NUMBER
+from weakref import WeakKeyDictionary
+
+import pony
+from pony import options
+from pony.utils import throw, codeobjects, pickle_ast, unpickle_ast, HashableDict
+from pony.orm.dbapiprovider import Converter, DBAPIProvider
+
+# marshal format versions >= 3 depend on reference counts of the dumped objects
+CODE_MARSHAL_VERSION = 2
+
+PROVIDER_HASH_ATTRS = { 'server_version', 'paramstyle', 'max_params_count', 'max_name_len', 'quote_char' }
+
+class SchemaPickler(pickle.Pickler):
+    # Database, entities, attributes and converters are stored as references and are taken
+    # from the current process during unpickling. Query variables are stored as values,
+    # so query objects and entity instances should never get into the persistent cache
+    def __init__(pickler, file, database, code_key, extractors=None):
+        pickle.Pickler.__init__(pickler, file, pickle.HIGHEST_PROTOCOL)
+        pickler.database = database
+        pickler.code_key = code_key
+        pickler.extractor_names = { id(extractor): src for src, extractor in (extractors or {}).items() }
+    def persistent_id(pickler, obj):
+        core = pony.orm.core
+        t = type(obj)
+        if t is type(pickler.code_key) and obj == pickler.code_key: return 'code_key',
+        if obj is Ellipsis: return 'Ellipsis',
+        if obj is pickler.database: return 'database',
+        if obj is pickler.database.provider: return 'provider',
+        if isinstance(obj, core.EntityMeta) and obj is not core.Entity:
+            if pickler.database.entities.get(obj.__name__) is not obj: raise pickle.PicklingError(obj)
+            return 'entity', obj.__name__
+        if isinstance(obj, core.Attribute):
+            if obj.entity._database_ is not pickler.database: raise pickle.PicklingError(obj)
+            return 'attr', obj.entity.__name__, obj.name
+        if isinstance(obj, Converter):
+            attr = obj.attr
+            if attr is None: return 'converter', obj.py_type
+            if attr.entity._database_ is not pickler.database: raise pickle.PicklingError(obj)
+            for i, converter in enumerate(attr.converters):
+                if converter is obj: return 'attr_converter', attr.entity.__name__, attr.name, i
+            raise pickle.PicklingError(obj)
+        if t is types.FunctionType:
+            src = pickler.extractor_names.get(id(obj))
+            if src is not None: return 'extractor', src
+        if isinstance(obj, (core.Entity, core.Query, core.QueryResult, core.Database, DBAPIProvider,
+                            pony.orm.dbschema.DBSchema)):
+            raise pickle.PicklingError(obj)
+        return None
+
+class KeyPickler(SchemaPickler):
+    # dict items are sorted, so equal keys are always stored in the same way
+    def reducer_override(pickler, obj):
+        if type(obj) is HashableDict:
+            return HashableDict, (sorted(obj.items(), key=lambda item: repr(item[0])),)
+        return NotImplemented
+
+class SchemaUnpickler(pickle.Unpickler):
+    def __init__(unpickler, file, database, code_key, extractors=None):
+        pickle.Unpickler.__init__(unpickler, file)
+        unpickler.database = database
+        unpickler.code_key = code_key
+        unpickler.extractors = extractors
+    def persistent_load(unpickler, persid):
+        kind = persid[0]
+        if kind == 'code_key': return unpickler.code_key
+        if kind == 'Ellipsis': return Ellipsis
+        if kind == 'database': return unpickler.database
+        if kind == 'provider': return unpickler.database.provider
+        if kind == 'entity': return unpickler.database.entities[persid[1]]
+        if kind == 'attr': return unpickler.database.entities[persid[1]]._adict_[persid[2]]
+        if kind == 'converter': return unpickler.database.provider.get_converter_by_py_type(persid[1])
+        if kind == 'attr_converter': return unpickler.database.entities[persid[1]]._adict_[persid[2]].converters[persid[3]]
+        if kind == 'extractor': return unpickler.extractors[persid[1]]
+        raise pickle.UnpicklingError('Unsupported persistent object: %r' % (persid,))
+
+class PersistentCache(object):
+    def __init__(cache, dirname):
+        cache.dirname = dirname
+        # cached files are unpickled, so nobody except the current user should be able to write them
+        os.makedirs(dirname, mode=0o700, exist_ok=True)
+        if hasattr(os, 'getuid'):
+            st = os.stat(dirname)
+            if st.st_uid != os.getuid() or st.st_mode & 0o022: throw(PermissionError,
+                'Persistent cache directory %r should be owned by the current user and should not be writable '
+                'by group or others' % dirname)
+        cache.salt = ('%s:%s:' % (pony.__version__, MAGIC_NUMBER.hex())).encode('ascii')
+        cache.code_hashes = {}
+        cache.schema_hashes = WeakKeyDictionary()
+    def _get_code_hash(cache, code_key):
+        result = cache.code_hashes.get(code_key)
+        if result is None:
+            if isinstance(code_key, str): data = code_key.encode('utf8')
+            else:
+                codeobject = codeobjects.get(code_key)
+                if codeobject is None: return None
+                data = marshal.dumps(codeobject, CODE_MARSHAL_VERSION)
+            result = cache.code_hashes[code_key] = hashlib.sha1(data).hexdigest()
+        return result
+    def _get_schema_hash(cache, database):
+        result = cache.schema_hashes.get(database)
+        if result is None:
+            provider = database.provider
+            schema_items = [ provider.dialect, provider.__class__.__name__ ]
+            for name in sorted(dir(provider)):
+                # generated SQL depends on server version and features which are detected on connection
+                if name.endswith(('_support', '_available', '_syntax')) or name in PROVIDER_HASH_ATTRS:
+                    schema_items.append('%s=%r' % (name, getattr(provider, name, None)))
+            schema_items.append(database.schema.generate_create_script())
+            for name, entity in sorted(database.entities.items()):
+                schema_items.append(name)
+                schema_items.extend('%s %s %r %r' % (attr.name, attr.__class__.__name__, attr.py_type, attr.columns)
+                                    for attr in entity._attrs_)
+            data = '\n'.join(schema_items).encode('utf8')
+            result = cache.schema_hashes[database] = hashlib.sha1(data).hexdigest()
+        return result
+    def _get_filename(cache, kind, data):
+        return os.path.join(cache.dirname, '%s-%s' % (kind, hashlib.sha1(cache.salt + data).hexdigest()))
+    def _read(cache, filename):
+        try:
+            with open(filename, 'rb') as f: return f.read()
+        except (IOError, OSError): return None
+    def _write(cache, filename, data):
+        # writes atomically, so concurrent worker processes never see a partially written file
+        fd, tmp_filename = tempfile.mkstemp(dir=cache.dirname, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f: f.write(data)
+            os.replace(tmp_filename, filename)
+        except:
+            os.remove(tmp_filename)
+            raise
+    def load_ast(cache, codeobject):
+        data = cache._read(cache._get_filename('ast', marshal.dumps(codeobject, CODE_MARSHAL_VERSION)))
+        if data is None: return None
+        try: return unpickle_ast(io.BytesIO(data))
+        except Exception: return None
+    def store_ast(cache, codeobject, result):
+        cache._write(cache._get_filename('ast', marshal.dumps(codeobject, CODE_MARSHAL_VERSION)), pickle_ast(result).getvalue())
+    def _get_key_filename(cache, kind, key, database, code_key):
+        code_hash = cache._get_code_hash(code_key)
+        if code_hash is None: return None
+        f = io.BytesIO()
+        f.write(('%s:%s:' % (code_hash, cache._get_schema_hash(database))).encode('ascii'))
+        try: KeyPickler(f, database, code_key).dump(key)
+        except Exception: return None  # the key contains something which cannot be stored
+        return cache._get_filename(kind, f.getvalue())
+    def load(cache, kind, key, database, code_key, extractors=None):
+        filename = cache._get_key_filename(kind, key, database, code_key)
+        if filename is None: return None
+        data = cache._read(filename)
+        if data is None: return None
+        try: return SchemaUnpickler(io.BytesIO(data), database, code_key, extractors).load()
+        except Exception: return None
+    def store(cache, kind, key, value, database, code_key, extractors=None):
+        filename = cache._get_key_filename(kind, key, database, code_key)
+        if filename is None: return
+        f = io.BytesIO()
+        try: SchemaPickler(f, database, code_key, extractors).dump(value)
+        except Exception: return  # the value contains something which cannot be stored
+        cache._write(filename, f.getvalue())
+
+persistent_cache = None
+
+def get_persistent_cache():
+    global persistent_cache
+    dirname = options.PERSISTENT_CACHE_DIR
+    if dirname is None: return None
+    cache = persistent_cache
+    if cache is None or cache.dirname != dirname:
+        cache = persistent_cache = PersistentCache(dirname)
+    return cache
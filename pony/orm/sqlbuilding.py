@@ -10,6 +10,7 @@ from pony import options
 from pony.utils import datetime2timestamp, throw, is_ident
 from pony.converting import timedelta2str
 from pony.orm.ormtypes import RawSQL, Json
+from pony.orm.dbapiprovider import Converter
 
 class AstError(Exception): pass
 
@@ -61,6 +62,23 @@ class CompositeParam(Param):
         args = [ item.eval(values) if isinstance(item, Param) else item.value for item in param.items ]
         return param.func(args)
 
+class ArrayParam(Param):
+    __slots__ = []
+    def eval(param, values):
+        varkey, i, j = param.paramkey
+        items = values if varkey is None else values[varkey]
+        converter = param.converter
+        result = []
+        for item in items:
+            if j is not None: item = item[j] if type(item) is tuple else item._get_raw_pkval_()[j]
+            if item is not None and converter is not None:
+                if converter.attr is None: item = converter.val2dbval(item)
+                item = converter.py2sql(item)
+            result.append(item)
+        return param.pack(result)
+    def pack(param, items):
+        return items
+
 class Value(object):
     __slots__ = 'paramstyle', 'value'
     def __init__(self, paramstyle, value):
@@ -91,6 +109,69 @@ class Value(object):
         if self.paramstyle in ('format', 'pyformat'): s = s.replace('%', '%%')
         return "'%s'" % s.replace("'", "''")
 
+# compilation of adapters for statements with many parameters (such as batch loading)
+# takes more time than it saves, so generic adapter is used for them
+MAX_COMPILED_ADAPTER_PARAMS_COUNT = 100
+
+def compile_adapter(paramstyle, params):
+    # generates the function which does the same as calling param.eval(values) for each parameter,
+    # but for simple parameters the value extraction and conversion are inlined with pre-bound converters
+    namespace = {}
+    lines = [ 'def adapter(values):' ]
+    names = {}
+    for param in params:
+        if param in names: continue
+        k = len(names)
+        name = names[param] = 'val%d' % k
+        paramkey = param.paramkey
+        if type(param) is not Param or type(paramkey) is not tuple or len(paramkey) != 3 \
+                or paramkey[1] is not None or paramkey[2] is not None:
+            namespace['eval%d' % k] = param.eval
+            lines.append('    %s = eval%d(values)' % (name, k))
+            continue
+        varkey = paramkey[0]
+        if type(varkey) is int: lines.append('    %s = values[%d]' % (name, varkey))
+        else:
+            namespace['key%d' % k] = varkey
+            lines.append('    %s = values[key%d]' % (name, k))
+        converter = param.converter
+        if converter is None: continue
+        funcs = []
+        if converter.attr is None and type(converter).val2dbval is not Converter.val2dbval:
+            funcs.append('val2dbval%d' % k)
+            namespace['val2dbval%d' % k] = converter.val2dbval
+        if type(converter).py2sql is not Converter.py2sql:
+            funcs.append('py2sql%d' % k)
+            namespace['py2sql%d' % k] = converter.py2sql
+        if not funcs: continue
+        expr = name
+        for func in funcs: expr = '%s(%s)' % (func, expr)
+        lines.append('    if %s is not None: %s = %s' % (name, name, expr))
+    if paramstyle in ('qmark', 'format', 'numeric'):
+        lines.append('    return (%s)' % ''.join(names[param] + ', ' for param in params))
+    elif paramstyle in ('named', 'pyformat'):
+        lines.append('    return {%s}' % ', '.join("'p%d': %s" % (param.id, name) for param, name in names.items()))
+    else: throw(NotImplementedError, paramstyle)
+    code = compile('\n'.join(lines), '<pony adapter>', 'exec')
+    exec(code, namespace)
+    return namespace['adapter']
+
+def make_adapter(paramstyle, params):
+    if len(params) <= MAX_COMPILED_ADAPTER_PARAMS_COUNT:
+        adapter = compile_adapter(paramstyle, params)
+    elif paramstyle in ('qmark', 'format'):
+        def adapter(values):
+            return tuple(param.eval(values) for param in params)
+    elif paramstyle == 'numeric':
+        def adapter(values):
+            return tuple(param.eval(values) for param in params)
+    elif paramstyle in ('named', 'pyformat'):
+        def adapter(values):
+            return {'p%d' % param.id: param.eval(values) for param in params}
+    else: throw(NotImplementedError, paramstyle)
+    adapter.params = params  # allows to recreate the adapter when SQL is loaded from the persistent cache
+    return adapter
+
 def flat(tree):
     stack = [ tree ]
     result = []
@@ -165,6 +246,7 @@ class SQLBuilder(object):
     dialect = None
     param_class = Param
     composite_param_class = CompositeParam
+    array_param_class = ArrayParam
     value_class = Value
     indent_spaces = " " * 4
     least_func_name = 'least'
@@ -186,18 +268,8 @@ class SQLBuilder(object):
             layout.append(param.paramkey)
         builder.layout = layout
         builder.sql = u''.join(map(str, builder.result)).rstrip('\n')
-        if paramstyle in ('qmark', 'format'):
-            def adapter(values):
-                return tuple(param.eval(values) for param in params)
-        elif paramstyle == 'numeric':
-            def adapter(values):
-                return tuple(param.eval(values) for param in params)
-        elif paramstyle in ('named', 'pyformat'):
-            def adapter(values):
-                return {'p%d' % param.id: param.eval(values) for param in params}
-        else: throw(NotImplementedError, paramstyle)
         builder.params = params
-        builder.adapter = adapter
+        builder.adapter = make_adapter(paramstyle, params)
     def __call__(builder, ast):
         if isinstance(ast, str):
             throw(AstError, 'An SQL AST list was expected. Got string: %r' % ast)
@@ -222,12 +294,22 @@ class SQLBuilder(object):
         return [ 'INSERT INTO ', builder.quote_name(table_name), ' (',
                  join(', ', [builder.quote_name(column) for column in columns ]),
                  ') VALUES (', join(', ', [builder(value) for value in values]), ')' ]
+    def INSERT_MANY(builder, table_name, columns, rows, returning=None):
+        assert returning is None
+        return [ 'INSERT INTO ', builder.quote_name(table_name), ' (',
+                 join(', ', [builder.quote_name(column) for column in columns ]),
+                 ') VALUES ', join(', ', [ ('(', join(', ', [builder(value) for value in values]), ')')
+                                           for values in rows ]) ]
     def DEFAULT(builder):
         return 'DEFAULT'
     def UPDATE(builder, table_name, pairs, where=None):
         return [ 'UPDATE ', builder.quote_name(table_name), '\nSET ',
                  join(', ', [ (builder.quote_name(name), ' = ', builder(param)) for name, param in pairs]),
                  where and [ '\n', builder(where) ] or [] ]
+    def BULK_UPDATE(builder, table_name, pairs, where=None):
+        builder.indent += 1
+        builder.suppress_aliases = True  # expressions of SET and WHERE refer to the updated table without alias
+        return builder.UPDATE(table_name, pairs, where)
     def DELETE(builder, alias, from_ast, where=None):
         builder.indent += 1
         if alias is not None:
@@ -368,13 +450,18 @@ class SQLBuilder(object):
     def LIMIT(builder, limit, offset=None):
         if limit is None:
             limit = 'null'
+        elif isinstance(limit, list):
+            limit = builder(limit)
         else:
             assert isinstance(limit, int_types)
+            limit = str(limit)
+        if isinstance(offset, list):
+            return 'LIMIT ', limit, ' OFFSET ', builder(offset), '\n'
         assert offset is None or isinstance(offset, int)
         if offset:
-            return 'LIMIT %s OFFSET %d\n' % (limit, offset)
+            return 'LIMIT ', limit, ' OFFSET %d\n' % offset
         else:
-            return 'LIMIT %s\n' % limit
+            return 'LIMIT ', limit, '\n'
     def COLUMN(builder, table_alias, col_name):
         if builder.suppress_aliases or not table_alias:
             return [ '%s' % builder.quote_name(col_name) ]
@@ -390,6 +477,12 @@ class SQLBuilder(object):
         return param
     def make_composite_param(builder, paramkey, items, func):
         return builder.make_param(builder.composite_param_class, paramkey, items, func)
+    def ARRAY_PARAM(builder, paramkey, converter=None):
+        keys = builder.keys
+        param = keys.get(('ARRAY', paramkey))
+        if param is None:
+            param = keys[('ARRAY', paramkey)] = builder.array_param_class(builder.paramstyle, paramkey, converter)
+        return param
     def STAR(builder, table_alias):
         return builder.quote_name(table_alias), '.*'
     def ROW(builder, *items):
@@ -460,6 +553,10 @@ class SQLBuilder(object):
             return builder(expr1), ' NOT IN ', builder(x)
         expr_list = [ builder(expr) for expr in x ]
         return builder(expr1), ' NOT IN (', join(', ', expr_list), ')'
+    def IN_ARRAY(builder, expr, param):
+        throw(NotImplementedError)
+    def NOT_IN_ARRAY(builder, expr, param):
+        throw(NotImplementedError)
     def COUNT(builder, distinct, *expr_list):
         assert distinct in (None, True, False)
         if not distinct:
@@ -6,7 +6,7 @@ from decimal import Decimal
 from datetime import date, time, datetime, timedelta
 from random import random
 from copy import deepcopy
-from functools import update_wrapper
+from functools import update_wrapper, partial
 from uuid import UUID
 
 from pony import options, utils
@@ -14,12 +14,12 @@ from pony.utils import localbase, is_ident, throw, reraise, copy_ast, between, c
 from pony.orm.asttranslation import ASTTranslator, ast2src, TranslationError, create_extractors, get_child_nodes
 from pony.orm.decompiling import decompile, DecompileError, operator_mapping
 from pony.orm.ormtypes import \
-    numeric_types, comparable_types, SetType, FuncType, MethodType, raw_sql, RawSQLType, \
+    numeric_types, comparable_types, SetType, ListParamType, FuncType, MethodType, raw_sql, RawSQLType, \
     normalize, normalize_type, coerce_types, are_comparable_types, \
     Json, QueryType, Array, array_types
 from pony.orm import core
 from pony.orm.core import EntityMeta, Set, JOIN, OptimizationFailed, Attribute, DescWrapper, \
-    special_functions, const_functions, extract_vars, Query, UseAnotherTranslator
+    special_functions, const_functions, extract_vars, Query, UseAnotherTranslator, LIMIT_VARKEY, OFFSET_VARKEY
 
 NoneType = type(None)
 
@@ -61,7 +61,7 @@ def join_tables(alias1, alias2, columns1, columns2):
     return sqland([ [ 'EQ', [ 'COLUMN', alias1, c1 ], [ 'COLUMN', alias2, c2 ] ] for c1, c2 in zip(columns1, columns2) ])
 
 def type2str(t):
-    if type(t) is tuple: return 'list'
+    if type(t) is tuple or type(t) is ListParamType: return 'list'
     if type(t) is SetType: return 'Set of ' + type2str(t.item_type)
     try: return t.__name__
     except: return str(t)
@@ -79,6 +79,16 @@ translator_counter = itertools.count(1)
 
 local = Local()
 
+# functions of translator.row_layout are partial objects rather than closures, so translators can be pickled
+
+def object_from_row_values(constructor, values):
+    if None in values: return None
+    return constructor(values)
+
+def value_from_row_value(sql2py, dbval2val, value):
+    if value is None: return None
+    return dbval2val(sql2py(value))
+
 
 class SQLTranslator(ASTTranslator):
     dialect = None
@@ -171,6 +181,8 @@ class SQLTranslator(ASTTranslator):
             if is_array:
                 array_type = array_types.get(item_type, None)
                 monad = ArrayParamMonad(array_type, (varkey, None, None), list_monad=monad)
+        elif tt is ListParamType:
+            monad = ListParamMonad(t, (varkey, None, None))
         elif isinstance(t, RawSQLType):
             monad = RawSQLMonad(t, varkey)
         else:
@@ -504,19 +516,13 @@ class SQLTranslator(ASTTranslator):
                 if isinstance(expr_type, SetType): expr_type = expr_type.item_type
                 if isinstance(expr_type, EntityMeta):
                     next_offset = offset + len(expr_type._pk_columns_)
-                    def func(values, constructor=expr_type._get_by_raw_pkval_):
-                        if None in values: return None
-                        return constructor(values)
+                    func = partial(object_from_row_values, expr_type._get_by_raw_pkval_)
                     row_layout.append((func, slice(offset, next_offset), ast2src(m.node)))
                     m.orderby_columns = list(range(offset+1, next_offset+1))
                     offset = next_offset
                 else:
                     converter = provider.get_converter_by_py_type(expr_type)
-                    def func(value, converter=converter):
-                        if value is None: return None
-                        value = converter.sql2py(value)
-                        value = converter.dbval2val(value)
-                        return value
+                    func = partial(value_from_row_value, converter.sql2py, converter.dbval2val)
                     row_layout.append((func, offset, ast2src(m.node)))
                     m.orderby_columns = (offset+1,) if not m.disable_ordering else ()
                     offset += 1
@@ -670,7 +676,8 @@ class SQLTranslator(ASTTranslator):
         return [ 'SELECT', select_ast, from_ast, where_ast ] + other_ast
     def construct_sql_ast(translator, limit=None, offset=None, distinct=None,
                           aggr_func_name=None, aggr_func_distinct=None, sep=None,
-                          for_update=False, nowait=False, skip_locked=False, is_not_null_checks=False):
+                          for_update=False, nowait=False, skip_locked=False, is_not_null_checks=False,
+                          limit_params=False):
         attr_offsets = None
         if distinct is None:
             if not translator.order:
@@ -772,6 +779,9 @@ class SQLTranslator(ASTTranslator):
         if limit is not None or offset is not None:
             assert not aggr_func_name
             provider = translator.database.provider
+            if limit_params:
+                if limit is not None: limit = [ 'PARAM', (LIMIT_VARKEY, None, None) ]
+                offset = [ 'PARAM', (OFFSET_VARKEY, None, None) ]
             if limit is None:
                 if provider.dialect == 'SQLite':
                     limit = -1
@@ -809,22 +819,62 @@ class SQLTranslator(ASTTranslator):
                 sql_ast.append([ 'WHERE' ] + translator.conditions)
         else:
             delete_from_ast = [ 'FROM', [ None, 'TABLE', entity._table_ ] ]
-            if len(entity._pk_columns_) == 1:
-                inner_expr = expr_monad.getsql()
-                outer_expr = [ 'COLUMN', None, entity._pk_columns_[0] ]
-            elif translator.rowid_support:
-                inner_expr = [ [ 'COLUMN', tableref.alias, 'ROWID' ] ]
-                outer_expr = [ 'COLUMN', None, 'ROWID' ]
-            elif translator.row_value_syntax:
-                inner_expr = expr_monad.getsql()
-                outer_expr = [ 'ROW' ] + [ [ 'COLUMN', None, column_name ] for column_name in entity._pk_columns_ ]
-            else: throw(NotImplementedError)
-            subquery_ast = [ 'SELECT', [ 'ALL' ] + inner_expr, from_ast ]
-            if translator.conditions:
-                subquery_ast.append([ 'WHERE' ] + translator.conditions)
-            delete_where_ast = [ 'WHERE', [ 'IN', outer_expr, subquery_ast ] ]
+            delete_where_ast = [ 'WHERE', translator.construct_pk_in_subquery_criteria() ]
             sql_ast = [ 'DELETE', None, delete_from_ast, delete_where_ast ]
         return sql_ast
+    def construct_update_sql_ast(translator, set_list):
+        entity = translator.expr_type
+        if not isinstance(entity, EntityMeta):
+            throw(TranslationError,
+            'Update query should be applied to a single entity. Got: %s' % ast2src(translator.tree.expr))
+        force_in = False
+        if translator.groupby_monads:
+            force_in = True
+        else:
+            assert not translator.having_conditions
+        from_ast = translator.sqlquery.from_ast
+        if from_ast[0] != 'FROM':
+            force_in = True
+
+        sql_ast = [ 'BULK_UPDATE', entity._table_, set_list ]
+        if not force_in and len(from_ast) == 2 and not translator.sqlquery.used_from_subquery:
+            if translator.conditions:
+                sql_ast.append([ 'WHERE' ] + translator.conditions)
+        else:
+            criteria = translator.construct_pk_in_subquery_criteria()
+            if translator.dialect == 'MySQL':
+                # MySQL cannot select from the table being updated unless the subquery is materialized
+                outer_expr, subquery_ast = criteria[1:]
+                column_names = [ column_ast[2] for column_ast in subquery_ast[1][1:] ]
+                subquery_ast = [ 'SELECT', [ 'ALL' ] + [ [ 'COLUMN', 't', name ] for name in column_names ],
+                                 [ 'FROM', [ 't', 'SELECT', subquery_ast[1:] ] ] ]
+                criteria = [ 'IN', outer_expr, subquery_ast ]
+            sql_ast.append([ 'WHERE', criteria ])
+        return sql_ast
+    def construct_pk_in_subquery_criteria(translator):
+        entity = translator.expr_type
+        expr_monad = translator.tree.elt.monad
+        tableref = expr_monad.tableref
+        if len(entity._pk_columns_) == 1:
+            inner_expr = expr_monad.getsql()
+            outer_expr = [ 'COLUMN', None, entity._pk_columns_[0] ]
+        elif translator.rowid_support:
+            inner_expr = [ [ 'COLUMN', tableref.alias, 'ROWID' ] ]
+            outer_expr = [ 'COLUMN', None, 'ROWID' ]
+        elif translator.row_value_syntax:
+            inner_expr = expr_monad.getsql()
+            outer_expr = [ 'ROW' ] + [ [ 'COLUMN', None, column_name ] for column_name in entity._pk_columns_ ]
+        else: throw(NotImplementedError)
+        subquery_ast = [ 'SELECT', [ 'ALL' ] + inner_expr, translator.sqlquery.from_ast ]
+        if translator.conditions:
+            subquery_ast.append([ 'WHERE' ] + translator.conditions)
+        if translator.groupby_monads:
+            group_by = [ 'GROUP_BY' ]
+            for m in translator.groupby_monads: group_by.extend(m.getsql())
+            subquery_ast.append(group_by)
+            if translator.having_conditions:
+                subquery_ast.append([ 'HAVING' ] + translator.having_conditions)
+        return [ 'IN', outer_expr, subquery_ast ]
     def get_used_attrs(translator):
         if isinstance(translator.expr_type, EntityMeta) and not translator.aggregated and not translator.optimize:
             return translator.tableref.used_attrs
@@ -1727,6 +1777,28 @@ class ListMonad(Monad):
     def getsql(monad, sqlquery=None):
         return [ [ 'ROW' ] + [ item.getsql()[0] for item in monad.items ] ]
 
+class ListParamMonad(Monad):
+    def __init__(monad, t, paramkey):
+        Monad.__init__(monad, t, nullable=False)
+        item_type = t.item_type
+        if isinstance(item_type, EntityMeta):
+            varkey, i, j = paramkey
+            monad.paramkey = varkey, None, 0
+            monad.converter = item_type._pk_converters_[0]
+        else:
+            monad.paramkey = paramkey
+            monad.converter = monad.translator.database.provider.get_converter_by_py_type(item_type)
+    def contains(monad, x, not_in=False):
+        if isinstance(x.type, SetType): throw(TypeError,
+            "Type of `%s` is '%s'. Expression `{EXPR}` is not supported" % (ast2src(x.node), type2str(x.type)))
+        if x.type == 'METHOD': raise_forgot_parentheses(x)
+        item_type = monad.type.item_type
+        if not are_comparable_types(x.type, item_type): throw(IncomparableTypesError, x.type, item_type)
+        left_sql = x.getsql()
+        assert len(left_sql) == 1
+        sql = [ 'NOT_IN_ARRAY' if not_in else 'IN_ARRAY', left_sql[0], [ 'ARRAY_PARAM', monad.paramkey, monad.converter ] ]
+        return BoolExprMonad(sql, nullable=x.nullable)
+
 class BufferMixin(MonadMixin):
     pass
 
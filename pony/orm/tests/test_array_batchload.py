@@ -0,0 +1,146 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.dbproviders.sqlite import SQLiteProvider
+from pony.orm.tests import teardown_database, setup_database, only_for
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    title = Optional(str)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    id = PrimaryKey(int)
+    name = Required(str)
+    group = Required(Group)
+    courses = Set('Course')
+
+
+class Course(db.Entity):
+    name = PrimaryKey(str)
+    semester = Required(int)
+    students = Set(Student)
+
+
+class Mark(db.Entity):
+    student_id = Required(int)
+    course_name = Required(str)
+    value = Required(int)
+    PrimaryKey(student_id, course_name)
+
+
+class TestArrayBatchload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        if not db.provider.array_param_support: raise unittest.SkipTest('Array parameters are not supported')
+        with db_session:
+            courses = [ Course(name='C%d' % i, semester=i) for i in range(1, 4) ]
+            for i in range(1, 4):
+                g = Group(number=i)
+                for j in range(1, 6):
+                    Student(id=i * 10 + j, name='S%d' % j, group=g, courses=courses[:j % 3 + 1])
+            for i in range(1, 6):
+                Mark(student_id=i, course_name='C1', value=i)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def batchload_sql(self, entity, batch_size, attr=None):
+        return entity._construct_batchload_sql_(batch_size, attr)[0]
+
+    def test_same_sql_for_any_batch_size(self):
+        sql = self.batchload_sql(Group, 2)
+        self.assertEqual(self.batchload_sql(Group, 3), sql)
+        self.assertEqual(self.batchload_sql(Group, 500), sql)
+        self.assertEqual(count_params(sql), 1)
+        self.assertNotEqual(self.batchload_sql(Group, 1), sql)
+
+    def test_str_primary_key(self):
+        sql = self.batchload_sql(Course, 2)
+        self.assertEqual(self.batchload_sql(Course, 7), sql)
+        self.assertEqual(count_params(sql), 1)
+
+    def test_composite_primary_key(self):
+        self.assertEqual(count_params(self.batchload_sql(Mark, 2)), 4)
+        self.assertEqual(count_params(self.batchload_sql(Mark, 3)), 6)
+
+    @db_session
+    def test_seed_loading(self):
+        students = Student.select()[:]
+        groups = {s.group for s in students}
+        students[0].group.title
+        self.assertEqual(count_params(db.last_sql), 1)
+        self.assertEqual([ g for g in groups if g in db._get_cache().seeds[Group._pk_attrs_] ], [])
+
+    @db_session
+    def test_reverse_attribute(self):
+        groups = Group.select()[:]
+        result = Group.students.prefetch_load_all(groups)
+        self.assertEqual(len(result), 15)
+        self.assertEqual(count_params(db.last_sql), 1)
+
+    @db_session
+    def test_many_to_many(self):
+        students = Student.select()[:]
+        Student.courses.prefetch_load_all(students)
+        self.assertEqual(count_params(db.last_sql), 1)
+        self.assertEqual({len(s.courses) for s in students}, {1, 2, 3})
+        self.assertEqual(Course['C1'].students.count(), 15)
+
+    def test_delete(self):
+        with db_session:
+            for i in range(100, 105):
+                Group(number=i)
+        with db_session:
+            Group.select(lambda g: g.number >= 100).delete()
+            flush()
+            self.assertEqual(count_params(db.last_sql), 1)
+        with db_session:
+            self.assertEqual(Group.select().count(), 3)
+
+
+class NoJson1Provider(SQLiteProvider):
+    def check_json1(provider, connection):
+        return False
+
+
+@only_for('sqlite')
+class TestArrayBatchloadWithoutJson1(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(NoJson1Provider, ':memory:')
+        class Group(self.db.Entity):
+            number = PrimaryKey(int)
+            title = Optional(str)
+            students = Set('Student')
+        class Student(self.db.Entity):
+            group = Required(Group)
+        self.db.generate_mapping(create_tables=True)
+        with db_session:
+            for i in range(1, 4): Student(id=i, group=Group(number=i, title='G%d' % i))
+
+    def tearDown(self):
+        self.db.disconnect()
+
+    def test_no_array_params(self):
+        db = self.db
+        self.assertFalse(db.provider.array_param_support)
+        with db_session:
+            students = db.Student.select()[:]
+            self.assertEqual(students[0].group.title, 'G1')
+            self.assertNotIn('json_each', db.last_sql)
+            ids = list(range(200))  # longer than LIST_PARAM_THRESHOLD
+            self.assertEqual(db.Group.select(lambda g: g.number in ids).count(), 3)
+            self.assertNotIn('json_each', db.last_sql)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,273 @@
+from __future__ import absolute_import, print_function, division
+
+import asyncio, contextvars, os, tempfile, threading, unittest
+
+from pony import options
+from pony.orm import core
+from pony.orm.core import *
+from pony.orm.core import set_session_state
+from pony.orm.tests.testutils import *
+from pony.orm.tests import db_params
+
+db = Database()
+
+
+class Person(db.Entity):
+    name = Required(str)
+    age = Required(int)
+    bio = Optional(str, lazy=True)
+
+
+def run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+def switch_session_state(kind):
+    # databases of other test modules may be already bound in the same process
+    frozen = core.session_state_frozen
+    core.session_state_frozen = False
+    try: set_session_state(kind)
+    finally: core.session_state_frozen = frozen
+
+
+class TestAsync(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.prev_session_state = options.SESSION_STATE
+        switch_session_state('context')
+        if db_params['provider'] == 'sqlite':
+            # in-memory SQLite database is not shared between worker threads
+            cls.filename = tempfile.mktemp(suffix='.sqlite')
+            db.bind('sqlite', cls.filename, create_db=True)
+        else:
+            cls.filename = None
+            db.bind(**db_params)
+        db.generate_mapping(check_tables=False)
+        db.drop_all_tables(with_all_data=True)
+        db.create_tables()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.drop_all_tables(with_all_data=True)
+        db.disconnect()
+        switch_session_state(cls.prev_session_state)
+        if cls.filename is not None: os.remove(cls.filename)
+
+    def setUp(self):
+        with db_session:
+            Person.select().delete(bulk=True)
+            Person(name='John', age=20)
+            Person(name='Mike', age=30)
+
+    def test_fetch_async(self):
+        async def main():
+            async with db_session:
+                persons = await select(p for p in Person).order_by(Person.name).fetch_async()
+                return [ p.name for p in persons ]
+        self.assertEqual(run(main()), ['John', 'Mike'])
+
+    def test_worker_thread(self):
+        async def main():
+            async with db_session:
+                return await run_async(lambda: (threading.current_thread().name, Person.select().count()))
+        thread_name, count = run(main())
+        self.assertTrue(thread_name.startswith('pony-async-worker'))
+        self.assertEqual(count, 2)
+
+    def test_idle_workers_limit(self):
+        async def session():
+            async with db_session:
+                await asyncio.sleep(0.01)
+                return await run_async(Person.select().count)
+        async def main():
+            return await asyncio.gather(*[ session() for i in range(3) ])
+        prev_value = options.ASYNC_WORKERS_POOL_SIZE
+        options.ASYNC_WORKERS_POOL_SIZE = 1
+        try: self.assertEqual(run(main()), [2, 2, 2])
+        finally: options.ASYNC_WORKERS_POOL_SIZE = prev_value
+        self.assertEqual(len(core.async_workers), 1)
+
+    def test_disconnect_shuts_down_workers(self):
+        async def main():
+            async with db_session:
+                return await run_async(Person.select().count)
+        self.assertEqual(run(main()), 2)
+        workers = [ worker for worker in core.async_workers if db in worker.databases ]
+        self.assertTrue(workers)
+        db.disconnect()
+        self.assertFalse(any(db in worker.databases for worker in core.async_workers))
+        for worker in workers:
+            self.assertTrue(worker._shutdown)
+            self.assertEqual(len(worker.databases), 0)
+
+    def test_sync_access_inside_of_async_session(self):
+        async def session(name):
+            async with db_session:
+                persons = await Person.select(lambda p: p.name == name).fetch_async()
+                with self.assertRaises(TransactionError) as cm: persons[0].bio
+                self.assertTrue(str(cm.exception).startswith(
+                    'Database cannot be accessed synchronously inside of async db_session'))
+                with self.assertRaises(TransactionError): select(p for p in Person)[:]
+                return persons[0].name
+        async def main():
+            return await asyncio.gather(session('John'), session('Mike'))
+        self.assertEqual(run(main()), ['John', 'Mike'])
+
+    def test_sync_sessions_in_concurrent_tasks(self):
+        async def task():
+            with db_session:
+                state = core.local.db_context_counter, core.local.db2cache
+                await asyncio.sleep(0.01)  # the other task enters its own db_session here
+                self.assertIs(core.local.db2cache, state[1])
+                return state[0], id(state[1])
+        async def main():
+            return await asyncio.gather(task(), task())
+        (counter1, cache1), (counter2, cache2) = run(main())
+        self.assertEqual([counter1, counter2], [1, 1])
+        self.assertNotEqual(cache1, cache2)
+
+    def test_debug_state_is_inherited(self):
+        async def task():
+            return core.local.debug, core.local.db_session
+        async def main():
+            with db_session:
+                return await asyncio.create_task(task())
+        prev_debug = core.local.debug
+        core.local.debug = True
+        try: self.assertEqual(run(main()), (True, None))
+        finally: core.local.debug = prev_debug
+
+    def test_commit_on_exit(self):
+        async def main():
+            async with db_session:
+                persons = await Person.select(lambda p: p.name == 'John').fetch_async()
+                persons[0].age = 21
+                Person(name='Kate', age=25)
+        run(main())
+        with db_session:
+            self.assertEqual(Person.get(name='John').age, 21)
+            self.assertEqual(Person.select().count(), 3)
+
+    def test_commit_async(self):
+        async def main():
+            async with db_session:
+                Person(name='Kate', age=25)
+                await db.commit_async()
+                return await run_async(db.select, 'name from Person order by name')
+        self.assertEqual(run(main()), ['John', 'Kate', 'Mike'])
+
+    def test_rollback_on_exception(self):
+        async def main():
+            async with db_session:
+                Person(name='Kate', age=25)
+                await db.flush_async()
+                raise ZeroDivisionError
+        with self.assertRaises(ZeroDivisionError):
+            run(main())
+        with db_session:
+            self.assertEqual(Person.select().count(), 2)
+
+    def test_concurrent_tasks(self):
+        async def task(name):
+            async with db_session:
+                Person(name=name, age=40)
+                await asyncio.sleep(0)
+                await db.flush_async()
+                await asyncio.sleep(0)
+                return set(core.local.db2cache.values()).pop().objects
+        async def main():
+            return await asyncio.gather(task('A'), task('B'), task('C'))
+        results = run(main())
+        self.assertEqual(len({ id(objects) for objects in results }), 3)
+        with db_session:
+            self.assertEqual(Person.select().count(), 5)
+
+    def test_last_sql(self):
+        async def main():
+            async with db_session:
+                await Person.select().fetch_async()
+                return db.last_sql
+        self.assertTrue(run(main()).startswith('SELECT'))
+
+    def test_sync_sessions_in_different_contexts(self):
+        def session_func(name):
+            db_session.__enter__()
+            Person(name=name, age=50)
+            return db._get_cache()
+        def exit_func():
+            commit()
+            db_session.__exit__()
+        context1, context2 = contextvars.Context(), contextvars.Context()
+        cache1 = context1.run(session_func, 'A')
+        cache2 = context2.run(session_func, 'B')
+        self.assertIsNone(core.local.db_session)
+        self.assertIsNot(cache1, cache2)
+        context1.run(exit_func)
+        context2.run(exit_func)
+        with db_session:
+            self.assertEqual(Person.select().count(), 4)
+
+    def test_nested(self):
+        async def main():
+            async with db_session:
+                async with db_session:
+                    Person(name='Kate', age=25)
+                return await run_async(Person.select().count)
+        self.assertEqual(run(main()), 3)
+
+    @raises_exception(TransactionError, 'run_async() can be called inside of async db_session only')
+    def test_outside_of_session(self):
+        run(Person.select().fetch_async())
+
+    @raises_exception(TransactionError, 'async db_session cannot be started inside of synchronous db_session')
+    def test_inside_of_sync_session(self):
+        async def main():
+            with db_session:
+                async with db_session:
+                    pass
+        run(main())
+
+    def test_sync_session_of_other_thread(self):
+        async def main():
+            async with db_session:
+                return await run_async(Person.select().count)
+        with db_session:
+            self.assertEqual(run(main()), 2)  # the task does not inherit the session of the thread
+
+    @raises_exception(TransactionError, "async db_session requires context-based session state. "
+                                        "Set options.SESSION_STATE = 'context' or call set_session_state('context') "
+                                        "before binding databases")
+    def test_thread_session_state(self):
+        async def main():
+            async with db_session:
+                pass
+        switch_session_state('thread')
+        try: run(main())
+        finally: switch_session_state('context')
+
+    @raises_exception(ValueError, "Session state kind should be 'thread' or 'context'. Got: 'greenlet'")
+    def test_invalid_session_state(self):
+        set_session_state('greenlet')
+
+    @raises_exception(TransactionError, 'Session state kind cannot be changed inside of db_session')
+    def test_change_session_state_inside_of_session(self):
+        with db_session:
+            switch_session_state('thread')
+
+    @raises_exception(BindingError, 'Session state kind cannot be changed after a database was bound')
+    def test_change_session_state_after_bind(self):
+        set_session_state('thread')
+
+    def test_same_session_state_after_bind(self):
+        set_session_state('context')
+        self.assertIs(type(core.local), core.ContextLocal)
+
+    @raises_exception(TypeError, 'Session state kind is global and cannot be specified for a database. '
+                                 'Use options.SESSION_STATE or set_session_state() before binding databases')
+    def test_session_state_bind_option(self):
+        db2 = Database()
+        db2.bind('sqlite', ':memory:', session_state='context')
+
+
+if __name__ == '__main__':
+    unittest.main()
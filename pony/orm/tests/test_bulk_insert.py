@@ -0,0 +1,132 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+from datetime import date
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    name = Required(str, unique=True)
+    dob = Optional(date)
+    scholarship = Required(int, default=0)
+    group = Optional(Group)
+    marks = Set('Mark')
+
+
+class Mark(db.Entity):
+    student = Required(Student)
+    subject = Required(str)
+    value = Required(int)
+    PrimaryKey(student, subject)
+
+
+class TestBulkInsert(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        with db_session:
+            Mark.select().delete(bulk=True)
+            Student.select().delete(bulk=True)
+            Group.select().delete(bulk=True)
+            Group(number=1)
+        db.merge_local_stats()
+
+    def insert_count(self, entity_name):
+        prefix = 'INSERT INTO %s' % db.provider.quote_name(db.entities[entity_name]._table_)
+        return sum(stat.db_count for sql, stat in db.local_stats.items() if sql and sql.startswith(prefix))
+
+    def test_bulk_insert(self):
+        with db_session:
+            rows = [ dict(name='S%d' % i, group=1 if i % 2 else None) for i in range(16) ]
+            count = Student.bulk_insert(rows)
+            self.assertEqual(count, 16)
+            self.assertFalse(any(isinstance(obj, Student) for obj in db._get_cache().objects))
+        self.assertEqual(self.insert_count('Student'), 2)
+        with db_session:
+            self.assertEqual(select(s for s in Student).count(), 16)
+            self.assertEqual(Group[1].students.count(), 8)
+            self.assertEqual(Student.get(name='S1').scholarship, 0)
+
+    def test_bulk_insert_batch_size(self):
+        with db_session:
+            Student.bulk_insert((dict(name='S%d' % i) for i in range(10)), batch_size=4)
+        self.assertEqual(self.insert_count('Student'), 3)
+
+    def test_bulk_insert_return_ids(self):
+        with db_session:
+            ids = Student.bulk_insert([ dict(name='A'), dict(name='B', group=1), dict(name='C') ], return_ids=True)
+            self.assertEqual(len(set(ids)), 3)
+            self.assertEqual([ Student[id].name for id in ids ], ['A', 'B', 'C'])
+
+    def test_bulk_insert_composite_pk(self):
+        with db_session:
+            s = Student(name='S')
+            flush()
+            ids = Mark.bulk_insert([ dict(student=s, subject='Math', value=5),
+                                     dict(student=s.id, subject='Physics', value=4) ], return_ids=True)
+            self.assertEqual(ids, [ (s.id, 'Math'), (s.id, 'Physics') ])
+            self.assertEqual(select(m.value for m in Mark).sum(), 9)
+
+    def test_bulk_insert_converters(self):
+        with db_session:
+            Student.bulk_insert([ dict(name='S', dob='2000-01-02', scholarship='10') ])
+        with db_session:
+            s = Student.get(name='S')
+            self.assertEqual(s.dob, date(2000, 1, 2))
+            self.assertEqual(s.scholarship, 10)
+
+    def test_bulk_insert_cached_collection(self):
+        with db_session:
+            g = Group[1]
+            self.assertEqual(len(g.students), 0)
+            Student.bulk_insert([ dict(name='A', group=g) ])
+            self.assertEqual(len(g.students), 1)
+
+    def test_bulk_insert_flushes_changes(self):
+        with db_session:
+            Group(number=2)
+            Student.bulk_insert([ dict(name='A', group=2) ])
+        with db_session:
+            self.assertEqual(Student.get(name='A').group.number, 2)
+
+    @raises_exception(TypeError, "Unknown attribute 'foo'")
+    @db_session
+    def test_bulk_insert_unknown_attr(self):
+        Student.bulk_insert([ dict(name='A', foo=1) ])
+
+    @raises_exception(ValueError, 'Attribute Student.name is required')
+    @db_session
+    def test_bulk_insert_required(self):
+        Student.bulk_insert([ dict(dob=None) ])
+
+    @raises_exception(TypeError, 'Collection attribute Group.students cannot be used in bulk_insert()')
+    @db_session
+    def test_bulk_insert_collection(self):
+        Group.bulk_insert([ dict(number=2, students=[]) ])
+
+    def test_bulk_insert_integrity_error(self):
+        with self.assertRaises(TransactionIntegrityError):
+            with db_session:
+                Student.bulk_insert([ dict(name='A'), dict(name='A') ])
+        with db_session:
+            self.assertEqual(Student.select().count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
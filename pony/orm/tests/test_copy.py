@@ -0,0 +1,133 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+from io import StringIO
+from datetime import date, timedelta
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+try: from pony.orm.dbproviders import postgres
+except ImportError: postgres = None
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    name = Required(str)
+    dob = Optional(date)
+    group = Optional(Group)
+
+
+class TestCopy(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        with db_session:
+            Student.select().delete(bulk=True)
+            Group.select().delete(bulk=True)
+            Group(number=1)
+
+    def test_copy_from_tuples(self):
+        with db_session:
+            count = Student.copy_from([ ('A', date(2000, 1, 1), 1), ('B', None, None) ])
+            self.assertEqual(count, 2)
+        with db_session:
+            self.assertEqual(Student.get(name='A').group, Group[1])
+            self.assertEqual(Student.get(name='A').dob, date(2000, 1, 1))
+            self.assertEqual(Student.get(name='B').dob, None)
+
+    def test_copy_from_attrs(self):
+        with db_session:
+            Student.copy_from([ ('A', '2000-01-02'), ('B', '2000-01-03') ], attrs=['name', 'dob'])
+        with db_session:
+            self.assertEqual(select(s.dob for s in Student).max(), date(2000, 1, 3))
+
+    def test_copy_from_dicts(self):
+        with db_session:
+            Student.copy_from([ dict(name='A', group=1), dict(name='B') ])
+        with db_session:
+            self.assertEqual(Group[1].students.name, ['A'])
+
+    @raises_exception(TypeError, 'Row length must be equal to the number of attributes (3). Got: (\'A\',)')
+    @db_session
+    def test_copy_from_wrong_row(self):
+        Student.copy_from([ ('A',) ])
+
+    def test_copy_to(self):
+        with db_session:
+            Student(name='A', dob=date(2000, 1, 1), group=1)
+            Student(name='B')
+        with db_session:
+            file = StringIO()
+            count = select((s.name, s.dob) for s in Student).order_by(1).copy_to(file)
+            self.assertEqual(count, 2)
+            self.assertEqual(file.getvalue(), 'A,2000-01-01\nB,\n')
+
+    def test_copy_to_header(self):
+        with db_session:
+            Student(name='A')
+        with db_session:
+            file = StringIO()
+            select(s.name for s in Student).copy_to(file, header=True)
+            self.assertEqual(file.getvalue(), 'name\nA\n')
+
+
+
+class FakeConnection(object):
+    encoding = 'UTF8'
+
+
+class FakeCursor(object):
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.copied = []
+    def mogrify(self, sql, arguments):
+        return (sql % dict((key, repr(value)) for key, value in arguments.items())).encode('utf8')
+    def copy_expert(self, sql, file):
+        self.copied.append((sql, file.read()))
+
+
+@unittest.skipIf(postgres is None, 'psycopg2 is not installed')
+class TestPostgresCopyMocked(unittest.TestCase):
+    def setUp(self):
+        self.provider = postgres.PGProvider.__new__(postgres.PGProvider)
+
+    def test_copy_from_sql(self):
+        self.assertEqual(self.provider.get_copy_from_sql('Student', ['id', 'name']),
+                         'COPY "Student" ("id", "name") FROM STDIN WITH (FORMAT csv)')
+
+    def test_copy_to_sql(self):
+        self.assertEqual(self.provider.get_copy_to_sql('SELECT 1'), 'COPY (SELECT 1) TO STDOUT WITH (FORMAT csv)')
+        self.assertEqual(self.provider.get_copy_to_sql('SELECT 1', header=True),
+                         'COPY (SELECT 1) TO STDOUT WITH (FORMAT csv, HEADER)')
+
+    def test_copy_file(self):
+        rows = [ (1, None, ''), ('a"b,c', b'\x01\xff', timedelta(days=1, seconds=2)),
+                 (['x"y', None, 'a\\b'], postgres.psycopg2.extras.Json({'a': 1}), 'line\nbreak') ]
+        file = self.provider.rows_to_copy_file(rows)
+        self.assertEqual(file.read().split('\n', 2), [
+            '"1",,""',  # unquoted empty value is NULL, quoted empty value is an empty string
+            '"a""b,c","\\x01ff","1 days 2 seconds 0 microseconds"',
+            '"{""x\\""y"",NULL,""a\\\\b""}","{""a"": 1}","line\nbreak"\n' ])
+
+    def test_copy_expert(self):
+        cursor = FakeCursor()
+        self.provider.copy_expert(cursor, 'COPY (SELECT %(p1)s) TO STDOUT', StringIO('data'), {'p1': 'x'})
+        self.assertEqual(cursor.copied, [ ("COPY (SELECT 'x') TO STDOUT", 'data') ])
+
+
+if __name__ == '__main__':
+    unittest.main()
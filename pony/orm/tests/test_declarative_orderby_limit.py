@@ -2,6 +2,7 @@ from __future__ import absolute_import, print_function, division
 
 import unittest
 
+from pony import options
 from pony.orm.core import *
 from pony.orm.tests.testutils import *
 from pony.orm.tests import setup_database, teardown_database
@@ -153,6 +154,22 @@ class TestOrderbyLimit(unittest.TestCase):
         q = select(s for s in Student)[:2]
         self.assertEqual(set(q), {Student[2], Student[1]})
 
+    def test26(self):
+        prev_value = options.LIMIT_AS_PARAMS
+        options.LIMIT_AS_PARAMS = True
+        try:
+            query = select(s for s in Student).order_by(Student.id)
+            self.assertEqual(list(query.page(1, 2)), [Student[1], Student[2]])
+            sql = db.last_sql
+            self.assertEqual(list(query.page(2, 2)), [Student[3], Student[4]])
+            self.assertEqual(db.last_sql, sql)
+            self.assertEqual(list(query.page(3, 2)), [Student[5]])
+            self.assertEqual(db.last_sql, sql)
+            self.assertEqual(list(query.limit(offset=3)), [Student[4], Student[5]])
+            self.assertEqual(list(query[1:1]), [])
+        finally:
+            options.LIMIT_AS_PARAMS = prev_value
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,222 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Country(db.Entity):
+    _cache_ = {'ttl': 300}
+    code = PrimaryKey(str)
+    name = Required(str)
+    persons = Set('Person')
+
+
+class Person(db.Entity):
+    name = Required(str)
+    country = Required(Country)
+
+
+class Plan(db.Entity):
+    _cache_ = {'max_size': 2}
+    name = Required(str)
+
+
+class PaidPlan(Plan):
+    price = Required(int)
+
+
+class TestEntityCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            ru = Country(code='RU', name='Russia')
+            us = Country(code='US', name='USA')
+            Person(id=1, name='John', country=us)
+            Person(id=2, name='Ivan', country=ru)
+            Plan(id=1, name='Free')
+            PaidPlan(id=2, name='Pro', price=10)
+            PaidPlan(id=3, name='Enterprise', price=100)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        Country._entity_cache_.clear()
+        Plan._entity_cache_.clear()
+
+    def query_count(self):
+        return db.local_stats[None].db_count
+
+    def test_getitem(self):
+        with db_session:
+            self.assertEqual(Country['US'].name, 'USA')
+        count = self.query_count()
+        with db_session:
+            self.assertEqual(Country['US'].name, 'USA')
+            self.assertEqual(Country.get(code='US').name, 'USA')
+        self.assertEqual(self.query_count(), count)
+
+    def test_seed_loading(self):
+        with db_session:
+            Country.select()[:]
+        with db_session:
+            p = Person[1]
+            count = self.query_count()
+            self.assertEqual(p.country.name, 'USA')
+            self.assertEqual(self.query_count(), count)
+
+    def test_get_by_other_attrs(self):
+        with db_session:
+            Country['US'].name
+        count = self.query_count()
+        with db_session:
+            self.assertEqual(Country.get(code='US', name='USA').name, 'USA')
+        self.assertEqual(self.query_count(), count + 1)
+
+    def test_update_invalidates(self):
+        with db_session:
+            Country['RU'].name
+        with db_session:
+            Country['RU'].name = 'Russian Federation'
+        with db_session:
+            self.assertEqual(Country['RU'].name, 'Russian Federation')
+            Country['RU'].name = 'Russia'
+
+    def test_delete_invalidates(self):
+        with db_session:
+            Country(code='XX', name='Unknown')
+        with db_session:
+            Country['XX'].name
+        with db_session:
+            Country['XX'].delete()
+        with db_session:
+            self.assertFalse(Country.exists(code='XX'))
+            self.assertRaises(ObjectNotFound, Country.__getitem__, 'XX')
+
+    def test_rollback_keeps_cache(self):
+        with db_session:
+            Country['US'].name
+        with db_session:
+            Country['US'].name = 'United States'
+            flush()
+            rollback()
+        count = self.query_count()
+        with db_session:
+            self.assertEqual(Country['US'].name, 'USA')
+        self.assertEqual(self.query_count(), count)
+
+    def test_uncommitted_rows_are_not_cached(self):
+        with db_session:
+            Country['US'].name = 'United States'
+            flush()
+            Country.select()[:]
+            rollback()
+        with db_session:
+            self.assertEqual(Country['US'].name, 'USA')
+
+    def test_bulk_delete_clears_cache(self):
+        with db_session:
+            Country(code='XX', name='Unknown')
+        with db_session:
+            Country['XX'].name
+        with db_session:
+            delete(c for c in Country if c.code == 'XX')
+        with db_session:
+            self.assertRaises(ObjectNotFound, Country.__getitem__, 'XX')
+
+    def test_bulk_update_then_get(self):
+        with db_session:
+            Country['US'].name
+        with db_session:
+            Country.select(lambda c: c.code == 'US').update(name='United States')
+            self.assertEqual(Country['US'].name, 'United States')
+            rollback()
+        with db_session:
+            self.assertEqual(Country['US'].name, 'USA')
+
+    def test_bulk_delete_then_get(self):
+        with db_session:
+            Country(code='XX', name='Unknown')
+        with db_session:
+            Country['XX'].name
+        with db_session:
+            Country.select(lambda c: c.code == 'XX').delete(bulk=True)
+            self.assertRaises(ObjectNotFound, Country.__getitem__, 'XX')
+            rollback()
+        with db_session:
+            Country['XX'].delete()
+
+    def test_stale_session_does_not_populate(self):
+        with db_session:
+            db._get_cache()
+            db._invalidate_entity_cache_((), ())  # the same as commit of concurrent session
+            Country.select()[:]
+        self.assertEqual(len(Country._entity_cache_.rows), 0)
+        with db_session:
+            Country.select()[:]
+        self.assertEqual(len(Country._entity_cache_.rows), 2)
+
+    def test_inheritance(self):
+        with db_session:
+            Plan.select()[:]
+        count = self.query_count()
+        with db_session:
+            plan = Plan[2]
+            self.assertIsInstance(plan, PaidPlan)
+            self.assertEqual(plan.price, 10)
+            self.assertRaises(ObjectNotFound, PaidPlan.__getitem__, 1)
+        self.assertEqual(self.query_count(), count + 1)
+
+    def test_max_size(self):
+        with db_session:
+            Plan.select()[:]
+        self.assertEqual(len(Plan._entity_cache_.rows), 2)
+
+    def test_ttl(self):
+        with db_session:
+            Country['US'].name
+        Country._entity_cache_.ttl = -1
+        try:
+            with db_session:
+                Country['RU'].name
+            count = self.query_count()
+            with db_session:
+                Country['RU'].name
+            self.assertEqual(self.query_count(), count + 1)
+        finally: Country._entity_cache_.ttl = 300
+
+    def test_not_cached_entity(self):
+        self.assertIsNone(Person._entity_cache_)
+
+    @raises_exception(TypeError, '_cache_ option can be specified for root entity only. Got it in entity Bar')
+    def test_subclass_option(self):
+        db2 = Database()
+        class Foo(db2.Entity):
+            name = Required(str)
+        class Bar(Foo):
+            _cache_ = {'ttl': 10}
+
+    @raises_exception(TypeError, 'Unknown _cache_ option of entity Foo: size')
+    def test_unknown_option(self):
+        db2 = Database()
+        class Foo(db2.Entity):
+            _cache_ = {'size': 10}
+            name = Required(str)
+
+    @raises_exception(TypeError, "'ttl' cache option of entity Foo should be positive number. Got: 0")
+    def test_invalid_ttl(self):
+        db2 = Database()
+        class Foo(db2.Entity):
+            _cache_ = {'ttl': 0}
+            name = Required(str)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,298 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony import options
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    id = PrimaryKey(int)
+    name = Required(str, unique=True)
+    group = Optional(Group)
+    mentor = Optional('Student', reverse='pupils')
+    pupils = Set('Student', reverse='mentor')
+
+
+class Tag(db.Entity):
+    name = Required(str)
+    parent = Optional('Tag', reverse='children')
+    children = Set('Tag', reverse='parent')
+
+
+class Country(db.Entity):
+    name = Required(str, unique=True)
+
+
+class Order(db.Entity):
+    id = PrimaryKey(int)
+    items = Set('Item', cascade_delete=True)
+
+
+class Item(db.Entity):
+    order = Required(Order)
+    number = Required(int)
+    PrimaryKey(order, number)
+
+
+class TestFlushBatching(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        with db_session:
+            Student.select().delete(bulk=True)
+            Group.select().delete(bulk=True)
+            Tag.select().order_by(desc(Tag.id)).delete()
+            Item.select().delete(bulk=True)
+            Country.select().delete(bulk=True)
+            Order.select().delete(bulk=True)
+        db.merge_local_stats()
+
+    def statement_count(self, prefix):
+        return sum(stat.db_count for sql, stat in db.local_stats.items() if sql and sql.startswith(prefix))
+
+    def table(self, entity_name):
+        return db.provider.quote_name(db.entities[entity_name]._table_)
+
+    def insert_count(self, entity_name):
+        return self.statement_count('INSERT INTO %s' % self.table(entity_name))
+
+    def update_count(self, entity_name):
+        return self.statement_count('UPDATE %s' % self.table(entity_name))
+
+    def delete_count(self, entity_name):
+        return self.statement_count('DELETE FROM %s' % self.table(entity_name))
+
+    def test_insert_batch(self):
+        with db_session:
+            for i in range(8):
+                Student(id=i, name='S%d' % i)
+        self.assertEqual(self.insert_count('Student'), 1)
+        with db_session:
+            self.assertEqual(select(s.name for s in Student).count(), 8)
+
+    def test_insert_batch_size(self):
+        prev_value = options.FLUSH_BATCH_SIZE
+        options.FLUSH_BATCH_SIZE = 4
+        try:
+            with db_session:
+                for i in range(10):
+                    Student(id=i, name='S%d' % i)
+        finally:
+            options.FLUSH_BATCH_SIZE = prev_value
+        self.assertEqual(self.insert_count('Student'), 3)
+
+    def test_insert_different_attrs(self):
+        with db_session:
+            g = Group(number=1)
+            for i in range(8):
+                Student(id=i, name='S%d' % i, group=g if i % 2 else None)
+        self.assertEqual(self.insert_count('Student'), 2)
+        with db_session:
+            self.assertEqual(set(Group[1].students.id), {1, 3, 5, 7})
+
+    def test_insert_principal_objects(self):
+        with db_session:
+            for i in range(3):
+                g = Group(number=i)
+                for j in range(3):
+                    Student(id=i * 10 + j, name='S%d-%d' % (i, j), group=g)
+        with db_session:
+            self.assertEqual([ len(g.students) for g in Group.select().order_by(Group.number) ], [3, 3, 3])
+
+    def test_insert_self_reference(self):
+        with db_session:
+            s1 = Student(id=1, name='S1')
+            s2 = Student(id=2, name='S2', mentor=s1)
+            s3 = Student(id=3, name='S3', mentor=s2)
+        with db_session:
+            self.assertEqual(Student[3].mentor.mentor, Student[1])
+
+    def test_insert_auto_pk(self):
+        with db_session:
+            tags = [ Tag(name='T%d' % i) for i in range(5) ]
+            tags.append(Tag(name='child', parent=tags[0]))
+            flush()
+            ids = [ tag.id for tag in tags ]
+            self.assertEqual(len(set(ids)), 6)
+            self.assertEqual(tags[5].parent.id, ids[0])
+        with db_session:
+            self.assertEqual(select(t.name for t in Tag if t.id in ids).count(), 6)
+            self.assertEqual(Tag[ids[5]].parent, Tag[ids[0]])
+
+    def test_insert_auto_pk_unique_key(self):
+        with db_session:
+            countries = [ Country(name='C%d' % i) for i in range(8) ]
+            flush()
+            pairs = [ (c.id, c.name) for c in countries ]
+        if db.provider.multirow_insert_returning_support:
+            self.assertEqual(self.insert_count('Country'), 1)
+        with db_session:
+            self.assertEqual([ (id, Country[id].name) for id, name in pairs ], pairs)
+
+    def test_insert_sql_variants(self):
+        for count in (3, 5, 7, 6):
+            with db_session:
+                for i in range(count): Country(name='C%d-%d' % (count, i))
+        rows_counts = [ key[2] for key in Country._insert_sql_cache_ if key[2] is not None ]
+        self.assertEqual([ n for n in rows_counts if n & (n - 1) ], [])  # only powers of two
+
+    def test_insert_then_update_and_delete(self):
+        with db_session:
+            Student(id=1, name='S1')
+            Student(id=2, name='S2')
+        with db_session:
+            Student[1].delete()
+            Student(id=3, name='S1')
+            Student[2].name = 'S4'
+            Student(id=4, name='S2')
+        with db_session:
+            self.assertEqual(set(select(s.name for s in Student)), {'S1', 'S2', 'S4'})
+
+    def test_insert_batch_integrity_error(self):
+        with db_session:
+            Student(id=1, name='S1')
+        with self.assertRaises(TransactionIntegrityError) as cm:
+            with db_session:
+                Student(id=2, name='S2')
+                Student(id=1, name='S3')
+        self.assertTrue(str(cm.exception).startswith('Objects Student[2], Student[1] cannot be stored'))
+
+    def test_update_batch(self):
+        with db_session:
+            for i in range(10):
+                Student(id=i, name='S%d' % i)
+        db.merge_local_stats()
+        with db_session:
+            for s in Student.select():
+                s.name += 'x'
+        self.assertEqual(self.update_count('Student'), 1)
+        with db_session:
+            self.assertEqual(set(select(s.name for s in Student)), {'S%dx' % i for i in range(10)})
+
+    def test_update_different_columns(self):
+        with db_session:
+            g = Group(number=1)
+            for i in range(4):
+                Student(id=i, name='S%d' % i)
+        db.merge_local_stats()
+        with db_session:
+            g = Group[1]
+            s0, s1, s2, s3 = Student.select().order_by(Student.id)
+            s0.name = 'A'
+            s1.name = 'B'
+            s2.group = g
+            s3.group = g
+        self.assertEqual(self.update_count('Student'), 2)
+        with db_session:
+            self.assertEqual(set(Group[1].students.id), {2, 3})
+
+    def test_update_batch_after_insert(self):
+        with db_session:
+            Student(id=1, name='S1')
+            Student(id=2, name='S2')
+        with db_session:
+            Student[1].name = 'S3'
+            Student[2].group = Group(number=1)
+        with db_session:
+            self.assertEqual(Student[1].name, 'S3')
+            self.assertEqual(Student[2].group, Group[1])
+
+    def test_update_batch_optimistic_check(self):
+        with db_session:
+            for i in range(3):
+                Student(id=i, name='S%d' % i)
+        with self.assertRaises(OptimisticCheckError) as cm:
+            with db_session:
+                students = Student.select().order_by(Student.id)[:]
+                db.execute("update %s set name = 'X' where id = 1" % self.table('Student'))
+                for s in students:
+                    s.name += 'x'
+        self.assertEqual(str(cm.exception), "Object Student[1] was updated outside of current transaction. "
+                                            "Changes: name ('S1' -> 'X')")
+        with db_session:
+            self.assertEqual(Student[0].name, 'S0')
+
+    def test_update_batch_optimistic_check_deleted(self):
+        with db_session:
+            for i in range(3):
+                Student(id=i, name='S%d' % i)
+        with self.assertRaises(OptimisticCheckError) as cm:
+            with db_session:
+                students = Student.select().order_by(Student.id)[:]
+                db.execute("delete from %s where id = 2" % self.table('Student'))
+                for s in students:
+                    s.name += 'x'
+        self.assertEqual(str(cm.exception), 'Object Student[2] was deleted outside of current transaction')
+
+    def test_delete_batch(self):
+        with db_session:
+            for i in range(10):
+                Group(number=i)
+        db.merge_local_stats()
+        with db_session:
+            Group.select().delete()
+        self.assertEqual(self.delete_count('Group'), 1)
+        with db_session:
+            self.assertEqual(Group.select().count(), 0)
+
+    def test_delete_batch_size(self):
+        with db_session:
+            for i in range(10):
+                Group(number=i)
+        db.merge_local_stats()
+        db.provider.max_params_count = 4
+        try:
+            with db_session:
+                Group.select().delete()
+        finally:
+            del db.provider.max_params_count
+        self.assertEqual(self.delete_count('Group'), 3)
+        with db_session:
+            self.assertEqual(Group.select().count(), 0)
+
+    def test_delete_cascade(self):
+        with db_session:
+            for i in range(3):
+                order = Order(id=i)
+                for j in range(5):
+                    Item(order=order, number=j)
+        db.merge_local_stats()
+        with db_session:
+            Order.select().delete()
+        self.assertEqual(self.delete_count('Item'), 3)
+        self.assertEqual(self.delete_count('Order'), 3)
+        with db_session:
+            self.assertEqual(Item.select().count(), 0)
+            self.assertEqual(Order.select().count(), 0)
+
+    def test_delete_self_reference(self):
+        with db_session:
+            root = Tag(name='root')
+            for i in range(3):
+                Tag(name='T%d' % i, parent=root)
+        db.merge_local_stats()
+        with db_session:
+            Tag.select().delete()
+        self.assertEqual(self.delete_count('Tag'), 4)
+        with db_session:
+            self.assertEqual(Tag.select().count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -42,8 +42,8 @@ class TestLazy(unittest.TestCase):
         self.assertTrue(X.b not in x3._vals_)
         b = x1.b
         self.assertTrue(X.b in x1._vals_)
-        self.assertTrue(X.b not in x2._vals_)
-        self.assertTrue(X.b not in x3._vals_)
+        self.assertTrue(X.b in x2._vals_)
+        self.assertTrue(X.b in x3._vals_)
 
     @db_session
     def test_lazy_3(self):  # coverage of https://github.com/ponyorm/pony/issues/49
@@ -0,0 +1,94 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony import options
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    name = Required(str)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    name = Required(str)
+    group = Required(Group)
+
+
+class TestListParams(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        if not db.provider.array_param_support: raise unittest.SkipTest('Array parameters are not supported')
+        with db_session:
+            for i in range(300):
+                g = Group(number=i, name='G%d' % i)
+                Student(name='S%d' % i, group=g)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        self.prev_threshold = options.LIST_PARAM_THRESHOLD
+        options.LIST_PARAM_THRESHOLD = 10
+        rollback()
+        db_session.__enter__()
+
+    def tearDown(self):
+        rollback()
+        db_session.__exit__()
+        options.LIST_PARAM_THRESHOLD = self.prev_threshold
+
+    def test_int_list(self):
+        ids = list(range(0, 2000, 2))
+        self.assertEqual(select(g for g in Group if g.number in ids).count(), 150)
+        self.assertEqual(count_params(db.last_sql), 1)
+
+    def test_not_in(self):
+        ids = list(range(0, 3000, 3))
+        self.assertEqual(select(g for g in Group if g.number not in ids).count(), 200)
+        self.assertEqual(count_params(db.last_sql), 1)
+
+    def test_str_list(self):
+        names = [ 'G%d' % i for i in range(50) ]
+        self.assertEqual(set(select(g.number for g in Group if g.name in names)), set(range(50)))
+
+    def test_entity_list(self):
+        groups = Group.select(lambda g: g.number < 100)[:]
+        self.assertEqual(select(s for s in Student if s.group in groups).count(), 100)
+        self.assertEqual(count_params(db.last_sql), 1)
+
+    def test_same_sql_for_different_lengths(self):
+        ids = list(range(20))
+        select(g for g in Group if g.number in ids)[:]
+        sql = db.last_sql
+        ids = list(range(50))
+        select(g for g in Group if g.number in ids)[:]
+        self.assertEqual(db.last_sql, sql)
+
+    def test_short_list(self):
+        ids = [ 1, 2, 3 ]
+        self.assertEqual(select(g for g in Group if g.number in ids).count(), 3)
+        self.assertEqual(count_params(db.last_sql), 3)
+
+    def test_threshold_disabled(self):
+        options.LIST_PARAM_THRESHOLD = None
+        ids = list(range(20))
+        self.assertEqual(select(g for g in Group if g.number in ids).count(), 20)
+        self.assertEqual(count_params(db.last_sql), 20)
+
+    @raises_exception(TypeError, "Incomparable types 'Group' and 'str' in expression: s.group in names")
+    def test_incomparable_types(self):
+        names = [ 'G%d' % i for i in range(50) ]
+        select(s for s in Student if s.group in names)[:]
+
+
+if __name__ == '__main__':
+    unittest.main()
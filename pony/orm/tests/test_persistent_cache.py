@@ -0,0 +1,164 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest, os, shutil, subprocess, sys, tempfile
+
+from pony import options
+from pony.orm.core import *
+from pony.orm import asttranslation, decompiling
+from pony.orm.asttranslation import ast2src
+from pony.orm.persistentcache import get_persistent_cache
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    name = Required(str)
+    age = Optional(int)
+    group = Optional(Group)
+
+
+worker_script = '''
+from pony import options
+options.PERSISTENT_CACHE_DIR = %r
+from pony.orm import *
+db = Database('sqlite', ':memory:')
+class Person(db.Entity):
+    name = Required(str)
+    age = Required(int)
+db.generate_mapping(create_tables=True)
+with db_session:
+    Person(name='John', age=2)
+    Person(name='Mike', age=5)
+    print(select(p.name for p in Person).filter(lambda name: name.startswith('J'))[:])
+    print(select(p for p in Person).filter(lambda p: p.age < 3).order_by(lambda p: p.name).count())
+'''
+
+
+class TestPersistentCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            g = Group(number=1)
+            Student(id=1, name='John', age=20, group=g)
+            Student(id=2, name='Mike', age=30)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        options.PERSISTENT_CACHE_DIR = self.dirname
+        self.clear_memory_caches()
+
+    def tearDown(self):
+        options.PERSISTENT_CACHE_DIR = None
+        shutil.rmtree(self.dirname)
+        self.clear_memory_caches()
+
+    def clear_memory_caches(self):
+        decompiling.ast_cache.clear()
+        asttranslation.extractors_cache.clear()
+        db._translator_cache.clear()
+        db._constructed_sql_cache.clear()
+
+    def files(self, kind):
+        return [ name for name in os.listdir(self.dirname) if name.startswith(kind + '-') ]
+
+    def older_than(self, age):
+        return select(s.name for s in Student if s.age > age)
+
+    @db_session
+    def test_ast(self):
+        query = self.older_than(25)
+        self.assertEqual(len(self.files('ast')), 1)
+        decompiling.ast_cache.clear()
+        cache = get_persistent_cache()
+        codeobject = next(const for const in self.older_than.__code__.co_consts if hasattr(const, 'co_code'))
+        self.assertEqual(ast2src(cache.load_ast(codeobject)[0]), ast2src(query._translator.tree))
+
+    @db_session
+    def test_translator(self):
+        self.assertEqual(self.older_than(25)[:], ['Mike'])
+        self.assertEqual(len(self.files('translator')), 1)
+        self.clear_memory_caches()
+        query = self.older_than(10)
+        self.assertIs(db._translator_cache[query._key], query._translator)
+        self.assertEqual(set(query), {'John', 'Mike'})
+
+    def test_sql(self):
+        with db_session:
+            self.older_than(25)[:]
+        self.assertEqual(len(self.files('sql')), 1)
+        sql = db.last_sql
+        self.clear_memory_caches()
+        with db_session:
+            self.assertEqual(sorted(self.older_than(10)), ['John', 'Mike'])
+        self.assertEqual(db.last_sql, sql)
+        self.assertEqual(len(self.files('sql')), 1)
+
+    @db_session
+    def test_entity_param(self):
+        g = Group[1]
+        query = lambda: select(s.name for s in Student if s.group == g)[:]
+        self.assertEqual(query(), ['John'])
+        self.clear_memory_caches()
+        self.assertEqual(query(), ['John'])
+
+    @db_session
+    def test_func_extractors_are_not_stored(self):
+        query = lambda: select(s for s in Student if s.age > 0).filter(lambda s: s.name == 'John')[:]
+        self.assertEqual(query(), [ Student[1] ])
+        self.assertEqual(len(self.files('translator')), 1)
+        self.assertEqual(len(self.files('sql')), 0)
+
+    @db_session
+    def test_other_schema(self):
+        query = self.older_than(25)
+        extractors = query._translator.extractors
+        cache = get_persistent_cache()
+        self.assertIsNotNone(cache.load('translator', query._key, db, query._code_key, extractors))
+        cache.schema_hashes[db] = 'other'
+        self.assertIsNone(cache.load('translator', query._key, db, query._code_key, extractors))
+
+    @db_session
+    def test_corrupted_file(self):
+        self.older_than(25)[:]
+        for name in self.files('translator') + self.files('sql'):
+            with open(os.path.join(self.dirname, name), 'wb') as f: f.write(b'garbage')
+        self.clear_memory_caches()
+        self.assertEqual(self.older_than(25)[:], ['Mike'])
+
+    def test_other_process(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, PYTHONPATH=root)
+        for i in range(2):
+            output = subprocess.check_output([ sys.executable, '-c', worker_script % self.dirname ], env=env)
+            self.assertEqual(output.decode().split(), [ "['John']", '1' ])
+        self.assertTrue(self.files('translator'))
+
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), 'POSIX permissions only')
+    def test_new_dir_mode(self):
+        dirname = os.path.join(self.dirname, 'cache')
+        options.PERSISTENT_CACHE_DIR = dirname
+        get_persistent_cache()
+        self.assertEqual(os.stat(dirname).st_mode & 0o077, 0)
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), 'POSIX permissions only')
+    def test_writable_dir_is_refused(self):
+        os.chmod(self.dirname, 0o777)
+        with self.assertRaises(OSError) as cm:
+            get_persistent_cache()
+        self.assertIn('should not be writable by group or others', str(cm.exception))
+
+if __name__ == '__main__':
+    unittest.main()
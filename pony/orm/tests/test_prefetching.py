@@ -141,9 +141,9 @@ LIMIT 1''' % table_name
             q = select(g for g in Group)
             for g in q: # 1 query
                 for s in g.students:  # 2 query
-                    b = s.biography  # 5 queries
+                    b = s.biography  # 2 queries
             query_count = db.local_stats[None].db_count
-            self.assertEqual(query_count, 8)
+            self.assertEqual(query_count, 5)
 
     def test_14(self):
         db.merge_local_stats()
@@ -151,9 +151,9 @@ LIMIT 1''' % table_name
             q = select(g for g in Group).prefetch(Group.students)
             for g in q:   # 1 query
                 for s in g.students:  # 1 query
-                    b = s.biography  # 5 queries
+                    b = s.biography  # 1 query
             query_count = db.local_stats[None].db_count
-            self.assertEqual(query_count, 7)
+            self.assertEqual(query_count, 3)
 
     def test_15(self):
         with db_session:
@@ -219,6 +219,26 @@ LIMIT 1''' % table_name
             query_count = db.local_stats[None].db_count
             self.assertEqual(query_count, 3)
 
+    def test_20(self):
+        with db_session:
+            students = Student.select()[:]
+            db.merge_local_stats()
+            q = select((s, s.name) for s in Student).prefetch(Student.biography)
+            result = q[:]  # 2 queries
+            self.assertEqual(db.local_stats[None].db_count, 2)
+            self.assertTrue('biography' in db.last_sql)
+            self.assertFalse('gpa' in db.last_sql)
+            self.assertEqual({s.biography for s in students}, {'S1 bio', 'S2 bio', 'S4 bio', 'S5 bio', ''})
+            self.assertEqual(db.local_stats[None].db_count, 2)
+
+    def test_21(self):
+        db.merge_local_stats()
+        with db_session:
+            groups = Group.select()[:]  # 1 query
+            majors = {g.major for g in groups}  # 1 query
+            self.assertEqual(majors, {'Math', 'Computer Science'})
+            self.assertEqual(db.local_stats[None].db_count, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
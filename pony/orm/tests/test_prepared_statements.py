@@ -0,0 +1,223 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import db_params, only_for
+
+try: from pony.orm.dbproviders import postgres
+except ImportError: postgres = None
+
+db = Database()
+
+
+class Person(db.Entity):
+    name = Required(str)
+    age = Required(int)
+
+
+@only_for('postgres')
+class TestPreparedStatements(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        db.bind(prepare_threshold=2, prepared_max=2, **db_params)
+        db.generate_mapping(check_tables=False)
+        db.drop_all_tables(with_all_data=True)
+        db.create_tables()
+        with db_session:
+            Person(id=1, name='John', age=20)
+            Person(id=2, name='Mike', age=30)
+            Person(id=3, name='Kate', age=25)
+
+    @classmethod
+    def tearDownClass(cls):
+        db.drop_all_tables(with_all_data=True)
+        db.disconnect()
+
+    def setUp(self):
+        db.disconnect()  # prepared statements of previous tests are kept by the connection
+        db.provider.execution_counts.clear()
+        db.provider.prepared_statements.clear()
+
+    def prepared_count(self):
+        return db.select('count(*) from pg_prepared_statements')[0]
+
+    def older_than(self, age):
+        return select(p.name for p in Person if p.age > age).order_by(1)[:]
+
+    def test_prepare_after_threshold(self):
+        with db_session:
+            self.assertEqual(self.older_than(21), ['Kate', 'Mike'])
+            self.assertEqual(self.prepared_count(), 0)
+            self.assertEqual(self.older_than(26), ['Mike'])
+            self.assertEqual(self.prepared_count(), 1)
+            self.assertEqual(self.older_than(10), ['John', 'Kate', 'Mike'])
+
+    def test_kept_between_sessions(self):
+        with db_session:
+            self.older_than(21)
+            self.older_than(22)
+        with db_session:
+            self.assertEqual(self.prepared_count(), 1)
+            self.assertEqual(self.older_than(26), ['Mike'])
+
+    def test_inside_of_transaction(self):
+        with db_session:
+            Person[1].age = 21
+            flush()
+            self.assertEqual(self.older_than(20), ['John', 'Kate', 'Mike'])
+            self.assertEqual(self.older_than(19), ['John', 'Kate', 'Mike'])
+            self.assertEqual(self.prepared_count(), 1)
+            rollback()
+
+    def test_lru(self):
+        with db_session:
+            for i in range(2):
+                self.older_than(20 + i)
+                select(p for p in Person if p.name == 'John' + 'x' * i)[:]
+                select(p for p in Person if p.age < 30 + i)[:]
+            self.assertEqual(self.prepared_count(), 2)
+
+    def test_discard_all(self):
+        with db_session:
+            self.older_than(21)
+            self.older_than(22)
+            db._get_cache().connection.cursor().execute('DEALLOCATE ALL')  # prepared statements are lost
+            self.assertEqual(self.older_than(26), ['Mike'])
+            self.assertEqual(self.older_than(27), ['Mike'])
+
+    def test_discard_all_inside_of_transaction(self):
+        with db_session:
+            Person[1].age = 21
+            flush()
+            self.older_than(21)
+            self.older_than(22)
+            db._get_cache().connection.cursor().execute('DEALLOCATE ALL')
+            self.assertEqual(self.older_than(26), ['Mike'])  # executed without preparing
+            self.assertEqual(self.older_than(27), ['Mike'])  # prepared again
+            self.assertEqual(self.prepared_count(), 1)
+            self.assertEqual(Person[1].age, 21)
+            rollback()
+
+    def test_array_parameter(self):
+        query = lambda ids: db.select('name from person where id = any($ids) order by name')
+        with db_session:
+            self.assertEqual(query([1, 2]), ['John', 'Mike'])
+            self.assertEqual(query([2, 3]), ['Kate', 'Mike'])
+            self.assertEqual(db.select('parameter_types::text from pg_prepared_statements'), ['{bigint[]}'])
+
+    def test_reconnect(self):
+        with db_session:
+            self.older_than(21)
+            self.older_than(22)
+        db.disconnect()
+        with db_session:
+            self.assertEqual(self.older_than(26), ['Mike'])
+            self.assertEqual(self.prepared_count(), 1)
+
+    def test_parameter_types(self):
+        with db_session:
+            self.older_than(21)
+            self.older_than(22)
+            self.assertEqual(db.select('parameter_types::text from pg_prepared_statements'), ['{bigint}'])
+
+    def test_unknown_parameter_type(self):
+        query = lambda age: db.select('name from person where $age is null or age > $age order by name')
+        with db_session:
+            for i in range(3): self.assertEqual(query(None), ['John', 'Kate', 'Mike'])
+            self.assertEqual(self.prepared_count(), 0)
+            for age in (26, 27): self.assertEqual(query(age), ['Mike'])
+            self.assertEqual(self.prepared_count(), 1)
+
+    def test_literal_percent(self):
+        query = lambda: select(p.name for p in Person if p.name.startswith('J') and p.age > 0)[:]
+        with db_session:
+            for i in range(3): self.assertEqual(query(), ['John'])
+
+    @raises_exception(ValueError, "'prepare_threshold' option must be positive integer. Got: 0")
+    def test_invalid_threshold(self):
+        db2 = Database()
+        db2.bind(prepare_threshold=0, **db_params)
+
+
+
+class FakeConnection(object):
+    autocommit = False
+    def __init__(self):
+        self.log = []
+        self.lost_statements = False
+    def cursor(self):
+        return FakeCursor(self)
+    def get_transaction_status(self):
+        return postgres.extensions.TRANSACTION_STATUS_INTRANS
+
+
+class FakeCursor(object):
+    name = None
+    def __init__(self, connection):
+        self.connection = connection
+    def execute(self, sql, arguments=None):
+        connection = self.connection
+        connection.log.append(sql)
+        if connection.lost_statements and 'EXECUTE' in sql:
+            connection.lost_statements = False
+            raise InvalidStatementName('prepared statement does not exist')
+
+
+if postgres is not None:
+    class InvalidStatementName(postgres.psycopg2.Error):
+        pgcode = postgres.INVALID_SQL_STATEMENT_NAME
+
+
+@unittest.skipIf(postgres is None, 'psycopg2 is not installed')
+class TestPreparedStatementsMocked(unittest.TestCase):
+    def setUp(self):
+        provider = self.provider = postgres.PGProvider.__new__(postgres.PGProvider)
+        provider.prepare_threshold = 1
+        provider.prepared_max = 10
+        provider.execution_counts = postgres.OrderedDict()
+        provider.prepared_statements = postgres.WeakKeyDictionary()
+        provider.prepared_lock = postgres.Lock()
+        self.connection = FakeConnection()
+        self.sql = 'SELECT "name" FROM "person" WHERE "age" > %(p1)s'
+
+    def execute(self, age):
+        return self.provider._execute_prepared(self.connection.cursor(), self.sql, {'p1': age})
+
+    def test_prepare_with_types(self):
+        self.assertTrue(self.execute(20))
+        prepare_sql = [ sql for sql in self.connection.log if sql.startswith('PREPARE') ]
+        self.assertEqual(len(prepare_sql), 1)
+        self.assertTrue(prepare_sql[0].startswith('PREPARE pony_stmt_'))
+        self.assertTrue(prepare_sql[0].endswith(' (bigint) AS SELECT "name" FROM "person" WHERE "age" > $1'))
+
+    def test_lost_statement_inside_of_transaction(self):
+        self.assertTrue(self.execute(20))
+        del self.connection.log[:]
+        self.connection.lost_statements = True
+        self.assertFalse(self.execute(21))  # the caller executes the statement without preparing
+        log = self.connection.log
+        self.assertTrue(log[0].startswith('SAVEPOINT pony_execute; EXECUTE pony_stmt_'))
+        self.assertEqual(log[1:], [ 'ROLLBACK TO SAVEPOINT pony_execute; RELEASE SAVEPOINT pony_execute' ])
+        del log[:]
+        self.assertTrue(self.execute(22))  # prepared again
+        self.assertTrue(log[1].startswith('PREPARE pony_stmt_'))
+        self.assertTrue(log[3].startswith('SAVEPOINT pony_execute; EXECUTE pony_stmt_'))
+        self.assertEqual(log[4], 'RELEASE SAVEPOINT pony_execute')
+
+    def test_unknown_type(self):
+        self.assertFalse(self.execute(None))
+        self.assertEqual(self.connection.log, [])
+
+    def test_param_types(self):
+        get_param_type = postgres.get_param_type
+        self.assertEqual(get_param_type(True), 'boolean')
+        self.assertEqual(get_param_type(2**70), None)
+        self.assertEqual(get_param_type([1, 2]), 'bigint[]')
+        self.assertEqual(get_param_type(['a', None]), None)
+        self.assertEqual(get_param_type([]), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
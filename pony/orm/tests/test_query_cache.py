@@ -0,0 +1,183 @@
+from __future__ import absolute_import, print_function, division
+
+import time, unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    name = Required(str)
+    group = Required(Group)
+    courses = Set('Course')
+
+
+class Course(db.Entity):
+    name = PrimaryKey(str)
+    students = Set(Student)
+
+
+class Log(db.Entity):
+    text = Required(str)
+
+
+class TestQueryCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            g1 = Group(number=1)
+            g2 = Group(number=2)
+            c1 = Course(name='Math')
+            Student(id=1, name='John', group=g1, courses=[c1])
+            Student(id=2, name='Mike', group=g1)
+            Student(id=3, name='Kate', group=g2)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        db._query_result_cache.clear()
+
+    def query_count(self):
+        return db.local_stats[None].db_count
+
+    def names(self, group_number=1):
+        return sorted(select(s.name for s in Student if s.group.number == group_number).cache())
+
+    def test_cached_between_sessions(self):
+        with db_session:
+            self.assertEqual(self.names(), ['John', 'Mike'])
+        count = self.query_count()
+        with db_session:
+            self.assertEqual(self.names(), ['John', 'Mike'])
+            self.assertEqual(self.names(2), ['Kate'])
+        self.assertEqual(self.query_count(), count + 1)
+
+    def test_entities(self):
+        query = lambda: select(s for s in Student if s.group.number == 1).cache()[:]
+        with db_session:
+            query()
+        count = self.query_count()
+        with db_session:
+            students = query()
+            self.assertEqual(sorted(s.name for s in students), ['John', 'Mike'])
+        self.assertEqual(self.query_count(), count)
+
+    def test_aggregate(self):
+        query = lambda: select(s for s in Student).cache().count()
+        with db_session:
+            self.assertEqual(query(), 3)
+        count = self.query_count()
+        with db_session:
+            self.assertEqual(query(), 3)
+        self.assertEqual(self.query_count(), count)
+
+    def test_not_cached_without_option(self):
+        query = lambda: select(s.name for s in Student)[:]
+        with db_session:
+            query()
+        count = self.query_count()
+        with db_session:
+            query()
+        self.assertEqual(self.query_count(), count + 1)
+
+    def test_invalidation(self):
+        with db_session:
+            self.names()
+        with db_session:
+            Student[2].name = 'Michael'
+        with db_session:
+            self.assertEqual(self.names(), ['John', 'Michael'])
+            Student[2].name = 'Mike'
+
+    def test_unrelated_table(self):
+        with db_session:
+            self.names()
+        with db_session:
+            Log(text='test')
+        count = self.query_count()
+        with db_session:
+            self.names()
+        self.assertEqual(self.query_count(), count)
+
+    def test_many_to_many(self):
+        query = lambda: select(c.name for s in Student for c in s.courses if s.id == 2).cache()[:]
+        with db_session:
+            self.assertEqual(list(query()), [])
+        with db_session:
+            Student[2].courses.add(Course['Math'])
+        with db_session:
+            self.assertEqual(list(query()), ['Math'])
+            Student[2].courses.clear()
+
+    def test_bulk_delete(self):
+        with db_session:
+            Log(text='old')
+        query = lambda: select(l for l in Log if l.text == 'old').cache().count()
+        with db_session:
+            self.assertEqual(query(), 1)
+        with db_session:
+            delete(l for l in Log if l.text == 'old')
+        with db_session:
+            self.assertEqual(query(), 0)
+
+    def test_raw_execute(self):
+        with db_session:
+            self.names()
+        with db_session:
+            db.execute('select 1')
+        count = self.query_count()
+        with db_session:
+            self.names()
+        self.assertEqual(self.query_count(), count + 1)
+
+    def test_rollback(self):
+        with db_session:
+            self.names()
+        with db_session:
+            Student[2].name = 'Michael'
+            flush()
+            self.assertEqual(self.names(), ['John', 'Michael'])
+            rollback()
+        count = self.query_count()
+        with db_session:
+            self.assertEqual(self.names(), ['John', 'Mike'])
+        self.assertEqual(self.query_count(), count)
+
+    def test_ttl(self):
+        query = lambda: select(g.number for g in Group).cache(ttl=0.01)[:]
+        with db_session:
+            query()
+        time.sleep(0.02)
+        count = self.query_count()
+        with db_session:
+            query()
+        self.assertEqual(self.query_count(), count + 1)
+
+    def test_raw_sql(self):
+        query = lambda: select(s.name for s in Student if raw_sql('s.id > 0')).cache()[:]
+        with db_session:
+            query()
+        count = self.query_count()
+        with db_session:
+            query()
+        self.assertEqual(self.query_count(), count + 1)
+
+    @raises_exception(TypeError, "'ttl' argument of cache() method should be positive number. Got: 0")
+    def test_invalid_ttl(self):
+        with db_session:
+            select(s for s in Student).cache(ttl=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
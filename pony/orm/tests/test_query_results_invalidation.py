@@ -0,0 +1,128 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    title = Optional(str)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    name = Required(str)
+    group = Required(Group)
+    courses = Set('Course')
+
+
+class Course(db.Entity):
+    name = PrimaryKey(str)
+    students = Set(Student)
+
+
+class Log(db.Entity):
+    text = Required(str)
+
+
+class TestQueryResultsInvalidation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            g1 = Group(number=1)
+            g2 = Group(number=2)
+            Course(name='Math')
+            Student(id=1, name='John', group=g1)
+            Student(id=2, name='Mike', group=g2)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        rollback()
+        db_session.__enter__()
+
+    def tearDown(self):
+        rollback()
+        db_session.__exit__()
+
+    def query_count(self):
+        return db.local_stats[None].db_count
+
+    def names(self):
+        return select(s.name for s in Student if s.group.number == 1)[:]
+
+    def test_unrelated_table(self):
+        self.names()
+        Log(text='test')
+        flush()
+        count = self.query_count()
+        self.names()
+        self.assertEqual(self.query_count(), count)
+
+    def test_related_table(self):
+        self.names()
+        Student[2].name = 'Michael'
+        flush()
+        count = self.query_count()
+        self.names()
+        self.assertEqual(self.query_count(), count + 1)
+
+    def test_joined_table(self):
+        query = lambda: select(s.name for s in Student if s.group.title == '')[:]
+        self.assertEqual(set(query()), {'John', 'Mike'})
+        Group[2].title = 'Second'
+        flush()
+        self.assertEqual(query(), ['John'])
+
+    def test_many_to_many(self):
+        query = lambda: select(c.name for s in Student for c in s.courses if s.id == 1)[:]
+        self.assertEqual(query(), [])
+        Student[1].courses.add(Course['Math'])
+        Log(text='test')
+        flush()
+        self.assertEqual(query(), ['Math'])
+
+    def test_aggregate(self):
+        query = lambda: select(s for s in Student).count()
+        self.assertEqual(query(), 2)
+        Log(text='test')
+        flush()
+        count = self.query_count()
+        self.assertEqual(query(), 2)
+        self.assertEqual(self.query_count(), count)
+        Student(id=3, name='Kate', group=Group[1])
+        flush()
+        self.assertEqual(query(), 3)
+
+    def test_bulk_delete(self):
+        Log(text='test')
+        self.names()
+        select(l for l in Log).delete(bulk=True)
+        count = self.query_count()
+        self.names()
+        self.assertEqual(self.query_count(), count)
+        select(s for s in Student if s.name == 'Unknown').delete(bulk=True)
+        count = self.query_count()
+        self.names()
+        self.assertEqual(self.query_count(), count + 1)
+
+    def test_raw_sql(self):
+        query = lambda: select(s.name for s in Student if raw_sql('s.id = 1'))[:]
+        query()
+        Log(text='test')
+        flush()
+        count = self.query_count()
+        query()
+        self.assertEqual(self.query_count(), count + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
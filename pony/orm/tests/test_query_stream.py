@@ -0,0 +1,153 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database, only_for
+
+db = Database()
+
+
+class Group(db.Entity):
+    id = PrimaryKey(int)
+    number = Required(str, unique=True)
+    students = Set("Student")
+
+
+class Student(db.Entity):
+    id = PrimaryKey(int)
+    name = Required(str)
+    group = Required("Group")
+
+
+class TestQueryStream(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            g1 = Group(id=1, number='g111')
+            g2 = Group(id=2, number='g222')
+            for i in range(1, 11):
+                Student(id=i, name='S%d' % i, group=g1 if i % 2 else g2)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        rollback()
+        db_session.__enter__()
+
+    def tearDown(self):
+        rollback()
+        db_session.__exit__()
+
+    def test_iter_chunks(self):
+        chunks = list(select(s for s in Student).order_by(Student.id).iter_chunks(4))
+        self.assertEqual([ len(chunk) for chunk in chunks ], [4, 4, 2])
+        self.assertEqual([ s.id for chunk in chunks for s in chunk ], list(range(1, 11)))
+
+    def test_stream(self):
+        result = list(select(s for s in Student).order_by(Student.id).stream(3))
+        self.assertEqual(result, [ Student[i] for i in range(1, 11) ])
+
+    def test_stream_attributes(self):
+        result = list(select(s.name for s in Student if s.id <= 3).order_by(1).stream(2))
+        self.assertEqual(result, ['S1', 'S2', 'S3'])
+
+    def test_stream_tuples(self):
+        result = list(select((s, s.group.number) for s in Student if s.id <= 2).order_by(1).stream(1))
+        self.assertEqual(result, [ (Student[1], 'g111'), (Student[2], 'g222') ])
+
+    def test_stream_evict(self):
+        cache = db._get_cache()
+        for s in select(s for s in Student).stream(3, evict=True):
+            self.assertTrue(s._session_cache_ is cache)
+        self.assertEqual([ obj for obj in cache.objects if isinstance(obj, Student) ], [])
+        s1 = Student[1]
+        self.assertEqual(s1.name, 'S1')
+
+    def test_stream_evict_keeps_modified(self):
+        modified = []
+        for s in select(s for s in Student).order_by(Student.id).stream(3, evict=True):
+            if s.id == 2:
+                s.name = 'S2x'
+                modified.append(s)
+        self.assertEqual(modified, [ Student[2] ])
+        self.assertEqual(Student[2].name, 'S2x')
+
+    def test_stream_evict_keeps_referenced(self):
+        students = select(s for s in Student if s.id <= 4).order_by(Student.id)[:]
+        for g in select(g for g in Group).stream(1, evict=True): pass
+        group = students[0].group
+        self.assertIs(group, Group[1])
+        self.assertIs(group._session_cache_, db._get_cache())
+        self.assertEqual(group.number, 'g111')
+
+    def test_stream_evict_from_collection(self):
+        group = Group[1]
+        self.assertEqual(len(group.students), 5)
+        for s in select(s for s in Student).stream(3, evict=True): pass
+        students = sorted(group.students, key=lambda s: s.id)
+        self.assertEqual(len(students), 5)
+        self.assertIs(students[0], Student[1])
+        self.assertIs(students[0]._session_cache_, db._get_cache())
+
+    def test_stream_evict_drops_query_results(self):
+        query = select(g for g in Group).order_by(Group.id)
+        old_groups = query[:]
+        for g in select(g for g in Group).stream(1, evict=True): pass
+        groups = query[:]
+        self.assertIsNot(groups[0], old_groups[0])
+        self.assertIs(groups[0], Group[1])
+        self.assertIs(groups[0]._session_cache_, db._get_cache())
+
+    def test_stream_prefetch(self):
+        result = list(select(s for s in Student).prefetch(Student.group).stream(4))
+        self.assertEqual(len(result), 10)
+        for s in result:
+            self.assertTrue(Group.number in s.group._vals_)
+
+    @raises_exception(TypeError, "'batch_size' argument of stream() method must be positive integer. Got: 0")
+    def test_stream_wrong_batch_size(self):
+        select(s for s in Student).stream(0)
+
+    @raises_exception(DatabaseSessionIsOver,
+                      'Cannot fetch next rows of query result: the database session is over')
+    def test_stream_after_session_end(self):
+        chunks = select(s for s in Student).iter_chunks(3)
+        next(chunks)
+        rollback()
+        next(chunks)
+
+    def test_stream_server_side(self):
+        # falls back to a regular cursor for providers without server-side cursors
+        result = list(select(s.id for s in Student).order_by(1).stream(4, server_side=True))
+        self.assertEqual(result, list(range(1, 11)))
+
+    def test_database_stream(self):
+        x = 3
+        result = list(db.stream('id, name from Student where id <= $x order by id', batch_size=2))
+        self.assertEqual(result, [ (1, 'S1'), (2, 'S2'), (3, 'S3') ])
+        self.assertEqual(result[1].name, 'S2')
+
+    def test_database_stream_single_column(self):
+        result = list(db.stream('select id from Student order by id', batch_size=3, server_side=True))
+        self.assertEqual(result, list(range(1, 11)))
+
+    @only_for('postgres')
+    def test_database_stream_server_side_postgres(self):
+        result = list(db.stream('id, name from Student where id <= 3 order by id', batch_size=2, server_side=True))
+        self.assertEqual(result, [ (1, 'S1'), (2, 'S2'), (3, 'S3') ])
+        self.assertEqual(result[2].name, 'S3')
+        result = list(db.stream('id from Student order by id', batch_size=4, server_side=True))
+        self.assertEqual(result, list(range(1, 11)))
+
+    @raises_exception(TypeError, "'batch_size' argument of stream() method must be positive integer. Got: 'a'")
+    def test_database_stream_wrong_batch_size(self):
+        db.stream('id from Student', batch_size='a')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    dept = Required(str)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    id = PrimaryKey(int)
+    name = Required(str, unique=True)
+    gpa = Required(float)
+    group = Optional(Group)
+    courses = Set('Course')
+
+
+class Course(db.Entity):
+    name = PrimaryKey(str)
+    students = Set(Student)
+
+
+class TestQueryUpdate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        with db_session:
+            Course.select().delete()
+            Student.select().delete(bulk=True)
+            Group.select().delete(bulk=True)
+        with db_session:
+            g1 = Group(number=1, dept='Math')
+            g2 = Group(number=2, dept='Physics')
+            c = Course(name='Algebra')
+            for i in range(1, 7):
+                Student(id=i, name='S%d' % i, gpa=float(i), group=g1 if i <= 3 else g2,
+                        courses=[c] if i % 2 else [])
+        rollback()
+        db_session.__enter__()
+
+    def tearDown(self):
+        rollback()
+        db_session.__exit__()
+
+    def test_update_value(self):
+        count = select(s for s in Student if s.gpa > 4).update(gpa=5.0)
+        self.assertEqual(count, 2)
+        self.assertEqual(select(s.id for s in Student if s.gpa == 5).order_by(1)[:], [5, 6])
+
+    def test_update_lambda(self):
+        x = 10
+        count = Student.select(lambda s: s.id <= 2).update(gpa=lambda s: s.gpa + x)
+        self.assertEqual(count, 2)
+        self.assertEqual(select(s.gpa for s in Student).order_by(1)[:], [3, 4, 5, 6, 11, 12])
+
+    def test_update_reference(self):
+        g2 = Group[2]
+        count = select(s for s in Student if s.group.number == 1).update(group=g2)
+        self.assertEqual(count, 3)
+        self.assertEqual(g2.students.count(), 6)
+
+    def test_update_join(self):
+        count = select(s for s in Student if s.group.dept == 'Physics').update(gpa=0.0)
+        self.assertEqual(count, 3)
+        self.assertEqual(select(s.id for s in Student if s.gpa == 0).order_by(1)[:], [4, 5, 6])
+
+    def test_update_subquery(self):
+        count = select(s for s in Student if count(s.courses) > 0).update(gpa=lambda s: s.gpa * 2)
+        self.assertEqual(count, 3)
+        self.assertEqual(select(s.gpa for s in Student).order_by(1)[:], [2, 2, 4, 6, 6, 10])
+
+    def test_bulk_delete_aggregated(self):
+        count = select(s for s in Student if count(s.courses) == 0).delete(bulk=True)
+        self.assertEqual(count, 3)
+        self.assertEqual(select(s.id for s in Student).order_by(1)[:], [1, 3, 5])
+
+    def test_update_cached_objects(self):
+        s1 = Student[1]
+        s4 = Student[4]
+        self.assertEqual(s1.gpa, 1.0)
+        select(s for s in Student if s.id == 1).update(gpa=7.0, name='X')
+        self.assertEqual(s1.gpa, 7.0)
+        self.assertEqual(s1.name, 'X')
+        self.assertEqual(s4.gpa, 4.0)
+        self.assertIs(Student.get(name='X'), s1)
+        self.assertEqual(Student.get(name='S1'), None)
+
+    def test_update_cached_reference(self):
+        g1 = Group[1]
+        s1 = Student[1]
+        self.assertEqual(len(g1.students), 3)
+        select(s for s in Student if s.id == 1).update(group=None)
+        self.assertEqual(s1.group, None)
+        self.assertEqual(len(g1.students), 2)
+
+    def test_update_cached_collection(self):
+        g1 = Group[1]
+        g2 = Group[2]
+        self.assertEqual(len(g2.students), 3)
+        select(s for s in Student if s.group == g1).update(group=g2)
+        self.assertEqual(len(g1.students), 0)
+        self.assertEqual(len(g2.students), 6)
+
+    def test_update_query_results(self):
+        query = select(s.gpa for s in Student if s.id == 1)
+        self.assertEqual(query[:], [1.0])
+        select(s for s in Student if s.id == 1).update(gpa=2.0)
+        self.assertEqual(query[:], [2.0])
+
+    def test_update_flushes_changes(self):
+        Student[1].gpa = 3.0
+        count = select(s for s in Student if s.gpa == 3).update(gpa=9.0)
+        self.assertEqual(count, 2)
+
+    @raises_exception(TypeError, "Unknown attribute 'foo'")
+    def test_update_unknown_attr(self):
+        Student.select().update(foo=1)
+
+    @raises_exception(TypeError, 'Cannot change value of primary key attribute id')
+    def test_update_pk(self):
+        Student.select().update(id=1)
+
+    @raises_exception(TypeError, 'Collection attribute Student.courses cannot be updated in bulk')
+    def test_update_collection(self):
+        Student.select().update(courses=[])
+
+    @raises_exception(TypeError, 'Update query should be applied to a single entity. Got: s.name')
+    def test_update_not_entity(self):
+        select(s.name for s in Student).update(name='X')
+
+    @raises_exception(TranslationError,
+                      'Expression for attribute Student.name in update() method can refer to attributes of Student only')
+    def test_update_lambda_join(self):
+        Student.select().update(name=lambda s: s.group.dept)
+
+    @raises_exception(TypeError, 'Expression for attribute Student.gpa in update() method cannot be wrapped with desc()')
+    def test_update_lambda_desc(self):
+        Student.select().update(gpa=lambda s: desc(s.gpa))
+
+    def test_flush_update_builder(self):
+        ast = [ 'UPDATE', 'Student', [ ('gpa', [ 'VALUE', 1.0 ]) ],
+                [ 'WHERE', [ 'EQ', [ 'COLUMN', None, 'id' ], [ 'VALUE', 1 ] ] ] ]
+        builder = db.provider.sqlbuilder_cls(db.provider, ast)
+        self.assertEqual(builder.indent, 0)
+        self.assertFalse(builder.suppress_aliases)
+
+
+if __name__ == '__main__':
+    unittest.main()
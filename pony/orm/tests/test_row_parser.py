@@ -0,0 +1,102 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest, warnings
+from decimal import Decimal
+
+from pony.orm.core import *
+from pony.orm.core import DatabaseContainsIncorrectEmptyValue
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    students = Set('Student')
+
+
+class Person(db.Entity):
+    name = Required(str)
+    nickname = Optional(str, nullable=True)
+
+
+class Student(Person):
+    group = Optional(Group)
+    gpa = Optional(Decimal)
+    marks = Set('Mark')
+
+
+class Mark(db.Entity):
+    student = Required(Student)
+    subject = Required(str)
+    value = Required(int)
+    PrimaryKey(student, subject)
+
+
+class TestRowParser(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            g = Group(number=1)
+            Person(id=1, name='John')
+            s = Student(id=2, name='Mike', nickname='Star', group=g, gpa=Decimal('3.5'))
+            Student(id=3, name='Kate', nickname='Star')
+            Mark(student=s, subject='Math', value=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    @db_session
+    def test_same_result_as_generic_parser(self):
+        sql, adapter, attr_offsets = Person._construct_sql_({}, False, None, False, False, False)
+        rows = db._exec_sql(sql, adapter({})).fetchall()
+        parse_row = Person._get_row_parser_(attr_offsets)
+        cache = db._get_cache()
+        for row in rows:
+            self.assertEqual(parse_row(row, cache.dbvals_deduplication_cache), Person._parse_row_(row, attr_offsets))
+
+    @db_session
+    def test_parser_is_cached(self):
+        sql, adapter, attr_offsets = Person._construct_sql_({}, False, None, False, False, False)
+        self.assertIs(Person._get_row_parser_(attr_offsets), Student._get_row_parser_(dict(attr_offsets)))
+
+    @db_session
+    def test_inheritance(self):
+        persons = Person.select().order_by(Person.id)[:]
+        self.assertEqual([ p.__class__ for p in persons ], [ Person, Student, Student ])
+        s = persons[1]
+        self.assertEqual(s.nickname, 'Star')
+        self.assertEqual(s.gpa, Decimal('3.5'))
+        self.assertEqual(s.group, Group[1])
+        self.assertIsNone(persons[2].group)
+
+    @db_session
+    def test_composite_key(self):
+        mark = Mark.select().first()
+        self.assertEqual(mark.student, Student[2])
+        self.assertEqual(mark.value, 5)
+        self.assertIs(Mark[Student[2], 'Math'], mark)
+
+    @db_session
+    def test_deduplication(self):
+        s1, s2 = Student.select().order_by(Student.id)
+        self.assertEqual(s1.nickname, 'Star')
+        self.assertIs(s1.nickname, s2.nickname)
+
+    def test_empty_value_of_required_attribute(self):
+        with db_session:
+            db.execute("update Person set name = '' where id = 1")
+        with db_session:
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter('always')
+                self.assertEqual(Person[1].name, '')
+            self.assertEqual(len(w), 1)
+            self.assertIs(w[0].category, DatabaseContainsIncorrectEmptyValue)
+            Person[1].name = 'John'
+
+
+if __name__ == '__main__':
+    unittest.main()
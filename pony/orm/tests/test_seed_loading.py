@@ -0,0 +1,133 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony import options
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    name = Required(str)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    id = PrimaryKey(int)
+    name = Required(str)
+    group = Required(Group)
+
+
+class TestSeedLoading(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            for i in range(1, 9):
+                g = Group(number=i, name='G%d' % i)
+                Student(id=i, name='S%d' % i, group=g)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def loaded_groups(self):
+        return {g.number for g in db._get_cache().objects
+                if isinstance(g, Group) and Group.name in g._vals_}
+
+    def group_stat(self):
+        stat = db.seed_stats.get('Group')
+        if stat is None: return 0, 0, 0
+        return stat.batch_count, stat.loaded_count, stat.accessed_count
+
+    @db_session
+    def test_scope(self):
+        students1 = select(s for s in Student if s.id <= 3)[:]
+        students2 = select(s for s in Student if s.id > 3)[:]
+        self.assertEqual(self.loaded_groups(), set())
+        students1[0].group.name
+        self.assertEqual(self.loaded_groups(), {1, 2, 3})
+        students2[0].group.name
+        self.assertEqual(self.loaded_groups(), set(range(1, 9)))
+
+    @db_session
+    def test_batch_size(self):
+        prev_value = options.SEED_BATCH_SIZE
+        options.SEED_BATCH_SIZE = 2
+        try:
+            students = select(s for s in Student).order_by(Student.id)[:]
+            students[0].group.name
+            self.assertEqual(len(self.loaded_groups()), 2)
+        finally:
+            options.SEED_BATCH_SIZE = prev_value
+
+    @db_session
+    def test_entity_batch_size(self):
+        Group._seed_batch_size_ = 3
+        try:
+            students = select(s for s in Student).order_by(Student.id)[:]
+            students[0].group.name
+            self.assertEqual(len(self.loaded_groups()), 3)
+        finally:
+            Group._seed_batch_size_ = None
+
+    @db_session
+    def test_padding(self):
+        array_param_support = db.provider.array_param_support
+        db.provider.array_param_support = False
+        try:
+            students = select(s for s in Student if s.id <= 3)[:]
+            students[0].group.name
+        finally:
+            db.provider.array_param_support = array_param_support
+        self.assertEqual(count_params(db.last_sql), 4)
+        self.assertEqual(self.loaded_groups(), {1, 2, 3})
+
+    def test_seed_stats(self):
+        batch_count, loaded_count, accessed_count = self.group_stat()
+        with db_session:
+            students = select(s for s in Student if s.id <= 4)[:]
+            students[0].group.name
+            students[1].group.name
+        self.assertEqual(self.group_stat(), (batch_count + 1, loaded_count + 3, accessed_count + 1))
+
+    def test_seed_stats_after_release(self):
+        batch_count, loaded_count, accessed_count = self.group_stat()
+        with db_session:
+            students = select(s for s in Student if s.id <= 4)[:]
+            students[0].group.name
+            cache = db._get_cache()
+            db.provider.release(cache.connection, cache)  # the same as a session which already released its connection
+            cache.connection = None
+        self.assertEqual(self.group_stat(), (batch_count + 1, loaded_count + 3, accessed_count))
+
+    def test_seed_stats_are_accumulated_in_place(self):
+        batch_count, loaded_count, accessed_count = self.group_stat()
+        with db_session:
+            students = select(s for s in Student if s.id <= 4)[:]
+            students[0].group.name
+            cache = db._get_cache()
+            stat = cache.seed_stats['Group']
+            self.assertEqual((stat.batch_count, stat.loaded_count), (1, 3))
+            self.assertEqual(len(cache.loaded_seeds), 3)
+            g2 = students[1].group
+            g2.name
+            cache.evict([ students[1], g2 ])
+            self.assertNotIn(g2, cache.loaded_seeds)
+            self.assertEqual(stat.accessed_count, 1)
+        self.assertEqual(self.group_stat(), (batch_count + 1, loaded_count + 3, accessed_count + 1))
+
+    @raises_exception(TypeError, '_seed_batch_size_ of entity Foo should be positive integer. Got: 0')
+    def test_invalid_batch_size(self):
+        db2 = Database()
+        class Foo(db2.Entity):
+            _seed_batch_size_ = 0
+            name = Required(str)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+from __future__ import absolute_import, print_function, division
+
+import sqlite3, threading, time, unittest
+
+from pony.orm.core import *
+from pony.orm.dbapiprovider import SharedPool
+from pony.orm.tests.testutils import *
+from pony.orm.tests import db_params, only_for
+
+
+def make_pool(**options):
+    return SharedPool(sqlite3, options, ':memory:', check_same_thread=False)
+
+
+class TestSharedPool(unittest.TestCase):
+    def test_reuse(self):
+        pool = make_pool(max_size=2)
+        con, is_new = pool.connect()
+        self.assertTrue(is_new)
+        pool.release(con)
+        con2, is_new = pool.connect()
+        self.assertIs(con2, con)
+        self.assertFalse(is_new)
+
+    def test_max_size(self):
+        pool = make_pool(max_size=2, timeout=0)
+        con1, _ = pool.connect()
+        con2, _ = pool.connect()
+        self.assertIsNot(con1, con2)
+        self.assertRaises(PoolTimeoutError, pool.connect)
+        pool.release(con1)
+        con3, is_new = pool.connect()
+        self.assertIs(con3, con1)
+
+    def test_overflow(self):
+        pool = make_pool(max_size=1, max_overflow=1, timeout=0)
+        con1, _ = pool.connect()
+        con2, _ = pool.connect()
+        self.assertEqual(pool.size, 2)
+        pool.release(con2)
+        self.assertEqual(pool.size, 1)
+        self.assertEqual(len(pool.idle), 0)
+        pool.release(con1)
+        self.assertEqual(len(pool.idle), 1)
+
+    def test_wait_for_connection(self):
+        pool = make_pool(max_size=1, timeout=5)
+        con, _ = pool.connect()
+        def release():
+            time.sleep(0.05)
+            pool.release(con)
+        thread = threading.Thread(target=release)
+        thread.start()
+        con2, is_new = pool.connect()
+        thread.join()
+        self.assertIs(con2, con)
+        self.assertFalse(is_new)
+
+    def test_idle_timeout(self):
+        pool = make_pool(max_size=2, idle_timeout=0.01)
+        con1, _ = pool.connect()
+        pool.release(con1)
+        time.sleep(0.02)
+        con2, is_new = pool.connect()
+        self.assertIsNot(con2, con1)
+        self.assertTrue(is_new)
+        self.assertEqual(pool.size, 1)
+
+    def test_idle_timeout_min_size(self):
+        pool = make_pool(min_size=1, max_size=2, idle_timeout=0.01)
+        con1, _ = pool.connect()
+        con2, _ = pool.connect()
+        pool.release(con1)
+        pool.release(con2)
+        time.sleep(0.02)
+        con3, is_new = pool.connect()
+        self.assertIs(con3, con1)
+        self.assertEqual(pool.size, 1)
+
+    def test_min_size(self):
+        pool = make_pool(min_size=3, max_size=5)
+        con1, is_new = pool.connect()
+        self.assertTrue(is_new)
+        self.assertEqual(pool.size, 3)
+        self.assertEqual(len(pool.idle), 2)
+        con2, is_new = pool.connect()
+        self.assertTrue(is_new)  # connection opened in advance is new for its first user
+        self.assertEqual(pool.size, 3)
+        pool.release(con2)
+        con3, is_new = pool.connect()
+        self.assertIs(con3, con2)
+        self.assertFalse(is_new)
+
+    def test_min_size_after_disconnect(self):
+        pool = make_pool(min_size=2, max_size=5)
+        con1, _ = pool.connect()
+        pool.release(con1)
+        pool.disconnect()
+        self.assertEqual(pool.size, 0)
+        con2, is_new = pool.connect()
+        self.assertTrue(is_new)
+        self.assertEqual(pool.size, 2)
+        self.assertEqual(len(pool.idle), 1)
+
+    def test_max_lifetime(self):
+        pool = make_pool(max_size=2, max_lifetime=0.01)
+        con1, _ = pool.connect()
+        time.sleep(0.02)
+        pool.release(con1)
+        con2, is_new = pool.connect()
+        self.assertIsNot(con2, con1)
+        self.assertTrue(is_new)
+
+    def test_pre_ping(self):
+        pool = make_pool(max_size=2, pre_ping=True)
+        con1, _ = pool.connect()
+        pool.release(con1)
+        con1.close()
+        con2, is_new = pool.connect()
+        self.assertIsNot(con2, con1)
+        self.assertTrue(is_new)
+        self.assertEqual(pool.size, 1)
+
+    def test_disconnect(self):
+        pool = make_pool(max_size=2)
+        con1, _ = pool.connect()
+        con2, _ = pool.connect()
+        pool.release(con1)
+        pool.disconnect()
+        self.assertEqual(pool.size, 1)
+        pool.release(con2)
+        self.assertEqual(len(pool.idle), 1)
+
+    @raises_exception(TypeError, 'Unknown pool option: size')
+    def test_unknown_option(self):
+        make_pool(size=10)
+
+    @raises_exception(ValueError, "'min_size' pool option must be integer between 0 and max_size. Got: 5")
+    def test_wrong_min_size(self):
+        make_pool(min_size=5, max_size=2)
+
+
+
+@only_for('postgres')
+class TestSharedPoolBinding(unittest.TestCase):
+    def setUp(self):
+        self.db = Database()
+        self.connections = []
+        @self.db.on_connect
+        def on_connect(db, connection):
+            self.connections.append(connection)
+
+    def tearDown(self):
+        if self.db.provider is not None: self.db.disconnect()
+
+    def test_min_size(self):
+        db = self.db
+        db.bind(pool=dict(min_size=3, max_size=5), **db_params)
+        pool = db.provider.pool
+        self.assertIsInstance(pool, SharedPool)
+        self.assertEqual(pool.size, 3)
+        self.assertEqual(len(self.connections), 1)
+        with db_session:
+            self.assertEqual(db.select('select 1'), [1])
+        self.assertEqual(pool.size, 3)
+
+    def test_on_connect_for_connections_opened_in_advance(self):
+        db = self.db
+        db.bind(pool=dict(min_size=2, max_size=2), **db_params)
+        barrier = threading.Barrier(2)
+        @db_session
+        def worker():
+            db.select('select 1')
+            barrier.wait(5)  # both connections are in use at the same time
+        threads = [ threading.Thread(target=worker) for i in range(2) ]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(len(set(map(id, self.connections))), 2)
+        self.assertEqual(db.provider.pool.size, 2)
+
+    def test_connections_are_reused(self):
+        db = self.db
+        db.bind(pool=dict(max_size=1), **db_params)
+        for i in range(3):
+            with db_session:
+                db.select('select 1')
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(db.provider.pool.size, 1)
+
+    @raises_exception(TypeError, 'Unknown pool option: size')
+    def test_unknown_option(self):
+        self.db.bind(pool=dict(size=10), **db_params)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from pony.orm.core import *
+from pony.orm import sqlbuilding
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Group(db.Entity):
+    number = PrimaryKey(int)
+    students = Set('Student')
+
+
+class Student(db.Entity):
+    name = Required(str)
+    dob = Optional(date)
+    gpa = Optional(Decimal)
+    group = Optional(Group)
+
+
+class TestCompiledAdapters(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def build(self, ast):
+        return db.provider.sqlbuilder_cls(db.provider, ast)
+
+    def generic_result(self, builder, values):
+        params = builder.params
+        if builder.paramstyle in ('named', 'pyformat'):
+            return { 'p%d' % param.id: param.eval(values) for param in params }
+        return tuple(param.eval(values) for param in params)
+
+    def test_simple_params(self):
+        attrs = [ Student.name, Student.dob, Student.gpa ]
+        ast = [ 'INSERT', 'Student', [ attr.column for attr in attrs ],
+                [ [ 'PARAM', (i, None, None), attr.converters[0] ] for i, attr in enumerate(attrs) ] ]
+        builder = self.build(ast)
+        for values in [ ('John', date(2000, 1, 1), Decimal('3.5')), ('Mike', None, None) ]:
+            self.assertEqual(builder.adapter(values), self.generic_result(builder, values))
+
+    def test_repeated_param(self):
+        converter = Student.name.converters[0]
+        ast = [ 'SELECT', [ 'ALL', [ 'COLUMN', None, 'id' ] ], [ 'FROM', [ None, 'TABLE', 'Student' ] ],
+                [ 'WHERE', [ 'EQ', [ 'COLUMN', None, 'name' ], [ 'PARAM', ('x', None, None), converter ] ],
+                           [ 'NE', [ 'COLUMN', None, 'name' ], [ 'PARAM', ('y', None, None), converter ] ],
+                           [ 'NE', [ 'COLUMN', None, 'name' ], [ 'PARAM', ('x', None, None), converter ] ] ] ]
+        builder = self.build(ast)
+        values = { 'x': 'John', 'y': 'Mike' }
+        self.assertEqual(builder.adapter(values), self.generic_result(builder, values))
+
+    @db_session
+    def test_entity_param(self):
+        g = Group(number=10)
+        converter = Group.number.converters[0]
+        ast = [ 'SELECT', [ 'ALL', [ 'COLUMN', None, 'id' ] ], [ 'FROM', [ None, 'TABLE', 'Student' ] ],
+                [ 'WHERE', [ 'EQ', [ 'COLUMN', None, 'group' ], [ 'PARAM', ('g', None, 0), converter ] ] ] ]
+        builder = self.build(ast)
+        self.assertEqual(builder.adapter({ 'g': g }), self.generic_result(builder, { 'g': g }))
+        rollback()
+
+    def test_many_params(self):
+        count = sqlbuilding.MAX_COMPILED_ADAPTER_PARAMS_COUNT + 1
+        converter = Student.id.converters[0]
+        ast = [ 'SELECT', [ 'ALL', [ 'COLUMN', None, 'name' ] ], [ 'FROM', [ None, 'TABLE', 'Student' ] ],
+                [ 'WHERE', [ 'IN', [ 'COLUMN', None, 'id' ],
+                             [ [ 'PARAM', (i, None, None), converter ] for i in range(count) ] ] ] ]
+        builder = self.build(ast)
+        values = list(range(count))
+        self.assertEqual(builder.adapter(values), self.generic_result(builder, values))
+
+    @db_session
+    def test_queries(self):
+        Student(name='John', dob=date(2000, 1, 1), gpa=Decimal('3.5'))
+        x = date(1999, 1, 1)
+        self.assertEqual(select(s.name for s in Student if s.dob > x and s.gpa >= 3)[:], [ 'John' ])
+        rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import db_params, teardown_database, setup_database
+from pony.utils import LRUCache
+
+db = Database()
+
+
+class Person(db.Entity):
+    id = PrimaryKey(int)
+    name = Required(str)
+    age = Required(int)
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(cache.get('a'), 1)
+        cache['c'] = 3
+        self.assertEqual(sorted(cache), ['a', 'c'])
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.stats(), dict(size=2, maxsize=2, hits=1, misses=1, evictions=1))
+
+    def test_resize(self):
+        cache = LRUCache()
+        for i in range(10): cache[i] = i
+        cache.resize(3)
+        self.assertEqual(list(cache), [7, 8, 9])
+        self.assertEqual(cache.evictions, 7)
+
+    def test_getitem_stats(self):
+        cache = LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(cache['a'], 1)
+        with self.assertRaises(KeyError):
+            cache['c']
+        self.assertTrue('b' in cache)
+        self.assertFalse('c' in cache)
+        self.assertEqual(cache.stats(), dict(size=2, maxsize=2, hits=1, misses=1, evictions=0))
+        cache['c'] = 3
+        self.assertEqual(sorted(cache), ['a', 'c'])
+
+
+class TestTranslatorCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            for i in range(1, 6):
+                Person(id=i, name='P%d' % i, age=20 + i)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        self.translator_cache_size = db._translator_cache.maxsize
+        self.sql_cache_size = db._constructed_sql_cache.maxsize
+
+    def tearDown(self):
+        db._translator_cache.resize(self.translator_cache_size)
+        db._constructed_sql_cache.resize(self.sql_cache_size)
+
+    @db_session
+    def test_sql_cache_is_bounded(self):
+        db._constructed_sql_cache.clear()
+        db._constructed_sql_cache.resize(3)
+        before = db.cache_stats['constructed_sql_cache']['evictions']
+        for i in range(10):
+            list(select(p for p in Person if p.age > 20).order_by(Person.id).page(i + 1, 1))
+        stats = db.cache_stats['constructed_sql_cache']
+        self.assertEqual(stats['size'], 3)
+        self.assertEqual(stats['evictions'] - before, 7)
+
+    @db_session
+    def test_translator_cache_hits(self):
+        stats = db.cache_stats['translator_cache']
+        for i in range(3):
+            select(p for p in Person if p.name.startswith('P'))[:]
+        new_stats = db.cache_stats['translator_cache']
+        self.assertTrue(new_stats['hits'] - stats['hits'] >= 2)
+
+    def test_bind_options(self):
+        db2 = Database()
+        db2.bind(translator_cache_size=10, constructed_sql_cache_size=20, **db_params)
+        self.assertEqual(db2.cache_stats['translator_cache']['maxsize'], 10)
+        self.assertEqual(db2.cache_stats['constructed_sql_cache']['maxsize'], 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import absolute_import, print_function, division
+
+import unittest
+
+from pony.orm.core import *
+from pony.orm.tests.testutils import *
+from pony.orm.tests import teardown_database, setup_database
+
+db = Database()
+
+
+class Person(db.Entity):
+    name = Required(str)
+    age = Required(int)
+
+
+@db.precompile
+def all_persons():
+    return select(p for p in Person)
+
+
+@db.precompile(18, name='J')
+def persons_older_than(age, name=''):
+    return select(p for p in Person if p.age > age and p.name.startswith(name))
+
+
+class TestWarmup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        setup_database(db)
+        with db_session:
+            Person(id=1, name='John', age=20)
+            Person(id=2, name='Mike', age=30)
+
+    @classmethod
+    def tearDownClass(cls):
+        teardown_database(db)
+
+    def setUp(self):
+        db._translator_cache.clear()
+        db._constructed_sql_cache.clear()
+
+    def test_warmup(self):
+        count = db.local_stats[None].db_count
+        self.assertEqual(db.warmup(), 2)
+        self.assertEqual(db.local_stats[None].db_count, count)
+        self.assertEqual(len(db._translator_cache), 2)
+        self.assertEqual(len(db._constructed_sql_cache), 2)
+
+    def test_queries_use_caches(self):
+        db.warmup()
+        stats = db.cache_stats
+        with db_session:
+            self.assertEqual(persons_older_than(25, name='M')[:], [ Person[2] ])
+            self.assertEqual(set(all_persons()), { Person[1], Person[2] })
+        new_stats = db.cache_stats
+        self.assertEqual(len(db._translator_cache), 2)
+        self.assertEqual(len(db._constructed_sql_cache), 2)
+        self.assertEqual(new_stats['translator_cache']['misses'], stats['translator_cache']['misses'])
+        self.assertEqual(new_stats['constructed_sql_cache']['misses'], stats['constructed_sql_cache']['misses'])
+
+    @raises_exception(TypeError, 'Function not_a_query registered with precompile() should return a query. Got: 1')
+    def test_not_a_query(self):
+        db2 = Database()
+        class Item(db2.Entity):
+            name = Required(str)
+        @db2.precompile
+        def not_a_query():
+            return 1
+        setup_database(db2)
+        try: db2.warmup()
+        finally: teardown_database(db2)
+
+    @raises_exception(MappingError, 'No mapping was generated for the database')
+    def test_no_mapping(self):
+        db2 = Database('sqlite', ':memory:')
+        db2.warmup()
+
+
+if __name__ == '__main__':
+    unittest.main()
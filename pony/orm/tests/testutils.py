@@ -45,6 +45,12 @@ def raises_if(test_case, cond, exc_class, test_msg=None):
     else:
         test_case.assertFalse(cond, "Expected exception %s wasn't raised" % exc_class.__name__)
 
+param_re = re.compile(r'\?|%s|%\(p\d+\)s|:p?\d+|\$\d+')
+
+def count_params(sql):
+    # counts parameter placeholders of any supported paramstyle
+    return len(param_re.findall(sql))
+
 def flatten(x):
     result = []
     for el in x:
@@ -6,10 +6,11 @@ from datetime import datetime
 from itertools import count as _count
 from inspect import isfunction
 from time import strptime
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from functools import update_wrapper, wraps
 from xml.etree import cElementTree
 from copy import deepcopy
+from threading import RLock
 
 import pony
 from pony import options
@@ -19,6 +20,68 @@ from pony.thirdparty.decorator import decorator as _decorator
 if pony.MODE.startswith('GAE-'): localbase = object
 else: from threading import local as localbase
 
+from contextvars import ContextVar
+from threading import get_ident
+import asyncio
+
+contextlocal_owner = ContextVar('contextlocal_owner', default=None)  # is set when a function runs on behalf of a task
+contextlocal_states = ContextVar('contextlocal_states', default=None)  # (owner, {contextlocal object: state})
+
+def get_context_owner():
+    owner = contextlocal_owner.get()
+    if owner is not None: return owner
+    try: owner = asyncio.current_task()
+    except RuntimeError: owner = None  # there is no running event loop
+    if owner is not None: return owner
+    greenlet = sys.modules.get('greenlet')
+    if greenlet is not None: return greenlet.getcurrent()
+    return get_ident()
+
+def get_context_states():
+    owner = get_context_owner()
+    item = contextlocal_states.get()
+    if item is not None and item[0] == owner: return item[1]
+    states = {}
+    contextlocal_states.set((owner, states))
+    if item is not None:
+        # the context was copied from a parent task, its states are replaced with new ones
+        for obj, parent_state in list(item[1].items()): contextlocal._reset_state_(obj, parent_state)
+    return states
+
+class contextlocal(object):
+    # The same interface as threading.local, but attributes are stored separately for each asyncio task,
+    # greenlet or thread. New tasks copy the context of their parent, but get new states on the first access.
+    # The __init__ method of a subclass is called for each new state, attributes listed in _inherited_attrs_
+    # are copied from the state of the parent
+    __slots__ = '_init_args_',
+    _inherited_attrs_ = ()
+    def __new__(cls, *args, **kwargs):
+        self = object.__new__(cls)
+        object.__setattr__(self, '_init_args_', (args, kwargs))
+        return self
+    def _get_state_(self):
+        state = get_context_states().get(self)
+        if state is None: state = contextlocal._reset_state_(self)
+        return state
+    def _reset_state_(self, parent_state=None):
+        state = get_context_states()[self] = {}
+        args, kwargs = object.__getattribute__(self, '_init_args_')
+        cls = type(self)
+        cls.__init__(self, *args, **kwargs)
+        if parent_state is not None:
+            for name in cls._inherited_attrs_:
+                if name in parent_state: state[name] = parent_state[name]
+        return state
+    def __getattribute__(self, name):
+        state = contextlocal._get_state_(self)
+        if name in state: return state[name]
+        return object.__getattribute__(self, name)
+    def __setattr__(self, name, value):
+        contextlocal._get_state_(self)[name] = value
+    def __delattr__(self, name):
+        try: del contextlocal._get_state_(self)[name]
+        except KeyError: raise AttributeError(name)
+
 
 class PonyDeprecationWarning(DeprecationWarning):
     pass
@@ -420,6 +483,8 @@ class HashableDict(dict):
             return self
         return HashableDict({deepcopy(key, memo): deepcopy(value, memo)
                             for key, value in self.items()})
+    def __reduce__(self):
+        return HashableDict, (dict(self),)  # cached hash value is not pickled, because string hashes are randomized
     __setitem__ = _hashable_wrap(dict.__setitem__)
     __delitem__ = _hashable_wrap(dict.__delitem__)
     clear = _hashable_wrap(dict.clear)
@@ -428,6 +493,70 @@ class HashableDict(dict):
     setdefault = _hashable_wrap(dict.setdefault)
     update = _hashable_wrap(dict.update)
 
+class LRUCache(object):
+    def __init__(cache, maxsize=None):
+        cache.maxsize = maxsize
+        cache._data = OrderedDict()
+        cache._lock = RLock()
+        cache.hits = cache.misses = cache.evictions = 0
+    def __len__(cache):
+        return len(cache._data)
+    def __contains__(cache, key):
+        # membership test counts as neither a hit nor a miss and does not move the key to the end
+        with cache._lock:
+            return key in cache._data
+    def __iter__(cache):
+        with cache._lock:
+            return iter(list(cache._data))
+    def get(cache, key, default=None):
+        with cache._lock:
+            try: value = cache._data[key]
+            except KeyError:
+                cache.misses += 1
+                return default
+            cache._data.move_to_end(key)
+            cache.hits += 1
+            return value
+    def __getitem__(cache, key):
+        with cache._lock:
+            try: value = cache._data[key]
+            except KeyError:
+                cache.misses += 1
+                raise
+            cache._data.move_to_end(key)
+            cache.hits += 1
+            return value
+    def __setitem__(cache, key, value):
+        with cache._lock:
+            data = cache._data
+            data[key] = value
+            data.move_to_end(key)
+            cache._evict()
+    def __delitem__(cache, key):
+        with cache._lock:
+            del cache._data[key]
+    def pop(cache, key, *default):
+        with cache._lock:
+            return cache._data.pop(key, *default)
+    def clear(cache):
+        with cache._lock:
+            cache._data.clear()
+    def resize(cache, maxsize):
+        with cache._lock:
+            cache.maxsize = maxsize
+            cache._evict()
+    def _evict(cache):
+        maxsize = cache.maxsize
+        if maxsize is None: return
+        data = cache._data
+        while len(data) > maxsize:
+            data.popitem(last=False)
+            cache.evictions += 1
+    def stats(cache):
+        with cache._lock:
+            return dict(size=len(cache._data), maxsize=cache.maxsize,
+                        hits=cache.hits, misses=cache.misses, evictions=cache.evictions)
+
 def deref_proxy(value):
     t = type(value)
     if t.__name__ == 'LocalProxy' and '_get_current_object' in t.__dict__: